@@ -4,9 +4,31 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = "postgresql+psycopg2://postgres:postgres@db:5432/cohesion"
+    # asyncio URL for the API; derived from database_url (asyncpg / aiosqlite) when unset
+    async_database_url: str | None = None
+    # optional replica for GET traffic; writes and POST scoring stay on database_url
+    read_database_url: str | None = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # pooled connections gather_rows may hold at once per engine; half of pool size + overflow when unset
+    db_gather_connections: int | None = None
     app_name: str = "NFL Cohesion API"
     backend_port: int = 8000
     frontend_url: str | None = None
+    state_cube_cache_mb: int = 256
+    state_cube_ttl_seconds: float = 300.0
+    coach_windows_ttl_seconds: float = 300.0
+    summary_top_pairs: int = 15
+    data_version_check_seconds: float = 2.0
+    http_cache_max_age: int = 60
+    metrics_enabled: bool = True
+    # per-request SQL count/time headers: for every request, or for requests sending the header
+    query_trace: bool = False
+    query_trace_header: str | None = "X-Debug-Queries"
+    query_trace_log_statements: bool = False
 
     model_config = {
         "env_file": ".env",
@@ -1,15 +1,78 @@
+import asyncio
+import weakref
 from contextlib import contextmanager
-from typing import Iterator
+from typing import Any, AsyncIterator, Dict, Iterator, List, Sequence
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Row, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 
 from .config import get_settings
+from .telemetry import instrument_engine
 
 settings = get_settings()
 
-engine = create_engine(settings.database_url, echo=False, future=True)
+# sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No asyncio driver configured for {parsed.get_backend_name()}")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _pool_options(url: str, *, asyncio: bool = False) -> Dict[str, Any]:
+    if _is_sqlite(url):
+        # SQLite connections are cheap to open; async ones must not outlive the event loop that made them
+        return {"poolclass": NullPool} if asyncio else {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _read_only(bind):
+    # transactions on this bind begin READ ONLY (asyncpg/psycopg2); SQLite ignores the option.
+    # execution_options() shares the pool, so without a replica reads use the primary's connections
+    return bind.execution_options(postgresql_readonly=True)
+
+
+engine = create_engine(settings.database_url, echo=False, future=True, **_pool_options(settings.database_url))
+read_engine = _read_only(
+    create_engine(settings.read_database_url, echo=False, future=True, **_pool_options(settings.read_database_url))
+    if settings.read_database_url
+    else engine
+)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, future=True)
+
+_async_url = settings.async_database_url or async_database_url(settings.database_url)
+async_engine = create_async_engine(_async_url, echo=False, **_pool_options(_async_url, asyncio=True))
+_async_read_url = settings.read_database_url and async_database_url(settings.read_database_url)
+async_read_engine = _read_only(
+    create_async_engine(_async_read_url, echo=False, **_pool_options(_async_read_url, asyncio=True))
+    if _async_read_url
+    else async_engine
+)
+instrument_engine(engine, "primary", metrics=settings.metrics_enabled)
+instrument_engine(read_engine, "replica", metrics=settings.metrics_enabled)
+instrument_engine(async_engine.sync_engine, "primary_async", metrics=settings.metrics_enabled)
+instrument_engine(async_read_engine.sync_engine, "replica_async", metrics=settings.metrics_enabled)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
 
 
 @contextmanager
@@ -29,3 +92,79 @@ def get_session() -> Iterator[sessionmaker]:
     with session_scope() as session:
         yield session
 
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+def get_read_session() -> Iterator[Session]:
+    """Session for read-only requests: replica if configured, READ ONLY transactions, never committed."""
+    session = ReadSessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+async def get_async_read_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+
+
+def gather_connections() -> int:
+    """Connections :func:`gather_rows` may hold at once on one engine.
+
+    Half of what the pool can hand out, so concurrent cold reads queue here instead of
+    draining the pool that request sessions also check out from.
+    """
+    if settings.db_gather_connections:
+        return settings.db_gather_connections
+    return max(1, (settings.db_pool_size + settings.db_max_overflow) // 2)
+
+
+# one semaphore per (event loop, engine): asyncio primitives must not be shared across loops
+_gather_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _gather_semaphore(bind: AsyncEngine) -> asyncio.Semaphore:
+    per_engine = _gather_slots.setdefault(asyncio.get_running_loop(), {})
+    key = id(bind.sync_engine.pool)
+    if key not in per_engine:
+        per_engine[key] = asyncio.Semaphore(gather_connections())
+    return per_engine[key]
+
+
+async def gather_rows(session: AsyncSession, *statements) -> List[Sequence[Row]]:
+    """Run independent SELECTs concurrently, each on its own pooled connection of ``session``'s engine.
+
+    A session holds a single connection, so this is how one request overlaps round
+    trips. At most :func:`gather_connections` of these connections are checked out at
+    once per engine, across all requests; further statements wait for a free slot.
+
+    Each statement runs in its own short transaction, outside the session's, so the
+    results do not share a snapshot and must not depend on anything the session has not
+    committed. An aggregate rebuild committing between two of them can therefore
+    produce a mix of old and new rows. This is accepted because every rebuild bumps
+    ``data_version``, and the API drops its caches (and any state cube built from such
+    a mix) as soon as it sees the new version.
+    """
+    semaphore = _gather_semaphore(session.bind)
+
+    async def fetch(statement) -> Sequence[Row]:
+        async with semaphore:
+            async with session.bind.connect() as connection:
+                return (await connection.execute(statement)).all()
+
+    return list(await asyncio.gather(*(fetch(statement) for statement in statements)))
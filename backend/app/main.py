@@ -1,24 +1,39 @@
 from __future__ import annotations
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import get_settings
 from .database import engine
+from .middleware import DataVersionETagMiddleware, QueryTraceMiddleware, RequestMetricsMiddleware
 from .models import Base
-from .routers import coaches, meta, roster, score, system_states
+from .routers import coaches, meta, optimize, roster, score, system_states
+from .telemetry import registry
 
 settings = get_settings()
 
 app = FastAPI(title=settings.app_name)
 
+# added first so it sits inside CORS and 304s still carry the CORS headers
+app.add_middleware(DataVersionETagMiddleware, max_age=settings.http_cache_max_age)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*" if settings.frontend_url is None else settings.frontend_url],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Query-Count", "Server-Timing"],
 )
+app.add_middleware(
+    QueryTraceMiddleware,
+    always=settings.query_trace,
+    header=settings.query_trace_header,
+    log_statements=settings.query_trace_log_statements,
+)
+if settings.metrics_enabled:
+    # outermost, so the timings include the other middleware
+    app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.on_event("startup")
@@ -30,9 +45,17 @@ app.include_router(meta.router)
 app.include_router(system_states.router)
 app.include_router(roster.router)
 app.include_router(score.router)
+app.include_router(optimize.router)
 app.include_router(coaches.router)
 
 
+if settings.metrics_enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> PlainTextResponse:
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/")
 def root() -> dict[str, str]:
     return {"status": "ok", "message": "NFL lineup cohesion API"}
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .database import get_read_session
+from .services.data_version import data_versions
+from .telemetry import REQUEST_LATENCY, REQUESTS, REQUESTS_IN_FLIGHT, trace_queries
+
+logger = logging.getLogger(__name__)
+
+
+def _etag(version: int, request: Request) -> str:
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha256(f"{version}|{request.url.path}|{params}".encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so a W/ prefix added by a proxy still matches
+    return any(token.strip().removeprefix("W/") == etag for token in if_none_match.split(","))
+
+
+class DataVersionETagMiddleware:
+    """Plain ASGI middleware answering conditional GETs for ``/api`` from the warehouse data version.
+
+    The ETag is a hash of (data_version, path, sorted query params): responses only
+    change when an ETL stage commits, so a matching ``If-None-Match`` is answered with
+    304 before the route runs. Every ``/api`` request also refreshes the throttled
+    version check, which drops the process caches after an ETL run; between checks the
+    version is served from memory without a session or a threadpool hop.
+    """
+
+    def __init__(self, app: ASGIApp, *, max_age: int, prefix: str = "/api/") -> None:
+        self.app = app
+        self.max_age = max_age
+        self.prefix = prefix
+
+    def _version(self, request: Request) -> int:
+        # honour dependency overrides so the version is read through the same session source as the routes
+        sessions = request.app.dependency_overrides.get(get_read_session, get_read_session)()
+        try:
+            return data_versions.get(next(sessions))
+        finally:
+            sessions.close()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        version = data_versions.cached()
+        if version is None:
+            version = await run_in_threadpool(self._version, request)
+        if scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        etag = _etag(version, request)
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}, must-revalidate"}
+        if _matches(request.headers.get("if-none-match", ""), etag):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+
+def _route_template(scope: Scope) -> str:
+    # label by route template, never by raw path, so the series count stays bounded
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware recording latency, in-flight count and status per route template."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, route = scope["method"], _route_template(scope)
+        status = "500"
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, route)
+            REQUESTS.inc(method, route, status)
+            REQUESTS_IN_FLIGHT.dec(method, route)
+
+
+class QueryTraceMiddleware:
+    """Opt-in per-request SQL count and DB time, returned as ``X-Query-Count`` and ``Server-Timing``.
+
+    Traces every request when ``always`` is set, otherwise only those sending ``header``
+    (any value but ``0``). With ``log_statements`` the statements are logged in order.
+    """
+
+    def __init__(self, app: ASGIApp, *, always: bool, header: str | None, log_statements: bool) -> None:
+        self.app = app
+        self.always = always
+        self.header = header.lower().encode("latin-1") if header else None
+        self.log_statements = log_statements
+
+    def _requested(self, scope: Scope) -> bool:
+        if self.always:
+            return True
+        if self.header is None:
+            return False
+        return any(name == self.header and value not in (b"", b"0") for name, value in scope["headers"])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        with trace_queries(keep_statements=self.log_statements) as trace:
+
+            async def send_with_trace(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers["X-Query-Count"] = str(trace.count)
+                    headers.append("Server-Timing", f'db;dur={trace.seconds * 1000:.2f};desc="{trace.count} queries"')
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+        if self.log_statements:
+            logger.info(
+                "%s %s: %d queries in %.2f ms\n%s",
+                scope["method"],
+                scope["path"],
+                trace.count,
+                trace.seconds * 1000,
+                "\n".join(f"  {n}. {statement}" for n, statement in enumerate(trace.statements, 1)),
+            )
@@ -1,6 +1,19 @@
 from datetime import date
 
-from sqlalchemy import Boolean, CheckConstraint, Column, Date, ForeignKey, Integer, Numeric, String, UniqueConstraint
+from sqlalchemy import (
+    Boolean,
+    CheckConstraint,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import declarative_base
 
 from .db_types import JSONB
@@ -103,6 +116,30 @@ class PlayerSnapsInState(Base):
     side = Column(String, primary_key=True)
     gsis_id = Column(String, primary_key=True)
     snaps = Column(Integer)
+    # role facts of the player within the state, written by the aggregate ETL
+    ius = Column(Float, nullable=False, default=0.0)
+    dominant_role = Column(String)
+    roles = Column(JSONB, default=dict)
+
+
+class PlayerRosterFacts(Base):
+    """Per (team, side, player) roll-up over every system state of the team, for the roster endpoint.
+
+    ``ius`` here is computed from the role counts summed over all of the team's states.
+    The IUS of one state lives on :class:`PlayerSnapsInState`, which the roster reads
+    when a ``system_state_id`` is given.
+    """
+
+    __tablename__ = "player_roster_facts"
+
+    team = Column(String, primary_key=True)
+    side = Column(String, primary_key=True)
+    gsis_id = Column(String, primary_key=True)
+    n_system_states_seen = Column(Integer, nullable=False, default=0)
+    total_snaps = Column(Integer, nullable=False, default=0)
+    ius = Column(Float, nullable=False, default=0.0)
+    dominant_role = Column(String)
+    roles = Column(JSONB, default=dict)
 
 
 class CoSnaps(Base):
@@ -116,6 +153,26 @@ class CoSnaps(Base):
     co_snaps = Column(Integer)
 
 
+class PairStatsInState(Base):
+    __tablename__ = "pair_stats_in_state"
+
+    system_state_id = Column(String, primary_key=True)
+    team = Column(String, primary_key=True)
+    side = Column(String, primary_key=True)
+    a_gsis = Column(String, primary_key=True)
+    b_gsis = Column(String, primary_key=True)
+    co_snaps = Column(Integer, nullable=False)
+    n_i = Column(Integer, nullable=False)
+    n_j = Column(Integer, nullable=False)
+    jaccard = Column(Float, nullable=False)
+
+    # after the columns so the indexes can use their DESC ordering, as in db/init.sql
+    __table_args__ = (
+        Index("idx_pair_stats_jaccard", system_state_id, team, side, jaccard.desc()),
+        Index("idx_pair_stats_co_snaps", system_state_id, team, side, co_snaps.desc()),
+    )
+
+
 class PlayerRoleCountInState(Base):
     __tablename__ = "player_role_counts_in_state"
 
@@ -127,6 +184,18 @@ class PlayerRoleCountInState(Base):
     snaps = Column(Integer)
 
 
+class SystemStateTotals(Base):
+    __tablename__ = "system_state_totals"
+    __table_args__ = (Index("idx_system_state_totals_team", "team", "side"),)
+
+    system_state_id = Column(String, primary_key=True)
+    team = Column(String, primary_key=True)
+    side = Column(String, primary_key=True)
+    team_snaps = Column(Integer, nullable=False, default=0)
+    distinct_players = Column(Integer, nullable=False, default=0)
+    role_mix = Column(JSONB, default=dict)
+
+
 class RolePairWeight(Base):
     __tablename__ = "role_pair_weights"
 
@@ -135,3 +204,10 @@ class RolePairWeight(Base):
     role_b = Column(String, primary_key=True)
     weight = Column(Numeric)
 
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    stage = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True))
@@ -1,22 +1,30 @@
 from __future__ import annotations
 
 from datetime import date
+from typing import Dict
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
+from ..database import get_async_read_session
 from ..schemas import CoachesActiveResponse
-from ..services.coaches import active_coaches
+from ..services.coaches import active_coaches_async, active_coaches_by_team_async
 
 router = APIRouter(prefix="/api/coaches", tags=["coaches"])
 
 
 @router.get("/active", response_model=CoachesActiveResponse)
-def get_active_coaches(
+async def get_active_coaches(
     team: str = Query(..., description="Team abbreviation"),
     date_param: date = Query(default=date.today(), alias="date"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
 ) -> CoachesActiveResponse:
-    return active_coaches(session, team=team, on_date=date_param)
+    return await active_coaches_async(session, team=team, on_date=date_param)
 
+
+@router.get("/active/all", response_model=Dict[str, CoachesActiveResponse])
+async def get_active_coaches_by_team(
+    date_param: date = Query(default=date.today(), alias="date"),
+    session: AsyncSession = Depends(get_async_read_session),
+) -> Dict[str, CoachesActiveResponse]:
+    return await active_coaches_by_team_async(session, on_date=date_param)
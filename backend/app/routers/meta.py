@@ -1,23 +1,23 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
+from ..database import get_async_read_session
 from ..schemas import SeasonResponse, TeamResponse
-from ..services.system_state_service import list_seasons, list_teams
+from ..services.system_state_service import list_seasons_async, list_teams_async
 
 router = APIRouter(prefix="/api", tags=["meta"])
 
 
 @router.get("/meta/seasons", response_model=SeasonResponse)
-def get_seasons(session: Session = Depends(get_session)) -> SeasonResponse:
-    seasons = list_seasons(session)
+async def get_seasons(session: AsyncSession = Depends(get_async_read_session)) -> SeasonResponse:
+    seasons = await list_seasons_async(session)
     return SeasonResponse(seasons=seasons)
 
 
 @router.get("/teams", response_model=TeamResponse)
-def get_teams(season: int, session: Session = Depends(get_session)) -> TeamResponse:
-    teams = list_teams(session, season=season)
+async def get_teams(season: int, session: AsyncSession = Depends(get_async_read_session)) -> TeamResponse:
+    teams = await list_teams_async(session, season=season)
     return TeamResponse(season=season, teams=teams)
 
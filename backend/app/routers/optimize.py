@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..database import get_session
+from ..schemas import LineupOptimizeRequest, LineupOptimizeResponse
+from ..services.optimizer import optimize_lineup
+
+router = APIRouter(prefix="/api/optimize", tags=["optimize"])
+
+
+@router.post("/lineup", response_model=LineupOptimizeResponse)
+def optimize(payload: LineupOptimizeRequest, session: Session = Depends(get_session)) -> LineupOptimizeResponse:
+    try:
+        return optimize_lineup(
+            session,
+            team=payload.team,
+            side=payload.side,
+            system_state_id=payload.system_state_id,
+            template=payload.template,
+            locked=payload.locked,
+            excluded=payload.excluded,
+            top_k=payload.top_k,
+            beam_width=payload.beam_width,
+            time_budget_ms=payload.time_budget_ms,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -1,21 +1,21 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
+from ..database import get_async_read_session
 from ..schemas import RosterPlayer
-from ..services.roster import get_roster
+from ..services.roster import get_roster_async
 
 router = APIRouter(prefix="/api", tags=["roster"])
 
 
 @router.get("/roster", response_model=list[RosterPlayer])
-def roster(
+async def roster(
     team: str = Query(..., description="Team abbreviation"),
     side: str = Query(..., pattern="^(offense|defense)$"),
     system_state_id: str | None = Query(None, description="Optional system state"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
 ) -> list[RosterPlayer]:
-    return get_roster(session, team=team, side=side, system_state_id=system_state_id)
+    return await get_roster_async(session, team=team, side=side, system_state_id=system_state_id)
 
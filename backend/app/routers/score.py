@@ -1,19 +1,28 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
-from ..schemas import LineupScoreRequest, LineupScoreResponse
-from ..services.metrics import compute_lineup_score
+from ..database import get_async_session
+from ..schemas import (
+    LineupBatchScoreRequest,
+    LineupBatchScoreResponse,
+    LineupScoreRequest,
+    LineupScoreResponse,
+    LineupSwapRequest,
+    LineupSwapResponse,
+)
+from ..services.metrics import compute_lineup_score_async, score_lineups_async, score_swaps_async
 
 router = APIRouter(prefix="/api/score", tags=["score"])
 
 
 @router.post("/lineup", response_model=LineupScoreResponse)
-def score_lineup(payload: LineupScoreRequest, session: Session = Depends(get_session)) -> LineupScoreResponse:
+async def score_lineup(
+    payload: LineupScoreRequest, session: AsyncSession = Depends(get_async_session)
+) -> LineupScoreResponse:
     try:
-        return compute_lineup_score(
+        return await compute_lineup_score_async(
             session,
             team=payload.team,
             side=payload.side,
@@ -23,3 +32,37 @@ def score_lineup(payload: LineupScoreRequest, session: Session = Depends(get_ses
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
+
+@router.post("/lineups", response_model=LineupBatchScoreResponse)
+async def score_lineup_batch(
+    payload: LineupBatchScoreRequest, session: AsyncSession = Depends(get_async_session)
+) -> LineupBatchScoreResponse:
+    try:
+        return await score_lineups_async(
+            session,
+            team=payload.team,
+            side=payload.side,
+            system_state_id=payload.system_state_id,
+            lineups=payload.lineups,
+            include_pair_edges=payload.include_pair_edges,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.post("/swaps", response_model=LineupSwapResponse)
+async def score_lineup_swaps(
+    payload: LineupSwapRequest, session: AsyncSession = Depends(get_async_session)
+) -> LineupSwapResponse:
+    try:
+        return await score_swaps_async(
+            session,
+            team=payload.team,
+            side=payload.side,
+            system_state_id=payload.system_state_id,
+            lineup=payload.lineup,
+            swaps=[(swap.out_player, swap.in_player) for swap in payload.swaps],
+            candidates_for=payload.candidates_for,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -1,33 +1,43 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
+from ..config import get_settings
+from ..database import get_async_read_session
 from ..schemas import SystemStateLabel, SystemStateSummary
-from ..services.system_state_service import list_system_states, system_state_summary
+from ..services.system_state_service import list_system_states_async, system_state_summary_async
 
 router = APIRouter(prefix="/api/system_state", tags=["system-states"])
 
 
 @router.get("", response_model=list[SystemStateLabel])
-def get_system_states(
+async def get_system_states(
     team: str = Query(..., description="Team abbreviation"),
     side: str = Query(..., pattern="^(offense|defense)$"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
 ) -> list[SystemStateLabel]:
-    return list_system_states(session, team=team, side=side)
+    return await list_system_states_async(session, team=team, side=side)
 
 
 @router.get("/summary", response_model=SystemStateSummary)
-def get_system_state_summary(
+async def get_system_state_summary(
     team: str,
     side: str,
     system_state_id: str,
-    session: Session = Depends(get_session),
+    top_k: int | None = Query(None, ge=1, le=200, description="Number of pairs to return"),
+    rank_by: str = Query("co_snaps", pattern="^(co_snaps|jaccard)$", description="Rank pairs by co-snaps or Jaccard"),
+    session: AsyncSession = Depends(get_async_read_session),
 ) -> SystemStateSummary:
-    states = list_system_states(session, team=team, side=side)
+    states = await list_system_states_async(session, team=team, side=side)
     if not any(state.system_state_id == system_state_id for state in states):
         raise HTTPException(status_code=404, detail="System state not found")
-    return system_state_summary(session, team=team, side=side, system_state_id=system_state_id)
+    return await system_state_summary_async(
+        session,
+        team=team,
+        side=side,
+        system_state_id=system_state_id,
+        top_k=top_k or get_settings().summary_top_pairs,
+        rank_by=rank_by,
+    )
 
@@ -1,8 +1,10 @@
 from datetime import date
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 from pydantic import BaseModel, Field, field_validator
 
+MAX_BATCH_LINEUPS = 25_000
+
 
 class SeasonResponse(BaseModel):
     seasons: List[int]
@@ -92,6 +94,109 @@ class LineupScoreResponse(BaseModel):
     playcaller_label: Optional[str] = None
 
 
+class LineupBatchScoreRequest(BaseModel):
+    team: str
+    side: str
+    system_state_id: str
+    lineups: List[List[str]] = Field(..., min_length=1, max_length=MAX_BATCH_LINEUPS)
+    include_pair_edges: bool = False
+
+    @field_validator("lineups")
+    @classmethod
+    def validate_lineups(cls, value: List[List[str]]) -> List[List[str]]:
+        for position, lineup in enumerate(value):
+            if len(lineup) != 11 or len(set(lineup)) != 11:
+                raise ValueError(f"Lineup {position} must contain 11 unique GSIS IDs")
+        return value
+
+
+class LineupBatchScore(BaseModel):
+    lineup: List[str]
+    LSU: float
+    LIU: float
+    LIC: float
+    cohesion: float
+    warnings: List[str] = Field(default_factory=list)
+    pair_edges: Optional[List[PairEdge]] = None
+
+
+class LineupBatchScoreResponse(BaseModel):
+    results: List[LineupBatchScore]
+    playcaller_label: Optional[str] = None
+
+
+class LineupSwap(BaseModel):
+    out_player: str
+    in_player: str
+
+
+class LineupSwapRequest(LineupScoreRequest):
+    swaps: List[LineupSwap] = Field(default_factory=list)
+    candidates_for: List[str] = Field(
+        default_factory=list,
+        description="Lineup players to try replacing with every other player seen in the system state",
+    )
+
+
+class LineupScores(BaseModel):
+    LSU: float
+    LIU: float
+    LIC: float
+    cohesion: float
+
+
+class SwapDelta(LineupScores):
+    out_player: str
+    in_player: str
+    delta_LSU: float
+    delta_LIU: float
+    delta_LIC: float
+    delta_cohesion: float
+
+
+class LineupSwapResponse(BaseModel):
+    base: LineupScores
+    swaps: List[SwapDelta]
+
+
+class LineupOptimizeRequest(BaseModel):
+    team: str
+    side: str
+    system_state_id: str
+    template: Union[str, Dict[str, int]] = Field(
+        ..., description="Preset name (e.g. '11', '4-2-5') or role -> count mapping summing to 11"
+    )
+    locked: List[str] = Field(default_factory=list)
+    excluded: List[str] = Field(default_factory=list)
+    top_k: int = Field(5, ge=1, le=50)
+    beam_width: int = Field(256, ge=1, le=4096)
+    time_budget_ms: int = Field(1000, ge=10, le=30000)
+
+    @field_validator("locked")
+    @classmethod
+    def validate_locked(cls, value: List[str]) -> List[str]:
+        if len(value) > 11 or len(set(value)) != len(value):
+            raise ValueError("Locked players must be at most 11 unique GSIS IDs")
+        return value
+
+
+class OptimizedLineup(BaseModel):
+    lineup: List[str]
+    slots: Dict[str, List[str]]
+    LSU: float
+    LIU: float
+    LIC: float
+    cohesion: float
+
+
+class LineupOptimizeResponse(BaseModel):
+    lineups: List[OptimizedLineup]
+    template: Dict[str, int]
+    explored: int
+    timed_out: bool = False
+    playcaller_label: Optional[str] = None
+
+
 class CoachRoleResponse(BaseModel):
     coach_id: str
     coach_name: str
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import CoachRole
+
+ROLE_PRIORITY = {
+    "offense": ["OffPlayCaller", "OC"],
+    "defense": ["DefPlayCaller", "DC"],
+}
+
+
+@dataclass
+class CoachWindow:
+    coach_id: str
+    coach_name: str
+    team: str
+    role: str
+    start_date: date
+    end_date: Optional[date]
+    start_game_id: Optional[str]
+    end_game_id: Optional[str]
+
+    def active_on(self, when: date) -> bool:
+        if self.start_date and when < self.start_date:
+            return False
+        if self.end_date and when > self.end_date:
+            return False
+        return True
+
+
+class _RoleWindows:
+    """Windows of one (team, role), sorted by start date for bisect lookups."""
+
+    def __init__(self, windows: Iterable[CoachWindow]) -> None:
+        self.windows = sorted(windows, key=lambda w: w.start_date or date.min)
+        self.starts = [w.start_date or date.min for w in self.windows]
+        # latest end date among windows[:i + 1]; open-ended windows reach date.max
+        self.reach = list(accumulate((w.end_date or date.max for w in self.windows), max))
+
+    def active(self, when: date) -> Optional[CoachWindow]:
+        # the latest-starting window that has begun and not yet ended: walk back from the
+        # bisect point until no earlier window can still be open on ``when``
+        i = bisect_right(self.starts, when) - 1
+        match = None
+        while i >= 0 and self.reach[i] >= when:
+            window = self.windows[i]
+            if match is not None and window.start_date != match.start_date:
+                break
+            if window.active_on(when):
+                # among equal start dates the first loaded window wins
+                match = window
+            i -= 1
+        return match
+
+
+class CoachWindowIndex:
+    """Interval index over ``coach_roles`` answering "active window for (team, role, date)"."""
+
+    def __init__(self, windows: Iterable[CoachWindow]) -> None:
+        grouped: Dict[Tuple[str, str], List[CoachWindow]] = {}
+        for window in windows:
+            grouped.setdefault((window.team, window.role), []).append(window)
+        self._windows = {key: _RoleWindows(values) for key, values in grouped.items()}
+        self.teams = sorted({team for team, _ in grouped})
+
+    def active(self, team: str, role: str, on_date: date) -> Optional[CoachWindow]:
+        windows = self._windows.get((team, role))
+        return windows.active(on_date) if windows else None
+
+    def active_on_dates(self, team: str, role: str, dates: Sequence[date]) -> List[Optional[CoachWindow]]:
+        windows = self._windows.get((team, role))
+        if windows is None:
+            return [None] * len(dates)
+        return [windows.active(on_date) for on_date in dates]
+
+    def active_for_date(
+        self, on_date: date, *, roles: Sequence[str], teams: Optional[Sequence[str]] = None
+    ) -> Dict[Tuple[str, str], Optional[CoachWindow]]:
+        return {(team, role): self.active(team, role, on_date) for team in teams or self.teams for role in roles}
+
+    def playcaller(self, team: str, side: str, on_date: date) -> Optional[CoachWindow]:
+        for role in ROLE_PRIORITY[side]:
+            match = self.active(team, role, on_date)
+            if match:
+                return match
+        return None
+
+    def playcallers(self, team: str, side: str, dates: Sequence[date]) -> List[Optional[CoachWindow]]:
+        resolved = [None] * len(dates)
+        for role in ROLE_PRIORITY[side]:
+            pending = [n for n, window in enumerate(resolved) if window is None]
+            if not pending:
+                break
+            for n, window in zip(pending, self.active_on_dates(team, role, [dates[n] for n in pending])):
+                resolved[n] = window
+        return resolved
+
+
+def load_coach_windows(session: Session) -> CoachWindowIndex:
+    rows = session.execute(select(CoachRole)).scalars().all()
+    return CoachWindowIndex(
+        CoachWindow(
+            coach_id=row.coach_id,
+            coach_name=row.coach_name,
+            team=row.team,
+            role=row.role,
+            start_date=row.start_date,
+            end_date=row.end_date,
+            start_game_id=row.start_game_id,
+            end_game_id=row.end_game_id,
+        )
+        for row in rows
+    )
+
+
+class _IndexCache:
+    """The process-wide index, rebuilt after :func:`invalidate_coach_windows` or once it is ``ttl_seconds`` old."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._index: Optional[CoachWindowIndex] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _cached(self) -> Tuple[Optional[CoachWindowIndex], int]:
+        with self._lock:
+            if self._index is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return self._index, self._generation
+            return None, self._generation
+
+    def _store(self, index: CoachWindowIndex, generation: int) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._index, self._loaded_at = index, time.monotonic()
+
+    def get(self, session: Session) -> CoachWindowIndex:
+        index, generation = self._cached()
+        if index is None:
+            index = load_coach_windows(session)
+            self._store(index, generation)
+        return index
+
+    async def get_async(self, session: AsyncSession) -> CoachWindowIndex:
+        index, generation = self._cached()
+        if index is None:
+            index = await session.run_sync(load_coach_windows)
+            self._store(index, generation)
+        return index
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._index = None
+
+
+coach_windows = _IndexCache(ttl_seconds=get_settings().coach_windows_ttl_seconds)
+
+
+def get_coach_window_index(session: Session) -> CoachWindowIndex:
+    return coach_windows.get(session)
+
+
+async def get_coach_window_index_async(session: AsyncSession) -> CoachWindowIndex:
+    return await coach_windows.get_async(session)
+
+
+def invalidate_coach_windows() -> None:
+    coach_windows.invalidate()
@@ -3,11 +3,11 @@ from __future__ import annotations
 from datetime import date
 from typing import Dict, Optional
 
-from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..models import CoachRole
 from ..schemas import CoachRoleResponse, CoachesActiveResponse
+from .coach_windows import CoachWindow, CoachWindowIndex, get_coach_window_index, get_coach_window_index_async
 
 ROLE_LOOKUP = {
     "offense_playcaller": "OffPlayCaller",
@@ -17,7 +17,7 @@ ROLE_LOOKUP = {
 }
 
 
-def _role_to_response(row: CoachRole | None) -> Optional[CoachRoleResponse]:
+def _role_to_response(row: CoachWindow | None) -> Optional[CoachRoleResponse]:
     if row is None:
         return None
     return CoachRoleResponse(
@@ -32,23 +32,11 @@ def _role_to_response(row: CoachRole | None) -> Optional[CoachRoleResponse]:
     )
 
 
-def _active_role(session: Session, *, team: str, role: str, on_date: date) -> CoachRole | None:
-    query = (
-        select(CoachRole)
-        .where(CoachRole.team == team)
-        .where(CoachRole.role == role)
-        .where(CoachRole.start_date <= on_date)
-        .where(or_(CoachRole.end_date.is_(None), CoachRole.end_date >= on_date))
-        .order_by(CoachRole.start_date.desc())
-    )
-    return session.execute(query).scalars().first()
-
-
-def active_coaches(session: Session, *, team: str, on_date: date) -> CoachesActiveResponse:
-    offense = _active_role(session, team=team, role=ROLE_LOOKUP["offense_playcaller"], on_date=on_date)
-    defense = _active_role(session, team=team, role=ROLE_LOOKUP["defense_playcaller"], on_date=on_date)
-    oc = _active_role(session, team=team, role=ROLE_LOOKUP["oc"], on_date=on_date)
-    dc = _active_role(session, team=team, role=ROLE_LOOKUP["dc"], on_date=on_date)
+def _active_coaches(index: CoachWindowIndex, *, team: str, on_date: date) -> CoachesActiveResponse:
+    offense = index.active(team, ROLE_LOOKUP["offense_playcaller"], on_date)
+    defense = index.active(team, ROLE_LOOKUP["defense_playcaller"], on_date)
+    oc = index.active(team, ROLE_LOOKUP["oc"], on_date)
+    dc = index.active(team, ROLE_LOOKUP["dc"], on_date)
 
     # fallback if explicit play caller missing
     if offense is None:
@@ -63,3 +51,20 @@ def active_coaches(session: Session, *, team: str, on_date: date) -> CoachesActi
         dc=_role_to_response(dc),
     )
 
+
+def active_coaches(session: Session, *, team: str, on_date: date) -> CoachesActiveResponse:
+    return _active_coaches(get_coach_window_index(session), team=team, on_date=on_date)
+
+
+def active_coaches_by_team(session: Session, *, on_date: date) -> Dict[str, CoachesActiveResponse]:
+    index = get_coach_window_index(session)
+    return {team: _active_coaches(index, team=team, on_date=on_date) for team in index.teams}
+
+
+async def active_coaches_async(session: AsyncSession, *, team: str, on_date: date) -> CoachesActiveResponse:
+    return _active_coaches(await get_coach_window_index_async(session), team=team, on_date=on_date)
+
+
+async def active_coaches_by_team_async(session: AsyncSession, *, on_date: date) -> Dict[str, CoachesActiveResponse]:
+    index = await get_coach_window_index_async(session)
+    return {team: _active_coaches(index, team=team, on_date=on_date) for team in index.teams}
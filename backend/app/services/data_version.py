@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import DataVersion
+from .coach_windows import invalidate_coach_windows
+from .state_cube import invalidate_state_cubes
+
+
+def current_data_version(session: Session) -> int:
+    """Generation stamp of the warehouse: the sum of every ETL stage's counter, so any bump moves it."""
+    return int(session.execute(select(func.coalesce(func.sum(DataVersion.version), 0))).scalar())
+
+
+def bump_data_version(session: Session, stage: str) -> None:
+    """Advance ``stage``'s counter inside the caller's transaction, so it lands with the stage's commit."""
+    now = datetime.now(timezone.utc)
+    result = session.execute(
+        update(DataVersion)
+        .where(DataVersion.stage == stage)
+        .values(version=DataVersion.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        session.add(DataVersion(stage=stage, version=1, updated_at=now))
+        session.flush()
+
+
+class DataVersionTracker:
+    """The API process's view of ``data_version``, re-read at most once every ``check_seconds``.
+
+    When the stamp moves the process caches (state cubes, coach windows) are dropped,
+    so workers pick up an ETL run from another process without waiting for their TTLs.
+    """
+
+    def __init__(self, check_seconds: float) -> None:
+        self.check_seconds = check_seconds
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def cached(self) -> Optional[int]:
+        """The version last read, or None when it is due for a re-check (or was never read)."""
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return self._version
+            return None
+
+    def get(self, session: Session) -> int:
+        version = self.cached()
+        if version is not None:
+            return version
+        version = current_data_version(session)
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version, self._checked_at = version, time.monotonic()
+        if changed:
+            invalidate_state_cubes()
+            invalidate_coach_windows()
+        return version
+
+    def reset(self) -> None:
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+
+data_versions = DataVersionTracker(check_seconds=get_settings().data_version_check_seconds)
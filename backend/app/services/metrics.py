@@ -1,235 +1,361 @@
 from __future__ import annotations
 
 import itertools
-import math
-from decimal import Decimal
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Iterable, List, Sequence, Tuple
 
-from sqlalchemy import and_, func, select
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-
-from ..models import (
-    CoSnaps,
-    Play,
-    PlaySystemState,
-    Player,
-    PlayerRoleCountInState,
-    PlayerSnapsInState,
-    RolePairWeight,
-    SystemState,
+from starlette.concurrency import run_in_threadpool
+
+from ..models import Player
+from ..schemas import (
+    LineupBatchScore,
+    LineupBatchScoreResponse,
+    LineupScoreResponse,
+    LineupScores,
+    LineupSwapResponse,
+    PairEdge,
+    PlayerScore,
+    SwapDelta,
 )
-from ..schemas import LineupScoreResponse, PairEdge, PlayerScore
+from .state_cube import StateCube, get_state_cube, get_state_cube_async
 
+# lineups scored per vectorised chunk; bounds the (chunk, 11, 11) intermediates
+BATCH_CHUNK_SIZE = 4096
+# LIC is 0 below this total pair weight; shared by full and incremental (swap) scoring so
+# a total that cancels to rounding noise is treated exactly like one that is zero
+WEIGHT_EPSILON = 1e-12
 
-def _mean(values: Iterable[float]) -> float:
-    values = list(values)
-    if not values:
-        return 0.0
-    return float(sum(values) / len(values))
 
+def _cohesion(LSU, LIU, LIC):
+    return 0.35 * LSU + 0.20 * LIU + 0.45 * LIC
 
-def _safe_float(value) -> float:
-    if value is None:
-        return 0.0
-    if isinstance(value, Decimal):
-        return float(value)
-    return float(value)
 
+def _missing_players(cube: StateCube, player_ids: Iterable[str]) -> List[str]:
+    return sorted({pid for pid in player_ids if pid not in cube.index})
 
-def _team_snaps(session: Session, *, team: str, side: str, system_state_id: str) -> int:
-    condition = (
-        PlaySystemState.offense_system_state_id == system_state_id
-        if side == "offense"
-        else PlaySystemState.defense_system_state_id == system_state_id
-    )
-    team_condition = Play.offense_team == team if side == "offense" else Play.defense_team == team
-
-    value = (
-        session.execute(
-            select(func.count())
-            .select_from(Play)
-            .join(PlaySystemState, PlaySystemState.play_id == Play.play_id)
-            .where(condition)
-            .where(team_condition)
-            .where(Play.special_teams.is_(False))
-        ).scalar()
-        or 0
-    )
-    return int(value)
 
+def _positions_statement(missing: Sequence[str]):
+    return select(Player.gsis_id, Player.position).where(Player.gsis_id.in_(missing))
 
-def compute_lineup_score(
-    session: Session,
-    *,
-    team: str,
-    side: str,
-    system_state_id: str,
-    lineup: Sequence[str],
-) -> LineupScoreResponse:
-    lineup = list(dict.fromkeys(lineup))
-    if len(lineup) != 11:
-        raise ValueError("Lineup must contain exactly 11 unique players")
 
-    team_snaps = _team_snaps(session, team=team, side=side, system_state_id=system_state_id)
+def _with_positions(cube: StateCube, missing: Sequence[str], rows) -> StateCube:
+    positions = {pid: None for pid in missing}
+    positions.update({row.gsis_id: row.position for row in rows})
+    return cube.with_players(positions)
 
-    snaps_rows = session.execute(
-        select(PlayerSnapsInState.gsis_id, PlayerSnapsInState.snaps)
-        .where(
-            and_(
-                PlayerSnapsInState.system_state_id == system_state_id,
-                PlayerSnapsInState.team == team,
-                PlayerSnapsInState.side == side,
-                PlayerSnapsInState.gsis_id.in_(lineup),
-            )
-        )
-    ).all()
-    snaps_map: Dict[str, int] = {row.gsis_id: row.snaps for row in snaps_rows}
-    snaps_values = [snaps_map.get(pid, 0) for pid in lineup]
-
-    lsu_values = [snaps / team_snaps for snaps in snaps_values] if team_snaps else [0.0] * len(lineup)
-    LSU = _mean(lsu_values)
-
-    role_rows = session.execute(
-        select(
-            PlayerRoleCountInState.gsis_id,
-            PlayerRoleCountInState.role,
-            PlayerRoleCountInState.snaps,
-        ).where(
-            and_(
-                PlayerRoleCountInState.system_state_id == system_state_id,
-                PlayerRoleCountInState.team == team,
-                PlayerRoleCountInState.side == side,
-                PlayerRoleCountInState.gsis_id.in_(lineup),
-            )
-        )
-    ).all()
-
-    roles_map: Dict[str, Dict[str, int]] = {}
-    for row in role_rows:
-        roles_map.setdefault(row.gsis_id, {})[row.role] = row.snaps
-
-    player_scores: List[PlayerScore] = []
-    ius_values: List[float] = []
-    dominant_roles: Dict[str, str | None] = {}
-    for player_id in lineup:
-        counts = roles_map.get(player_id, {})
-        total_snaps = sum(counts.values())
-        if total_snaps == 0:
-            ius = 0.0
-        elif len(counts) == 1:
-            ius = 1.0
-        else:
-            entropy = 0.0
-            for snaps in counts.values():
-                prob = snaps / total_snaps
-                if prob > 0:
-                    entropy -= prob * math.log(prob)
-            max_entropy = math.log(len(counts)) if len(counts) > 1 else 1.0
-            ius = 1.0 - (entropy / max_entropy if max_entropy else 0.0)
-        dominant_roles[player_id] = max(counts.items(), key=lambda kv: kv[1])[0] if counts else None
-        ius_values.append(ius)
-        player_scores.append(
-            PlayerScore(
-                gsis_id=player_id,
-                snaps_in_state=snaps_map.get(player_id, 0),
-                ius=ius,
-                roles=counts,
-            )
-        )
 
-    LIU = _mean(ius_values)
-
-    pair_weights_rows = session.execute(
-        select(RolePairWeight.role_a, RolePairWeight.role_b, RolePairWeight.weight)
-        .where(RolePairWeight.side == side)
-    ).all()
-    pair_weights: Dict[Tuple[str, str], float] = {}
-    for row in pair_weights_rows:
-        pair_weights[(row.role_a, row.role_b)] = _safe_float(row.weight)
-
-    positions_rows = session.execute(
-        select(Player.gsis_id, Player.position).where(Player.gsis_id.in_(lineup))
-    ).all()
-    position_map: Dict[str, str | None] = {row.gsis_id: row.position for row in positions_rows}
-
-    co_rows = session.execute(
-        select(CoSnaps.a_gsis, CoSnaps.b_gsis, CoSnaps.co_snaps)
-        .where(
-            and_(
-                CoSnaps.system_state_id == system_state_id,
-                CoSnaps.team == team,
-                CoSnaps.side == side,
-                CoSnaps.a_gsis.in_(lineup),
-                CoSnaps.b_gsis.in_(lineup),
-            )
-        )
-    ).all()
-    co_map: Dict[Tuple[str, str], int] = {}
-    for row in co_rows:
-        key = tuple(sorted((row.a_gsis, row.b_gsis)))
-        co_map[key] = row.co_snaps
-
-    pair_edges: List[PairEdge] = []
-    weight_total = 0.0
-    weighted_sum = 0.0
-
-    for a, b in itertools.combinations(lineup, 2):
-        role_a = dominant_roles.get(a) or position_map.get(a)
-        role_b = dominant_roles.get(b) or position_map.get(b)
-        if not role_a or not role_b:
-            continue
-        weight = pair_weights.get((role_a, role_b)) or pair_weights.get((role_b, role_a))
-        if weight is None:
-            continue
+def _lineup_cube(session: Session, cube: StateCube, player_ids: Iterable[str]) -> StateCube:
+    """Make sure every given player has a row in ``cube``.
+
+    Players without snaps in the state only need their roster position (for the pair
+    weights), so this issues a query solely when such players are present.
+    """
+    missing = _missing_players(cube, player_ids)
+    if not missing:
+        return cube
+    return _with_positions(cube, missing, session.execute(_positions_statement(missing)).all())
+
+
+async def _lineup_cube_async(session: AsyncSession, cube: StateCube, player_ids: Iterable[str]) -> StateCube:
+    missing = _missing_players(cube, player_ids)
+    if not missing:
+        return cube
+    return _with_positions(cube, missing, (await session.execute(_positions_statement(missing))).all())
+
+
+def _pair_arrays(cube: StateCube, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Co-snaps, Jaccard and role weights for every pair of each lineup in ``idx`` (L x 11)."""
+    rows, cols = idx[:, :, None], idx[:, None, :]
+    co = cube.co_snaps[rows, cols]
+    n = cube.snaps[idx]
+    denom = n[:, :, None] + n[:, None, :] - co
+    jaccard = np.divide(co, denom, out=np.zeros(co.shape), where=denom > 0)
+    return co, jaccard, cube.weights[rows, cols]
+
+
+def _score_indices(cube: StateCube, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorised LSU/LIU/LIC/cohesion for a stack of lineups given as cube row indices."""
+    snaps = cube.snaps[idx]
+    if cube.team_snaps:
+        LSU = snaps.mean(axis=1) / cube.team_snaps
+    else:
+        LSU = np.zeros(len(idx))
+    LIU = cube.ius[idx].mean(axis=1)
+
+    _, jaccard, weights = _pair_arrays(cube, idx)
+    size = idx.shape[1]
+    counted = np.triu(np.ones((size, size), dtype=bool), k=1) & ~np.isnan(weights)
+    weights = np.where(counted, weights, 0.0)
+    weight_total = weights.sum(axis=(1, 2))
+    weighted_sum = (weights * jaccard).sum(axis=(1, 2))
+    LIC = np.divide(weighted_sum, weight_total, out=np.zeros(len(idx)), where=weight_total > WEIGHT_EPSILON)
+    return LSU, LIU, LIC, _cohesion(LSU, LIU, LIC)
+
 
-        n_i = snaps_map.get(a, 0)
-        n_j = snaps_map.get(b, 0)
-        co_snaps = co_map.get(tuple(sorted((a, b))), 0)
-        denom = n_i + n_j - co_snaps
-        jaccard = (co_snaps / denom) if denom > 0 else 0.0
+def _zero_snap_warnings(cube: StateCube, lineup: Sequence[str], idx: np.ndarray) -> List[str]:
+    return [
+        f"Player {player_id} has zero snaps in this system state"
+        for player_id, i in zip(lineup, idx)
+        if cube.snaps[i] == 0
+    ]
 
-        weighted_sum += weight * jaccard
-        weight_total += weight
-        pair_edges.append(
+
+def _pair_edges(cube: StateCube, lineup: Sequence[str], idx: np.ndarray) -> List[PairEdge]:
+    co, jaccard, weights = (arr[0] for arr in _pair_arrays(cube, idx[None, :]))
+    edges: List[PairEdge] = []
+    for i, j in zip(*np.triu_indices(len(lineup), k=1)):
+        weight = weights[i, j]
+        if np.isnan(weight):
+            continue
+        edges.append(
             PairEdge(
-                a=a,
-                b=b,
-                weight=weight,
-                jaccard=jaccard,
-                co_snaps=co_snaps,
-                n_i=n_i,
-                n_j=n_j,
+                a=lineup[i],
+                b=lineup[j],
+                weight=float(weight),
+                jaccard=float(jaccard[i, j]),
+                co_snaps=int(co[i, j]),
+                n_i=int(cube.snaps[idx[i]]),
+                n_j=int(cube.snaps[idx[j]]),
             )
         )
+    return edges
+
+
+def _unique_lineup(lineup: Sequence[str]) -> List[str]:
+    lineup = list(dict.fromkeys(lineup))
+    if len(lineup) != 11:
+        raise ValueError("Lineup must contain exactly 11 unique players")
+    return lineup
 
-    LIC = weighted_sum / weight_total if weight_total else 0.0
 
-    cohesion = 0.35 * LSU + 0.20 * LIU + 0.45 * LIC
+def _lineup_score(cube: StateCube, lineup: Sequence[str]) -> LineupScoreResponse:
+    idx = np.array([cube.index[pid] for pid in lineup], dtype=np.intp)
 
-    state = session.get(SystemState, system_state_id)
-    playcaller_label = None
-    if state:
-        role = state.role or "Play Caller"
-        window = ""
-        if state.window_start and state.window_end:
-            window = f" — {state.window_start} to {state.window_end}"
-        elif state.window_start:
-            window = f" — from {state.window_start}"
-        playcaller_label = f"{state.coach_name or state.coach_id} ({role}){window}"
+    LSU, LIU, LIC, cohesion = (float(values[0]) for values in _score_indices(cube, idx[None, :]))
 
-    warnings: List[str] = []
-    for player_id, snaps in zip(lineup, snaps_values):
-        if snaps == 0:
-            warnings.append(f"Player {player_id} has zero snaps in this system state")
+    player_scores = [
+        PlayerScore(
+            gsis_id=player_id,
+            snaps_in_state=int(cube.snaps[i]),
+            ius=float(cube.ius[i]),
+            roles=cube.roles_for(i),
+        )
+        for player_id, i in zip(lineup, idx)
+    ]
 
     return LineupScoreResponse(
         LSU=LSU,
         LIU=LIU,
         LIC=LIC,
         cohesion=cohesion,
-        warnings=warnings,
+        warnings=_zero_snap_warnings(cube, lineup, idx),
         per_player=player_scores,
-        pair_edges=pair_edges,
-        playcaller_label=playcaller_label,
+        pair_edges=_pair_edges(cube, lineup, idx),
+        playcaller_label=cube.playcaller_label,
     )
 
+
+def compute_lineup_score(
+    session: Session,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    lineup: Sequence[str],
+) -> LineupScoreResponse:
+    lineup = _unique_lineup(lineup)
+    cube = get_state_cube(session, system_state_id=system_state_id, team=team, side=side)
+    return _lineup_score(_lineup_cube(session, cube, lineup), lineup)
+
+
+async def compute_lineup_score_async(
+    session: AsyncSession,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    lineup: Sequence[str],
+) -> LineupScoreResponse:
+    lineup = _unique_lineup(lineup)
+    cube = await get_state_cube_async(session, system_state_id=system_state_id, team=team, side=side)
+    return _lineup_score(await _lineup_cube_async(session, cube, lineup), lineup)
+
+
+def score_lineups(
+    session: Session,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    lineups: Sequence[Sequence[str]],
+    include_pair_edges: bool = False,
+) -> LineupBatchScoreResponse:
+    """Score many lineups of one system state with a single pass of array operations."""
+    lineups = _checked_lineups(lineups)
+    cube = get_state_cube(session, system_state_id=system_state_id, team=team, side=side)
+    cube = _lineup_cube(session, cube, (pid for lineup in lineups for pid in lineup))
+    return _batch_scores(cube, lineups, include_pair_edges=include_pair_edges)
+
+
+async def score_lineups_async(
+    session: AsyncSession,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    lineups: Sequence[Sequence[str]],
+    include_pair_edges: bool = False,
+) -> LineupBatchScoreResponse:
+    lineups = _checked_lineups(lineups)
+    cube = await get_state_cube_async(session, system_state_id=system_state_id, team=team, side=side)
+    cube = await _lineup_cube_async(session, cube, (pid for lineup in lineups for pid in lineup))
+    # large batches are seconds of array work; keep it off the event loop
+    return await run_in_threadpool(_batch_scores, cube, lineups, include_pair_edges=include_pair_edges)
+
+
+def _checked_lineups(lineups: Sequence[Sequence[str]]) -> List[List[str]]:
+    lineups = [list(lineup) for lineup in lineups]
+    for position, lineup in enumerate(lineups):
+        if len(lineup) != 11 or len(set(lineup)) != 11:
+            raise ValueError(f"Lineup {position} must contain exactly 11 unique players")
+    return lineups
+
+
+def _batch_scores(
+    cube: StateCube, lineups: List[List[str]], *, include_pair_edges: bool
+) -> LineupBatchScoreResponse:
+    idx = np.array([[cube.index[pid] for pid in lineup] for lineup in lineups], dtype=np.intp).reshape(-1, 11)
+
+    scores = [np.empty(len(lineups)) for _ in range(4)]
+    for start in range(0, len(lineups), BATCH_CHUNK_SIZE):
+        chunk = slice(start, start + BATCH_CHUNK_SIZE)
+        for out, values in zip(scores, _score_indices(cube, idx[chunk])):
+            out[chunk] = values
+    LSU, LIU, LIC, cohesion = (values.tolist() for values in scores)
+    has_zero_snaps = (cube.snaps[idx] == 0).any(axis=1)
+
+    results: List[LineupBatchScore] = []
+    for position, lineup in enumerate(lineups):
+        results.append(
+            LineupBatchScore(
+                lineup=lineup,
+                LSU=LSU[position],
+                LIU=LIU[position],
+                LIC=LIC[position],
+                cohesion=cohesion[position],
+                warnings=_zero_snap_warnings(cube, lineup, idx[position]) if has_zero_snaps[position] else [],
+                pair_edges=_pair_edges(cube, lineup, idx[position]) if include_pair_edges else None,
+            )
+        )
+    return LineupBatchScoreResponse(results=results, playcaller_label=cube.playcaller_label)
+
+
+def score_swaps(
+    session: Session,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    lineup: Sequence[str],
+    swaps: Sequence[Tuple[str, str]] = (),
+    candidates_for: Sequence[str] = (),
+) -> LineupSwapResponse:
+    """Score single-player substitutions against a base lineup, best improvement first.
+
+    A swap only touches the ten pairs of the outgoing player plus one snap and one IUS
+    term, so each candidate is scored from the base lineup's per-player pair sums.
+    ``candidates_for`` adds a swap for every in-state player not already in the lineup.
+    """
+    lineup = _unique_lineup(lineup)
+    cube = get_state_cube(session, system_state_id=system_state_id, team=team, side=side)
+    pairs = _swap_pairs(cube, lineup, swaps, candidates_for)
+    cube = _lineup_cube(session, cube, list(lineup) + [in_player for _, in_player in pairs])
+    return _swap_scores(cube, lineup, pairs)
+
+
+async def score_swaps_async(
+    session: AsyncSession,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    lineup: Sequence[str],
+    swaps: Sequence[Tuple[str, str]] = (),
+    candidates_for: Sequence[str] = (),
+) -> LineupSwapResponse:
+    lineup = _unique_lineup(lineup)
+    cube = await get_state_cube_async(session, system_state_id=system_state_id, team=team, side=side)
+    pairs = _swap_pairs(cube, lineup, swaps, candidates_for)
+    cube = await _lineup_cube_async(session, cube, list(lineup) + [in_player for _, in_player in pairs])
+    return await run_in_threadpool(_swap_scores, cube, lineup, pairs)
+
+
+def _swap_pairs(
+    cube: StateCube, lineup: Sequence[str], swaps: Sequence[Tuple[str, str]], candidates_for: Sequence[str]
+) -> List[Tuple[str, str]]:
+    members = set(lineup)
+    generated = ((out_player, pid) for out_player in candidates_for for pid in cube.player_ids if pid not in members)
+    # explicit swaps first, then roster candidates; each (out, in) pair is scored once
+    pairs = list(dict.fromkeys(itertools.chain(map(tuple, swaps), generated)))
+    for out_player, in_player in pairs:
+        if out_player not in members:
+            raise ValueError(f"Player {out_player} is not in the lineup")
+        if in_player in members:
+            raise ValueError(f"Player {in_player} is already in the lineup")
+    return pairs
+
+
+def _swap_scores(cube: StateCube, lineup: Sequence[str], pairs: Sequence[Tuple[str, str]]) -> LineupSwapResponse:
+    idx = np.array([cube.index[pid] for pid in lineup], dtype=np.intp)
+    LSU, LIU, LIC, cohesion = (float(values[0]) for values in _score_indices(cube, idx[None, :]))
+
+    _, jaccard, weights = (arr[0] for arr in _pair_arrays(cube, idx[None, :]))
+    weights = np.nan_to_num(weights, nan=0.0)
+    np.fill_diagonal(weights, 0.0)
+    weight_total = np.triu(weights, k=1).sum()
+    weighted_sum = np.triu(weights * jaccard, k=1).sum()
+    # what each lineup slot contributes to the LIC numerator and denominator
+    slot_weight = weights.sum(axis=1)
+    slot_weighted = (weights * jaccard).sum(axis=1)
+
+    slot_of = {pid: position for position, pid in enumerate(lineup)}
+    out_slots = np.array([slot_of[out_player] for out_player, _ in pairs], dtype=np.intp)
+    incoming = np.array([cube.index[in_player] for _, in_player in pairs], dtype=np.intp)
+
+    new_weights = np.nan_to_num(cube.weights[incoming[:, None], idx[None, :]], nan=0.0)
+    new_weights[np.arange(len(pairs)), out_slots] = 0.0
+    co = cube.co_snaps[incoming[:, None], idx[None, :]]
+    denom = cube.snaps[incoming][:, None] + cube.snaps[idx][None, :] - co
+    new_jaccard = np.divide(co, denom, out=np.zeros(co.shape), where=denom > 0)
+
+    swap_weight = weight_total - slot_weight[out_slots] + new_weights.sum(axis=1)
+    swap_weighted = weighted_sum - slot_weighted[out_slots] + (new_weights * new_jaccard).sum(axis=1)
+    swap_LIC = np.divide(swap_weighted, swap_weight, out=np.zeros(len(pairs)), where=swap_weight > WEIGHT_EPSILON)
+    outgoing = idx[out_slots]
+    if cube.team_snaps:
+        swap_LSU = LSU + (cube.snaps[incoming] - cube.snaps[outgoing]) / (11 * cube.team_snaps)
+    else:
+        swap_LSU = np.zeros(len(pairs))
+    swap_LIU = LIU + (cube.ius[incoming] - cube.ius[outgoing]) / 11
+    swap_cohesion = _cohesion(swap_LSU, swap_LIU, swap_LIC)
+
+    results = [
+        SwapDelta(
+            out_player=out_player,
+            in_player=in_player,
+            LSU=float(swap_LSU[n]),
+            LIU=float(swap_LIU[n]),
+            LIC=float(swap_LIC[n]),
+            cohesion=float(swap_cohesion[n]),
+            delta_LSU=float(swap_LSU[n] - LSU),
+            delta_LIU=float(swap_LIU[n] - LIU),
+            delta_LIC=float(swap_LIC[n] - LIC),
+            delta_cohesion=float(swap_cohesion[n] - cohesion),
+        )
+        for n, (out_player, in_player) in enumerate(pairs)
+    ]
+    results.sort(key=lambda delta: -delta.delta_cohesion)
+    return LineupSwapResponse(base=LineupScores(LSU=LSU, LIU=LIU, LIC=LIC, cohesion=cohesion), swaps=results)
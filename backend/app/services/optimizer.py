@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from math import comb
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..schemas import LineupOptimizeResponse, OptimizedLineup
+from .metrics import _cohesion, _lineup_cube, _score_indices
+from .state_cube import StateCube, get_state_cube
+
+TEMPLATE_PRESETS: Dict[str, Dict[str, Dict[str, int]]] = {
+    "offense": {
+        "11": {"QB": 1, "RB": 1, "TE": 1, "WR": 3, "OL": 5},
+        "12": {"QB": 1, "RB": 1, "TE": 2, "WR": 2, "OL": 5},
+        "21": {"QB": 1, "RB": 2, "TE": 1, "WR": 2, "OL": 5},
+    },
+    "defense": {
+        "4-3": {"DL": 4, "LB": 3, "CB": 2, "S": 2},
+        "3-4": {"DL": 3, "LB": 4, "CB": 2, "S": 2},
+        "4-2-5": {"DL": 4, "LB": 2, "CB": 3, "S": 2},
+        "4-1-6": {"DL": 4, "LB": 1, "CB": 4, "S": 2},
+    },
+}
+
+
+def resolve_template(template: str | Mapping[str, int], side: str) -> Dict[str, int]:
+    if isinstance(template, str):
+        preset = TEMPLATE_PRESETS.get(side, {}).get(template)
+        if preset is None:
+            raise ValueError(f"Unknown {side} template: {template}")
+        return dict(preset)
+    resolved = {role: int(count) for role, count in template.items() if count}
+    if sum(resolved.values()) != 11 or any(count < 0 for count in resolved.values()):
+        raise ValueError("Template counts must be non-negative and sum to 11")
+    return resolved
+
+
+@dataclass
+class _Partial:
+    chosen: Tuple[int, ...]
+    last_pos: int
+    snap_sum: float
+    ius_sum: float
+    ws: float
+    wt: float
+    # weighted-Jaccard / weight sums of every player against the chosen set, so that
+    # scoring one more candidate is a lookup instead of a pass over the lineup
+    acc_ws: np.ndarray
+    acc_wt: np.ndarray
+
+
+class _BeamSearch:
+    """Beam search over template slots with upper-bound pruning against the top-k found so far."""
+
+    def __init__(
+        self,
+        cube: StateCube,
+        template: Mapping[str, int],
+        *,
+        locked: Sequence[str],
+        excluded: Sequence[str],
+    ) -> None:
+        self.cube = cube
+        snaps = cube.snaps.astype(float)
+        denom = snaps[:, None] + snaps[None, :] - cube.co_snaps
+        jaccard = np.divide(cube.co_snaps, denom, out=np.zeros(denom.shape), where=denom > 0)
+        valid = ~np.isnan(cube.weights)
+        np.fill_diagonal(valid, False)
+        self.pair_weight = np.where(valid, cube.weights, 0.0)
+        self.pair_score = self.pair_weight * jaccard
+        # best Jaccard each player can reach with anyone it has a weighted pair with
+        self.best_jaccard = np.where(valid, jaccard, 0.0).max(axis=1, initial=0.0)
+        self.snaps = snaps
+        self.lsu_scale = 0.0 if not cube.team_snaps else 1.0 / (11 * cube.team_snaps)
+        self.explored = 0
+
+        locked_idx = [cube.index[pid] for pid in locked]
+        remaining = dict(template)
+        for pid, i in zip(locked, locked_idx):
+            role = cube.role_labels[i]
+            if not remaining.get(role):
+                raise ValueError(f"Locked player {pid} ({role or 'no role'}) does not fit the template")
+            remaining[role] -= 1
+
+        blocked = set(locked_idx) | {cube.index[pid] for pid in excluded if pid in cube.index}
+        self.candidates: Dict[str, np.ndarray] = {}
+        for role, need in remaining.items():
+            members = [i for i, label in enumerate(cube.role_labels) if label == role and i not in blocked]
+            if len(members) < need:
+                raise ValueError(f"Not enough {role} candidates: need {need}, found {len(members)}")
+            # strongest candidates first so narrow beams and the greedy pass start well
+            self.candidates[role] = np.array(sorted(members, key=lambda i: -snaps[i]), dtype=np.intp)
+
+        # scarce roles first keeps the early beam levels small
+        order = sorted(
+            (role for role in remaining if remaining[role]),
+            key=lambda role: comb(len(self.candidates[role]), remaining[role]),
+        )
+        self.slots: List[str] = [role for role in order for _ in range(remaining[role])]
+        self._bounds()
+
+        idx = np.array(locked_idx, dtype=np.intp)
+        upper = np.triu(np.ones((len(idx), len(idx)), dtype=bool), k=1)
+        self.root = _Partial(
+            chosen=tuple(locked_idx),
+            last_pos=-1,
+            snap_sum=float(snaps[idx].sum()),
+            ius_sum=float(cube.ius[idx].sum()),
+            ws=float(self.pair_score[np.ix_(idx, idx)][upper].sum()),
+            wt=float(self.pair_weight[np.ix_(idx, idx)][upper].sum()),
+            acc_ws=self.pair_score[:, idx].sum(axis=1),
+            acc_wt=self.pair_weight[:, idx].sum(axis=1),
+        )
+
+    def _bounds(self) -> None:
+        """Optimistic LSU/LIU/LIC completions for each depth of the slot sequence."""
+        depth = len(self.slots)
+        self.snap_bound = np.zeros(depth + 1)
+        self.ius_bound = np.zeros(depth + 1)
+        self.jaccard_bound = np.zeros(depth + 1)
+        for d in range(depth):
+            left: Dict[str, int] = {}
+            for role in self.slots[d:]:
+                left[role] = left.get(role, 0) + 1
+            for role, need in left.items():
+                cands = self.candidates[role]
+                self.snap_bound[d] += np.sort(self.snaps[cands])[::-1][:need].sum()
+                self.ius_bound[d] += np.sort(self.cube.ius[cands])[::-1][:need].sum()
+                self.jaccard_bound[d] = max(self.jaccard_bound[d], self.best_jaccard[cands].max(initial=0.0))
+
+    def _estimate(self, depth: int, snap_sum, ius_sum, ws, wt):
+        """Return (upper bound, beam ranking) for partial lineups that filled ``depth`` slots."""
+        lsu = (snap_sum + self.snap_bound[depth]) * self.lsu_scale
+        liu = (ius_sum + self.ius_bound[depth]) / 11
+        lic = np.divide(ws, wt, out=np.zeros(np.shape(ws)), where=wt > 0)
+        if depth == len(self.slots):
+            return _cohesion(lsu, liu, lic), _cohesion(lsu, liu, lic)
+        jaccard_bound = self.jaccard_bound[depth]
+        upper = _cohesion(lsu, liu, np.maximum(lic, jaccard_bound))
+        ranking = _cohesion(lsu, liu, np.where(wt > 0, lic, jaccard_bound))
+        return upper, ranking
+
+    def run(self, *, beam_width: int, top_k: int, floor: float, deadline: float) -> Tuple[List[_Partial], bool]:
+        beam = [self.root]
+        timed_out = False
+        for depth, role in enumerate(self.slots):
+            if not timed_out and time.perf_counter() > deadline:
+                # out of time: finish the best partial lineups greedily
+                timed_out = True
+                beam_width = min(beam_width, top_k)
+            continues_role = depth > 0 and self.slots[depth - 1] == role
+            cands = self.candidates[role]
+            # leave enough later candidates for the rest of this role's slots
+            stop = len(cands) - self.slots[depth:].count(role) + 1
+
+            parents, picks, snap_sum, ius_sum, ws, wt = [], [], [], [], [], []
+            for p, parent in enumerate(beam):
+                start = parent.last_pos + 1 if continues_role else 0
+                positions = np.arange(start, stop)
+                if not len(positions):
+                    continue
+                chosen = cands[positions]
+                parents.append(np.full(len(positions), p))
+                picks.append(positions)
+                snap_sum.append(parent.snap_sum + self.snaps[chosen])
+                ius_sum.append(parent.ius_sum + self.cube.ius[chosen])
+                ws.append(parent.ws + parent.acc_ws[chosen])
+                wt.append(parent.wt + parent.acc_wt[chosen])
+            if not parents:
+                return [], timed_out
+
+            parents, picks = np.concatenate(parents), np.concatenate(picks)
+            snap_sum, ius_sum = np.concatenate(snap_sum), np.concatenate(ius_sum)
+            ws, wt = np.concatenate(ws), np.concatenate(wt)
+            self.explored += len(picks)
+
+            upper, ranking = self._estimate(depth + 1, snap_sum, ius_sum, ws, wt)
+            keep = np.flatnonzero(upper > floor)
+            if len(keep) > beam_width:
+                keep = keep[np.argpartition(-ranking[keep], beam_width - 1)[:beam_width]]
+            keep = keep[np.argsort(-ranking[keep], kind="stable")]
+
+            next_beam: List[_Partial] = []
+            for c in keep:
+                parent = beam[parents[c]]
+                player = cands[picks[c]]
+                next_beam.append(
+                    _Partial(
+                        chosen=parent.chosen + (int(player),),
+                        last_pos=int(picks[c]),
+                        snap_sum=float(snap_sum[c]),
+                        ius_sum=float(ius_sum[c]),
+                        ws=float(ws[c]),
+                        wt=float(wt[c]),
+                        acc_ws=parent.acc_ws + self.pair_score[:, player],
+                        acc_wt=parent.acc_wt + self.pair_weight[:, player],
+                    )
+                )
+            beam = next_beam
+        return beam, timed_out
+
+
+def _exact(cube: StateCube, lineups: List[Tuple[int, ...]]) -> Tuple[np.ndarray, ...]:
+    if not lineups:
+        empty = np.zeros(0)
+        return empty, empty, empty, empty
+    return _score_indices(cube, np.array(lineups, dtype=np.intp))
+
+
+def optimize_lineup(
+    session: Session,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    template: str | Mapping[str, int],
+    locked: Sequence[str] = (),
+    excluded: Sequence[str] = (),
+    top_k: int = 5,
+    beam_width: int = 256,
+    time_budget_ms: int = 1000,
+) -> LineupOptimizeResponse:
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    template = resolve_template(template, side)
+    locked = list(dict.fromkeys(locked))
+    if set(locked) & set(excluded):
+        raise ValueError("A player cannot be both locked and excluded")
+
+    cube = get_state_cube(session, system_state_id=system_state_id, team=team, side=side)
+    cube = _lineup_cube(session, cube, locked)
+    search = _BeamSearch(cube, template, locked=locked, excluded=excluded)
+
+    # a narrow greedy pass gives the incumbents whose k-th score prunes the wide search
+    found, _ = search.run(beam_width=top_k, top_k=top_k, floor=-np.inf, deadline=np.inf)
+    floor = -np.inf
+    if len(found) >= top_k:
+        floor = min(_exact(cube, [p.chosen for p in found])[3]) - 1e-12
+    wide, timed_out = search.run(beam_width=max(beam_width, top_k), top_k=top_k, floor=floor, deadline=deadline)
+
+    lineups: Dict[frozenset, Tuple[int, ...]] = {}
+    for partial in found + wide:
+        lineups.setdefault(frozenset(partial.chosen), partial.chosen)
+    ordered = list(lineups.values())
+    LSU, LIU, LIC, cohesion = _exact(cube, ordered)
+    ranking = np.argsort(-cohesion, kind="stable")[:top_k]
+
+    slot_order = {role: r for r, role in enumerate(template)}
+    results: List[OptimizedLineup] = []
+    for r in ranking:
+        players = sorted(ordered[r], key=lambda i: (slot_order.get(cube.role_labels[i], len(slot_order)), -cube.snaps[i]))
+        slots: Dict[str, List[str]] = {}
+        for i in players:
+            slots.setdefault(cube.role_labels[i], []).append(cube.player_ids[i])
+        results.append(
+            OptimizedLineup(
+                lineup=[cube.player_ids[i] for i in players],
+                slots=slots,
+                LSU=float(LSU[r]),
+                LIU=float(LIU[r]),
+                LIC=float(LIC[r]),
+                cohesion=float(cohesion[r]),
+            )
+        )
+
+    return LineupOptimizeResponse(
+        lineups=results,
+        template=template,
+        explored=search.explored,
+        timed_out=timed_out,
+        playcaller_label=cube.playcaller_label,
+    )
+
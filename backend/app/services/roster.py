@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import List, Optional, Sequence
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Row, Select, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..models import Player, PlayerRoleCountInState, PlayerSnapsInState
+from ..models import Player, PlayerRosterFacts, PlayerSnapsInState
 from ..schemas import RosterPlayer
 
 POSITION_GROUP_MAP = {
@@ -14,6 +14,7 @@ POSITION_GROUP_MAP = {
     "RB": "RB",
     "FB": "RB",
     "HB": "RB",
+    "TB": "RB",
     "WR": "WR",
     "TE": "TE",
     "OL": "OL",
@@ -23,6 +24,7 @@ POSITION_GROUP_MAP = {
     "RG": "OL",
     "C": "OL",
     "G": "OL",
+    "T": "OL",
     "OT": "OL",
     "DT": "DL",
     "NT": "DL",
@@ -48,21 +50,70 @@ def _position_group(position: Optional[str]) -> Optional[str]:
     return POSITION_GROUP_MAP.get(position, position)
 
 
-def _ius_from_counts(counts: Dict[str, int]) -> float:
-    total = sum(counts.values())
-    if total == 0:
-        return 0.0
-    if len(counts) == 1:
-        return 1.0
-    import math
+def _roster_statement(*, team: str, side: str, system_state_id: Optional[str]) -> Select:
+    """One join over the materialised roster rows: a state's players, or the team's over all states.
 
-    entropy = 0.0
-    for snaps in counts.values():
-        prob = snaps / total
-        if prob > 0:
-            entropy -= prob * math.log(prob)
-    max_entropy = math.log(len(counts)) if len(counts) > 1 else 1.0
-    return 1.0 - (entropy / max_entropy if max_entropy else 0.0)
+    With a state, IUS, dominant role and role breakdown are the per-state values from
+    ``player_snaps_in_state``; without one they come from ``player_roster_facts``.
+    """
+    if system_state_id:
+        return (
+            select(
+                PlayerSnapsInState.gsis_id,
+                PlayerSnapsInState.snaps,
+                PlayerSnapsInState.ius,
+                PlayerSnapsInState.dominant_role,
+                PlayerSnapsInState.roles,
+                PlayerRosterFacts.n_system_states_seen,
+                Player.display_name,
+                Player.position,
+            )
+            .join(Player, Player.gsis_id == PlayerSnapsInState.gsis_id)
+            .outerjoin(
+                PlayerRosterFacts,
+                and_(
+                    PlayerRosterFacts.team == PlayerSnapsInState.team,
+                    PlayerRosterFacts.side == PlayerSnapsInState.side,
+                    PlayerRosterFacts.gsis_id == PlayerSnapsInState.gsis_id,
+                ),
+            )
+            .where(PlayerSnapsInState.system_state_id == system_state_id)
+            .where(PlayerSnapsInState.team == team)
+            .where(PlayerSnapsInState.side == side)
+        )
+    return (
+        select(
+            PlayerRosterFacts.gsis_id,
+            PlayerRosterFacts.total_snaps.label("snaps"),
+            PlayerRosterFacts.ius,
+            PlayerRosterFacts.dominant_role,
+            PlayerRosterFacts.roles,
+            PlayerRosterFacts.n_system_states_seen,
+            Player.display_name,
+            Player.position,
+        )
+        .join(Player, Player.gsis_id == PlayerRosterFacts.gsis_id)
+        .where(PlayerRosterFacts.team == team)
+        .where(PlayerRosterFacts.side == side)
+    )
+
+
+def _roster(rows: Sequence[Row]) -> List[RosterPlayer]:
+    roster = [
+        RosterPlayer(
+            gsis_id=row.gsis_id,
+            name=row.display_name or row.gsis_id,
+            position=row.position,
+            position_group=row.dominant_role or _position_group(row.position),
+            snaps_in_state=row.snaps or 0,
+            ius=row.ius or 0.0,
+            roles_breakdown=dict(row.roles or {}),
+            n_system_states_seen=row.n_system_states_seen or 0,
+        )
+        for row in rows
+    ]
+    roster.sort(key=lambda r: (-r.snaps_in_state, r.name))
+    return roster
 
 
 def get_roster(
@@ -72,83 +123,16 @@ def get_roster(
     side: str,
     system_state_id: Optional[str] = None,
 ) -> List[RosterPlayer]:
-    snaps_query = select(PlayerSnapsInState).where(
-        and_(
-            PlayerSnapsInState.team == team,
-            PlayerSnapsInState.side == side,
-        )
-    )
-    if system_state_id:
-        snaps_query = snaps_query.where(PlayerSnapsInState.system_state_id == system_state_id)
+    """Players of a system state (or of every state of the team) with their precomputed role facts."""
+    return _roster(session.execute(_roster_statement(team=team, side=side, system_state_id=system_state_id)).all())
 
-    snaps_rows = session.execute(snaps_query).scalars().all()
-    player_ids = [row.gsis_id for row in snaps_rows]
-    snaps_by_player = {row.gsis_id: row.snaps for row in snaps_rows}
-
-    role_query = select(
-        PlayerRoleCountInState.gsis_id,
-        PlayerRoleCountInState.role,
-        PlayerRoleCountInState.snaps,
-    ).where(
-        and_(
-            PlayerRoleCountInState.team == team,
-            PlayerRoleCountInState.side == side,
-        )
-    )
-    if system_state_id:
-        role_query = role_query.where(PlayerRoleCountInState.system_state_id == system_state_id)
-    role_rows = session.execute(role_query).all()
-    roles_map: Dict[str, Dict[str, int]] = defaultdict(dict)
-    for row in role_rows:
-        roles_map[row.gsis_id][row.role] = row.snaps
-
-    players_map = {}
-    if player_ids:
-        players_rows = session.execute(
-            select(Player.gsis_id, Player.display_name, Player.position)
-            .where(Player.gsis_id.in_(player_ids))
-        ).all()
-        players_map = {row.gsis_id: row for row in players_rows}
-
-    if not player_ids and not system_state_id:
-        players_rows = session.execute(
-            select(Player.gsis_id, Player.display_name, Player.position)
-            .limit(100)
-        ).all()
-        players_map = {row.gsis_id: row for row in players_rows}
-
-    counts_rows = session.execute(
-        select(
-            PlayerSnapsInState.gsis_id,
-            func.count(func.distinct(PlayerSnapsInState.system_state_id)),
-        )
-        .where(PlayerSnapsInState.team == team)
-        .where(PlayerSnapsInState.side == side)
-        .group_by(PlayerSnapsInState.gsis_id)
-    ).all()
-    counts_map = {row[0]: int(row[1]) for row in counts_rows}
-
-    roster: List[RosterPlayer] = []
-    for player_id, player_row in players_map.items():
-        roles = roles_map.get(player_id, {})
-        position_group = None
-        if roles:
-            position_group = max(roles.items(), key=lambda kv: kv[1])[0]
-        else:
-            position_group = _position_group(player_row.position if player_row else None)
-        roster.append(
-            RosterPlayer(
-                gsis_id=player_id,
-                name=getattr(player_row, "display_name", player_id),
-                position=getattr(player_row, "position", None),
-                position_group=position_group,
-                snaps_in_state=snaps_by_player.get(player_id, 0),
-                ius=_ius_from_counts(roles),
-                roles_breakdown=roles,
-                n_system_states_seen=counts_map.get(player_id, 0),
-            )
-        )
-
-    roster.sort(key=lambda r: (-r.snaps_in_state, r.name))
-    return roster
 
+async def get_roster_async(
+    session: AsyncSession,
+    *,
+    team: str,
+    side: str,
+    system_state_id: Optional[str] = None,
+) -> List[RosterPlayer]:
+    statement = _roster_statement(team=team, side=side, system_state_id=system_state_id)
+    return _roster((await session.execute(statement)).all())
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Row, Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import gather_rows
+from ..models import (
+    CoSnaps,
+    Player,
+    PlayerSnapsInState,
+    RolePairWeight,
+    SystemState,
+    SystemStateTotals,
+)
+from .roster import _position_group
+
+CubeKey = Tuple[str, str, str]
+
+# rough allowance for the python objects around the arrays (ids, labels, dict slots)
+_CUBE_OVERHEAD_BYTES = 4096
+_PLAYER_OVERHEAD_BYTES = 256
+
+
+@dataclass
+class StateCube:
+    """Dense, index-addressable view of one (system_state_id, team, side).
+
+    Row ``i`` of every array refers to ``player_ids[i]``. ``co_snaps`` is symmetric
+    with a zero diagonal and ``weights`` holds the role pair weight between the two
+    players' roles, NaN where no weight is configured. ``ius``, ``role_labels`` and
+    ``player_roles`` come straight from the IUS, dominant role and role breakdown the
+    aggregate stage stores on ``player_snaps_in_state``.
+    """
+
+    system_state_id: str
+    team: str
+    side: str
+    team_snaps: int
+    player_ids: List[str]
+    snaps: np.ndarray
+    player_roles: List[Dict[str, int]]
+    ius: np.ndarray
+    role_labels: List[Optional[str]]
+    co_snaps: np.ndarray
+    weights: np.ndarray
+    pair_weights: Dict[Tuple[str, str], float]
+    playcaller_label: Optional[str] = None
+    index: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if not self.index:
+            self.index = {pid: i for i, pid in enumerate(self.player_ids)}
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.snaps, self.ius, self.co_snaps, self.weights)
+        overhead = _CUBE_OVERHEAD_BYTES + _PLAYER_OVERHEAD_BYTES * len(self.player_ids)
+        return sum(arr.nbytes for arr in arrays) + overhead
+
+    def roles_for(self, i: int) -> Dict[str, int]:
+        return dict(self.player_roles[i])
+
+    def with_players(self, positions: Mapping[str, Optional[str]]) -> "StateCube":
+        """Return a copy extended with zero-snap rows for players outside the state.
+
+        ``positions`` maps the extra GSIS ids to their roster position. Its position group
+        (``T`` -> ``OL``) becomes the role label, exactly as for in-state players without a
+        dominant role, so outsiders match template roles and pair weights.
+        """
+        extra = [pid for pid in positions if pid not in self.index]
+        if not extra:
+            return self
+        n, k = len(self.player_ids), len(extra)
+        co = np.zeros((n + k, n + k), dtype=self.co_snaps.dtype)
+        co[:n, :n] = self.co_snaps
+        labels = self.role_labels + [_position_group(positions[pid]) for pid in extra]
+        return StateCube(
+            system_state_id=self.system_state_id,
+            team=self.team,
+            side=self.side,
+            team_snaps=self.team_snaps,
+            player_ids=self.player_ids + extra,
+            snaps=np.concatenate([self.snaps, np.zeros(k, dtype=self.snaps.dtype)]),
+            player_roles=self.player_roles + [{} for _ in extra],
+            ius=np.concatenate([self.ius, np.zeros(k)]),
+            role_labels=labels,
+            co_snaps=co,
+            weights=_weight_matrix(labels, self.pair_weights),
+            pair_weights=self.pair_weights,
+            playcaller_label=self.playcaller_label,
+        )
+
+
+def _weight_matrix(labels: List[Optional[str]], pair_weights: Mapping[Tuple[str, str], float]) -> np.ndarray:
+    vocab = sorted({label for label in labels if label})
+    lookup = {label: i for i, label in enumerate(vocab)}
+    role_weights = np.full((len(vocab) + 1, len(vocab) + 1), np.nan)
+    for a in vocab:
+        for b in vocab:
+            weight = pair_weights.get((a, b)) or pair_weights.get((b, a))
+            if weight is not None:
+                role_weights[lookup[a], lookup[b]] = weight
+    # the trailing row/column stands for "no role" and stays NaN
+    codes = np.array([lookup.get(label, len(vocab)) if label else len(vocab) for label in labels], dtype=np.intp)
+    return role_weights[codes[:, None], codes[None, :]]
+
+
+def _playcaller_label(state: Row | SystemState | None) -> Optional[str]:
+    if state is None:
+        return None
+    role = state.role or "Play Caller"
+    window = ""
+    if state.window_start and state.window_end:
+        window = f" — {state.window_start} to {state.window_end}"
+    elif state.window_start:
+        window = f" — from {state.window_start}"
+    return f"{state.coach_name or state.coach_id} ({role}){window}"
+
+
+def _cube_statements(*, system_state_id: str, team: str, side: str) -> List[Select]:
+    """The independent reads behind one cube: snaps and role facts, pair weights, co-snaps, totals, state."""
+    return [
+        select(
+            PlayerSnapsInState.gsis_id,
+            PlayerSnapsInState.snaps,
+            PlayerSnapsInState.ius,
+            PlayerSnapsInState.dominant_role,
+            PlayerSnapsInState.roles,
+            Player.position,
+        )
+        .outerjoin(Player, Player.gsis_id == PlayerSnapsInState.gsis_id)
+        .where(
+            PlayerSnapsInState.system_state_id == system_state_id,
+            PlayerSnapsInState.team == team,
+            PlayerSnapsInState.side == side,
+        )
+        .order_by(PlayerSnapsInState.gsis_id),
+        select(RolePairWeight.role_a, RolePairWeight.role_b, RolePairWeight.weight).where(RolePairWeight.side == side),
+        select(CoSnaps.a_gsis, CoSnaps.b_gsis, CoSnaps.co_snaps).where(
+            CoSnaps.system_state_id == system_state_id,
+            CoSnaps.team == team,
+            CoSnaps.side == side,
+        ),
+        select(SystemStateTotals.team_snaps).where(
+            SystemStateTotals.system_state_id == system_state_id,
+            SystemStateTotals.team == team,
+            SystemStateTotals.side == side,
+        ),
+        select(
+            SystemState.coach_id,
+            SystemState.coach_name,
+            SystemState.role,
+            SystemState.window_start,
+            SystemState.window_end,
+        ).where(SystemState.system_state_id == system_state_id),
+    ]
+
+
+def _build_cube(
+    *,
+    system_state_id: str,
+    team: str,
+    side: str,
+    snaps_rows: Sequence[Row],
+    weight_rows: Sequence[Row],
+    co_rows: Sequence[Row],
+    totals_rows: Sequence[Row],
+    state_rows: Sequence[Row],
+) -> StateCube:
+    player_ids = [row.gsis_id for row in snaps_rows]
+    index = {pid: i for i, pid in enumerate(player_ids)}
+    snaps = np.array([row.snaps or 0 for row in snaps_rows], dtype=np.int64)
+
+    ius = np.array([row.ius or 0.0 for row in snaps_rows], dtype=np.float64)
+    role_labels: List[Optional[str]] = [row.dominant_role or _position_group(row.position) for row in snaps_rows]
+
+    pair_weights: Dict[Tuple[str, str], float] = {}
+    for row in weight_rows:
+        pair_weights[(row.role_a, row.role_b)] = float(row.weight) if row.weight is not None else 0.0
+
+    co_snaps = np.zeros((len(player_ids), len(player_ids)), dtype=np.int64)
+    if co_rows:
+        a = np.array([index.get(row.a_gsis, -1) for row in co_rows], dtype=np.intp)
+        b = np.array([index.get(row.b_gsis, -1) for row in co_rows], dtype=np.intp)
+        values = np.array([row.co_snaps or 0 for row in co_rows], dtype=np.int64)
+        keep = (a >= 0) & (b >= 0)
+        co_snaps[a[keep], b[keep]] = values[keep]
+        co_snaps[b[keep], a[keep]] = values[keep]
+
+    return StateCube(
+        system_state_id=system_state_id,
+        team=team,
+        side=side,
+        team_snaps=int(totals_rows[0].team_snaps) if totals_rows else 0,
+        player_ids=player_ids,
+        snaps=snaps,
+        player_roles=[dict(row.roles or {}) for row in snaps_rows],
+        ius=ius,
+        role_labels=role_labels,
+        co_snaps=co_snaps,
+        weights=_weight_matrix(role_labels, pair_weights),
+        pair_weights=pair_weights,
+        playcaller_label=_playcaller_label(state_rows[0] if state_rows else None),
+        index=index,
+    )
+
+
+_CUBE_ROWS = ("snaps_rows", "weight_rows", "co_rows", "totals_rows", "state_rows")
+
+
+def load_state_cube(session: Session, *, system_state_id: str, team: str, side: str) -> StateCube:
+    """Read everything lineup scoring needs for one system state in a fixed number of queries."""
+    statements = _cube_statements(system_state_id=system_state_id, team=team, side=side)
+    rows = [session.execute(statement).all() for statement in statements]
+    return _build_cube(system_state_id=system_state_id, team=team, side=side, **dict(zip(_CUBE_ROWS, rows)))
+
+
+async def load_state_cube_async(session: AsyncSession, *, system_state_id: str, team: str, side: str) -> StateCube:
+    """:func:`load_state_cube` with its independent queries in flight at the same time."""
+    statements = _cube_statements(system_state_id=system_state_id, team=team, side=side)
+    rows = await gather_rows(session, *statements)
+    return _build_cube(system_state_id=system_state_id, team=team, side=side, **dict(zip(_CUBE_ROWS, rows)))
+
+
+@dataclass
+class _CacheEntry:
+    cube: StateCube
+    generation: int
+    loaded_at: float
+
+
+class StateCubeCache:
+    """Process-local LRU of state cubes bounded by an approximate byte budget.
+
+    Entries are dropped wholesale by :meth:`invalidate` (called after the aggregates
+    are rebuilt) and individually once they are older than ``ttl_seconds`` so API
+    workers pick up a rebuild run from another process.
+    """
+
+    def __init__(self, *, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CubeKey, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def _cached(self, key: CubeKey, now: float) -> Tuple[Optional[StateCube], int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.generation == self._generation and now - entry.loaded_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    return entry.cube, entry.generation
+                self._drop(key)
+            return None, self._generation
+
+    def _store(self, key: CubeKey, cube: StateCube, generation: int, now: float) -> None:
+        with self._lock:
+            if generation == self._generation:
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = _CacheEntry(cube=cube, generation=generation, loaded_at=now)
+                self._bytes += cube.nbytes
+                # always keep the entry just loaded, even if it alone exceeds the budget
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    self._drop(next(iter(self._entries)))
+
+    def get(self, session: Session, *, system_state_id: str, team: str, side: str) -> StateCube:
+        key = (system_state_id, team, side)
+        now = time.monotonic()
+        cube, generation = self._cached(key, now)
+        if cube is None:
+            cube = load_state_cube(session, system_state_id=system_state_id, team=team, side=side)
+            self._store(key, cube, generation, now)
+        return cube
+
+    async def get_async(self, session: AsyncSession, *, system_state_id: str, team: str, side: str) -> StateCube:
+        key = (system_state_id, team, side)
+        now = time.monotonic()
+        cube, generation = self._cached(key, now)
+        if cube is None:
+            cube = await load_state_cube_async(session, system_state_id=system_state_id, team=team, side=side)
+            self._store(key, cube, generation, now)
+        return cube
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key: CubeKey) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.cube.nbytes
+
+
+_settings = get_settings()
+state_cubes = StateCubeCache(
+    max_bytes=_settings.state_cube_cache_mb * 1024 * 1024,
+    ttl_seconds=_settings.state_cube_ttl_seconds,
+)
+
+
+def get_state_cube(session: Session, *, system_state_id: str, team: str, side: str) -> StateCube:
+    return state_cubes.get(session, system_state_id=system_state_id, team=team, side=side)
+
+
+async def get_state_cube_async(session: AsyncSession, *, system_state_id: str, team: str, side: str) -> StateCube:
+    return await state_cubes.get_async(session, system_state_id=system_state_id, team=team, side=side)
+
+
+def invalidate_state_cubes() -> None:
+    state_cubes.invalidate()
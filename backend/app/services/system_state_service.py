@@ -1,71 +1,88 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Sequence
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Row, Select, and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..models import (
-    CoSnaps,
-    Game,
-    Play,
-    PlaySystemState,
-    PlayerRoleCountInState,
-    PlayerSnapsInState,
-    SystemState,
-)
+from ..database import gather_rows
+from ..models import Game, PairStatsInState, SystemState, SystemStateTotals
 from ..schemas import PairEdge, SystemStateLabel, SystemStateSummary
 
+# columns top pairs can be ranked by
+PAIR_METRICS = {
+    "co_snaps": PairStatsInState.co_snaps,
+    "jaccard": PairStatsInState.jaccard,
+}
 
-def list_seasons(session: Session) -> List[int]:
-    rows = session.execute(select(func.distinct(Game.season))).all()
+
+def _seasons_statement() -> Select:
+    return select(func.distinct(Game.season))
+
+
+def _seasons(rows: Sequence[Row]) -> List[int]:
     return sorted(int(row[0]) for row in rows if row[0] is not None)
 
 
-def list_teams(session: Session, *, season: int | None = None) -> List[str]:
+def list_seasons(session: Session) -> List[int]:
+    return _seasons(session.execute(_seasons_statement()).all())
+
+
+async def list_seasons_async(session: AsyncSession) -> List[int]:
+    return _seasons((await session.execute(_seasons_statement())).all())
+
+
+def _teams_statements(season: int | None) -> List[Select]:
     home_query = select(func.distinct(Game.home_team))
     away_query = select(func.distinct(Game.away_team))
     if season is not None:
         home_query = home_query.where(Game.season == season)
         away_query = away_query.where(Game.season == season)
-    home_rows = session.execute(home_query).all()
-    away_rows = session.execute(away_query).all()
+    return [home_query, away_query]
+
+
+def _teams(home_rows: Sequence[Row], away_rows: Sequence[Row]) -> List[str]:
     teams = {row[0] for row in home_rows if row[0]} | {row[0] for row in away_rows if row[0]}
     return sorted(teams)
 
 
+def list_teams(session: Session, *, season: int | None = None) -> List[str]:
+    return _teams(*(session.execute(statement).all() for statement in _teams_statements(season)))
+
+
+async def list_teams_async(session: AsyncSession, *, season: int | None = None) -> List[str]:
+    return _teams(*await gather_rows(session, *_teams_statements(season)))
+
+
+def _totals(session: Session, *, team: str, side: str, system_state_id: str) -> SystemStateTotals | None:
+    return session.get(SystemStateTotals, (system_state_id, team, side))
+
+
 def team_snaps(session: Session, *, team: str, side: str, system_state_id: str) -> int:
-    condition = (
-        PlaySystemState.offense_system_state_id == system_state_id
-        if side == "offense"
-        else PlaySystemState.defense_system_state_id == system_state_id
-    )
-    team_condition = Play.offense_team == team if side == "offense" else Play.defense_team == team
-    value = (
-        session.execute(
-            select(func.count())
-            .select_from(Play)
-            .join(PlaySystemState, PlaySystemState.play_id == Play.play_id)
-            .where(condition)
-            .where(team_condition)
-            .where(Play.special_teams.is_(False))
-        ).scalar()
-        or 0
-    )
-    return int(value)
+    totals = _totals(session, team=team, side=side, system_state_id=system_state_id)
+    return int(totals.team_snaps) if totals is not None else 0
 
 
-def list_system_states(session: Session, *, team: str, side: str) -> List[SystemStateLabel]:
-    rows = (
-        session.execute(
-            select(SystemState).where(SystemState.team == team).where(SystemState.side == side)
+def _system_states_statement(*, team: str, side: str) -> Select:
+    return (
+        select(SystemState, SystemStateTotals.team_snaps)
+        .outerjoin(
+            SystemStateTotals,
+            and_(
+                SystemStateTotals.system_state_id == SystemState.system_state_id,
+                SystemStateTotals.team == SystemState.team,
+                SystemStateTotals.side == SystemState.side,
+            ),
         )
-        .scalars()
-        .all()
+        .where(SystemState.team == team)
+        .where(SystemState.side == side)
     )
+
+
+def _system_state_labels(rows: Sequence[Row]) -> List[SystemStateLabel]:
     labels: List[SystemStateLabel] = []
-    for state in rows:
-        snaps = team_snaps(session, team=team, side=side, system_state_id=state.system_state_id)
+    for state, snaps in rows:
         labels.append(
             SystemStateLabel(
                 system_state_id=state.system_state_id,
@@ -78,89 +95,94 @@ def list_system_states(session: Session, *, team: str, side: str) -> List[System
                 window_end=state.window_end,
                 start_game_id=state.start_game_id,
                 end_game_id=state.end_game_id,
-                total_snaps=snaps,
+                total_snaps=int(snaps or 0),
             )
         )
     labels.sort(key=lambda s: ((s.window_start or 0), s.system_state_id))
     return labels
 
 
+def list_system_states(session: Session, *, team: str, side: str) -> List[SystemStateLabel]:
+    return _system_state_labels(session.execute(_system_states_statement(team=team, side=side)).all())
+
+
+async def list_system_states_async(session: AsyncSession, *, team: str, side: str) -> List[SystemStateLabel]:
+    return _system_state_labels((await session.execute(_system_states_statement(team=team, side=side))).all())
+
+
+def _summary_statements(*, team: str, side: str, system_state_id: str, top_k: int, rank_by: str) -> List[Select]:
+    metric = PAIR_METRICS[rank_by]
+    totals = select(SystemStateTotals.team_snaps, SystemStateTotals.distinct_players, SystemStateTotals.role_mix).where(
+        SystemStateTotals.system_state_id == system_state_id,
+        SystemStateTotals.team == team,
+        SystemStateTotals.side == side,
+    )
+    pairs = (
+        select(
+            PairStatsInState.a_gsis,
+            PairStatsInState.b_gsis,
+            PairStatsInState.co_snaps,
+            PairStatsInState.n_i,
+            PairStatsInState.n_j,
+            PairStatsInState.jaccard,
+        )
+        .where(PairStatsInState.system_state_id == system_state_id)
+        .where(PairStatsInState.team == team)
+        .where(PairStatsInState.side == side)
+        .order_by(metric.desc(), PairStatsInState.a_gsis, PairStatsInState.b_gsis)
+        .limit(top_k)
+    )
+    return [totals, pairs]
+
+
+def _summary(system_state_id: str, totals_rows: Sequence[Row], pair_rows: Sequence[Row]) -> SystemStateSummary:
+    totals = totals_rows[0] if totals_rows else None
+    top_pairs = [
+        PairEdge(
+            a=row.a_gsis,
+            b=row.b_gsis,
+            weight=1.0,
+            jaccard=row.jaccard,
+            co_snaps=row.co_snaps,
+            n_i=row.n_i,
+            n_j=row.n_j,
+        )
+        for row in pair_rows
+    ]
+    return SystemStateSummary(
+        system_state_id=system_state_id,
+        team_snaps=int(totals.team_snaps) if totals is not None else 0,
+        distinct_players=int(totals.distinct_players) if totals is not None else 0,
+        top_pairs=top_pairs,
+        position_mix=dict(totals.role_mix or {}) if totals is not None else {},
+    )
+
+
 def system_state_summary(
     session: Session,
     *,
     team: str,
     side: str,
     system_state_id: str,
+    top_k: int = 15,
+    rank_by: str = "co_snaps",
 ) -> SystemStateSummary:
-    snaps = team_snaps(session, team=team, side=side, system_state_id=system_state_id)
-    distinct_players = session.execute(
-        select(func.count(func.distinct(PlayerSnapsInState.gsis_id)))
-        .where(PlayerSnapsInState.system_state_id == system_state_id)
-        .where(PlayerSnapsInState.team == team)
-        .where(PlayerSnapsInState.side == side)
-    ).scalar() or 0
-
-    pair_rows = session.execute(
-        select(
-            CoSnaps.a_gsis,
-            CoSnaps.b_gsis,
-            CoSnaps.co_snaps,
-            PlayerSnapsInState.snaps.label("n_i"),
-        )
-        .join(
-            PlayerSnapsInState,
-            and_(
-                PlayerSnapsInState.system_state_id == CoSnaps.system_state_id,
-                PlayerSnapsInState.team == CoSnaps.team,
-                PlayerSnapsInState.side == CoSnaps.side,
-                PlayerSnapsInState.gsis_id == CoSnaps.a_gsis,
-            ),
-        )
-        .where(CoSnaps.system_state_id == system_state_id)
-        .where(CoSnaps.team == team)
-        .where(CoSnaps.side == side)
-        .order_by(CoSnaps.co_snaps.desc())
-        .limit(15)
-    ).all()
-
-    top_pairs: List[PairEdge] = []
-    for row in pair_rows:
-        n_i = row.n_i or 0
-        n_j = session.execute(
-            select(PlayerSnapsInState.snaps)
-            .where(PlayerSnapsInState.system_state_id == system_state_id)
-            .where(PlayerSnapsInState.team == team)
-            .where(PlayerSnapsInState.side == side)
-            .where(PlayerSnapsInState.gsis_id == row.b_gsis)
-        ).scalar() or 0
-        denom = n_i + n_j - row.co_snaps
-        jaccard = (row.co_snaps / denom) if denom > 0 else 0.0
-        top_pairs.append(
-            PairEdge(
-                a=row.a_gsis,
-                b=row.b_gsis,
-                weight=1.0,
-                jaccard=jaccard,
-                co_snaps=row.co_snaps,
-                n_i=n_i,
-                n_j=n_j,
-            )
-        )
+    statements = _summary_statements(
+        team=team, side=side, system_state_id=system_state_id, top_k=top_k, rank_by=rank_by
+    )
+    return _summary(system_state_id, *(session.execute(statement).all() for statement in statements))
 
-    position_rows = session.execute(
-        select(PlayerRoleCountInState.role, func.sum(PlayerRoleCountInState.snaps))
-        .where(PlayerRoleCountInState.system_state_id == system_state_id)
-        .where(PlayerRoleCountInState.team == team)
-        .where(PlayerRoleCountInState.side == side)
-        .group_by(PlayerRoleCountInState.role)
-    ).all()
-    position_mix = {row.role: int(row[1]) for row in position_rows}
 
-    return SystemStateSummary(
-        system_state_id=system_state_id,
-        team_snaps=snaps,
-        distinct_players=int(distinct_players),
-        top_pairs=top_pairs,
-        position_mix=position_mix,
+async def system_state_summary_async(
+    session: AsyncSession,
+    *,
+    team: str,
+    side: str,
+    system_state_id: str,
+    top_k: int = 15,
+    rank_by: str = "co_snaps",
+) -> SystemStateSummary:
+    statements = _summary_statements(
+        team=team, side=side, system_state_id=system_state_id, top_k=top_k, rank_by=rank_by
     )
-
+    return _summary(system_state_id, *await gather_rows(session, *statements))
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in values]
+
+
+class Gauge(_Metric):
+    """A settable gauge, or one read from ``callback`` (returning label values -> value) at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self._callback is not None:
+            values.update(self._callback())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last), sum]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][position] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, (list(counts), total[0])) for k, (counts, total) in self._series.items())
+        lines = self.header()
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket = 'le="' + le + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, bucket)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+)
+REQUESTS = registry.register(
+    Counter("http_requests_total", "HTTP responses by route template and status code.", ("method", "route", "status"))
+)
+REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method", "route"))
+)
+SQL_LATENCY = registry.register(
+    Histogram(
+        "db_statement_duration_seconds",
+        "SQL statement execution time by engine, operation and first table.",
+        ("engine", "operation", "table"),
+        buckets=SQL_BUCKETS,
+    )
+)
+SQL_QUERIES = registry.register(
+    Counter("db_queries_total", "SQL statements executed by engine, operation and first table.", ("engine", "operation", "table"))
+)
+POOL_WAIT = registry.register(
+    Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting in Pool.connect() for a connection, excluding opening a new one.",
+        ("engine",),
+        buckets=SQL_BUCKETS,
+    )
+)
+CONNECT_LATENCY = registry.register(
+    Histogram("db_connect_duration_seconds", "Time spent opening new DBAPI connections.", ("engine",), buckets=SQL_BUCKETS)
+)
+
+# engines reporting pool usage; the pool is looked up at scrape time, as dispose() replaces it
+_engines: Dict[str, Engine] = {}
+# pools already hooked, with or without metrics; engines sharing a pool share its hooks
+_instrumented: "weakref.WeakSet[object]" = weakref.WeakSet()
+
+
+def _pool_usage() -> Dict[LabelValues, float]:
+    usage = {}
+    for name, engine in list(_engines.items()):
+        checked_out = getattr(engine.pool, "checkedout", None)
+        if checked_out is not None:
+            usage[(name,)] = float(checked_out())
+    return usage
+
+
+POOL_IN_USE = registry.register(
+    Gauge("db_pool_connections_in_use", "Connections currently checked out of the pool.", ("engine",), callback=_pool_usage)
+)
+
+_OPERATION = re.compile(r"^\s*([A-Za-z]+)")
+_TABLE = re.compile(r"\b(?:COPY|FROM|INTO|UPDATE|TABLE)\s+\"?([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def statement_labels(statement: str) -> Tuple[str, str]:
+    """(operation, first table) of a SQL string; statements are parameterised, so the cache stays small."""
+    operation = _OPERATION.match(statement)
+    table = _TABLE.search(statement)
+    return (operation.group(1).upper() if operation else "OTHER"), (table.group(1) if table else "")
+
+
+@dataclass
+class QueryTrace:
+    """SQL statements issued while the trace is active (one request, or a ``trace_queries`` block)."""
+
+    count: int = 0
+    seconds: float = 0.0
+    statements: List[str] = field(default_factory=list)
+    keep_statements: bool = False
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if self.keep_statements:
+            self.statements.append(statement)
+
+
+# tasks and threadpool calls copy the context, so every query made for a request lands on its trace
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("query_trace", default=None)
+
+
+@contextmanager
+def trace_queries(*, keep_statements: bool = False) -> Iterator[QueryTrace]:
+    trace = QueryTrace(keep_statements=keep_statements)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def _time_checkouts(pool, name: str) -> None:
+    # Pool has no event before a checkout starts, so its connect() is wrapped on the instance
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        connection = connect()
+        opened = connection.record_info.pop("telemetry_connect_seconds", 0.0)
+        POOL_WAIT.observe(max(0.0, time.perf_counter() - start - opened), name)
+        return connection
+
+    pool.connect = timed_connect
+
+
+def instrument_engine(engine: Engine, name: str, *, metrics: bool = True) -> None:
+    """Hook ``engine`` for query traces and, with ``metrics``, statement, checkout and connect timings.
+
+    Statements and new DBAPI connections are timed with SQLAlchemy events; a connection
+    opened during a checkout is timed between the ``do_connect`` and pool ``connect``
+    events and reported separately. The checkout wait is the time spent in the pool's
+    ``connect()`` minus that, and has no event, so the method is wrapped on the pool
+    instance and wrapped again on every pool that ``engine.dispose()`` creates.
+    """
+    if engine.pool in _instrumented:
+        return
+    _instrumented.add(engine.pool)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._telemetry_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_telemetry_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.record(statement, elapsed)
+        if metrics:
+            operation, table = statement_labels(statement)
+            SQL_LATENCY.observe(elapsed, name, operation, table)
+            SQL_QUERIES.inc(name, operation, table)
+
+    if not metrics:
+        return
+    _engines[name] = engine
+
+    @event.listens_for(engine, "do_connect")
+    def _connecting(dialect, connection_record, cargs, cparams):
+        connection_record.record_info["telemetry_connect_start"] = time.perf_counter()
+
+    # pool listeners are carried over to the pools that dispose() recreates
+    @event.listens_for(engine.pool, "connect")
+    def _connected(dbapi_connection, connection_record):
+        start = connection_record.record_info.pop("telemetry_connect_start", None)
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            connection_record.record_info["telemetry_connect_seconds"] = elapsed
+            CONNECT_LATENCY.observe(elapsed, name)
+
+    @event.listens_for(engine, "engine_disposed")
+    def _disposed(disposed):
+        _instrumented.add(disposed.pool)
+        _time_checkouts(disposed.pool, name)
+
+    _time_checkouts(engine.pool, name)
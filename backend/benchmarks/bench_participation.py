@@ -0,0 +1,126 @@
+"""Compare the columnar participation pipeline with the original row-wise loader code.
+
+    cd backend && python -m benchmarks.bench_participation --season 2023
+    cd backend && python -m benchmarks.bench_participation --plays 48000   # offline, synthetic
+"""
+from __future__ import annotations
+
+import ast
+import math
+import random
+import time
+from typing import Callable, List, Optional
+
+import pandas as pd
+import typer
+
+from etl.util_participation import PARTICIPATION_COLUMNS, participation_frame
+
+app = typer.Typer(help="Benchmark nflverse participation parsing")
+
+POSITIONS = {
+    "offense": ["QB", "RB", "WR", "WR", "WR", "TE", "T", "G", "C", "G", "T"],
+    "defense": ["DE", "DT", "DT", "DE", "LB", "LB", "CB", "CB", "FS", "SS", "CB"],
+}
+
+
+def _legacy_ensure_list(value) -> List[dict]:
+    if value is None:
+        return []
+    if isinstance(value, float) and math.isnan(value):
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value.strip() == "":
+        return []
+    try:
+        parsed = ast.literal_eval(value)
+        if isinstance(parsed, list):
+            return parsed
+    except Exception:
+        pass
+    return []
+
+
+def legacy_participation(part: pd.DataFrame, play_ids) -> pd.DataFrame:
+    """The loader's previous apply/iterrows/literal_eval implementation."""
+    part = part.copy()
+    part = part[part["play_id"].notnull()]
+    part["play_unique_id"] = part.apply(lambda r: f"{r['game_id']}-{int(r['play_id'])}", axis=1)
+    part = part[part["play_unique_id"].isin(set(play_ids))]
+    payload = []
+    for _, row in part.iterrows():
+        play_id = row["play_unique_id"]
+        for side in ("offense", "defense"):
+            for player in _legacy_ensure_list(row.get(f"{side}_players")):
+                payload.append(
+                    {
+                        "play_id": play_id,
+                        "side": side,
+                        "gsis_id": player.get("gsis_id"),
+                        "position": player.get("position"),
+                        "jersey_number": player.get("jersey_number"),
+                    }
+                )
+    return pd.DataFrame(payload, columns=PARTICIPATION_COLUMNS)
+
+
+def synthetic_participation(plays: int, seed: int = 3) -> pd.DataFrame:
+    rng = random.Random(seed)
+    rows = []
+    for n in range(plays):
+        row = {"game_id": f"2023_{n // 150:02d}_AAA_BBB", "play_id": float(n % 150 * 20 + 1)}
+        for side, positions in POSITIONS.items():
+            players = [
+                {"gsis_id": f"00-{rng.randint(0, 99999):07d}", "position": position, "jersey_number": rng.randint(1, 99)}
+                for position in positions
+            ]
+            row[f"{side}_players"] = repr(players)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _time(fn: Callable[[], pd.DataFrame], repeat: int) -> tuple[float, pd.DataFrame]:
+    best, result = math.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _canonical(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.astype(object).where(pd.notnull(frame), None)
+    return frame.sort_values(PARTICIPATION_COLUMNS[:3], kind="stable").reset_index(drop=True)
+
+
+@app.command()
+def main(
+    season: Optional[int] = typer.Option(None, help="Benchmark a real nflverse season (requires network)"),
+    plays: int = typer.Option(48_000, help="Synthetic plays when no season is given"),
+    repeat: int = typer.Option(3, help="Runs per implementation; the best is reported"),
+) -> None:
+    if season is not None:
+        from nfl_data_py import import_participation_data
+
+        part = import_participation_data([season])
+    else:
+        part = synthetic_participation(plays)
+    part = part[part["play_id"].notnull()]
+    keep = (part["game_id"].astype(str) + "-" + part["play_id"].astype("int64").astype(str)).tolist()
+
+    legacy_seconds, legacy = _time(lambda: legacy_participation(part, keep), repeat)
+    columnar_seconds, columnar = _time(lambda: participation_frame(part, keep), repeat)
+
+    legacy["jersey_number"] = [None if pd.isna(v) else int(v) for v in legacy["jersey_number"]]
+    if not _canonical(legacy).equals(_canonical(columnar)):
+        typer.secho("Implementations disagree", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"rows: {len(part)} plays -> {len(columnar)} participation rows")
+    typer.echo(f"legacy   {legacy_seconds:8.3f}s")
+    typer.echo(f"columnar {columnar_seconds:8.3f}s  ({legacy_seconds / columnar_seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import io
+import itertools
+import json
+import math
+import struct
+import uuid
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from sqlalchemy import BigInteger, Boolean, Date, Float, Integer, SmallInteger, String, Table, Text, insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db_types import JSONB
+
+# rows per executemany round trip on the non-COPY path
+BATCH_SIZE = 10_000
+
+_PG_EPOCH = date(2000, 1, 1).toordinal()
+_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_BINARY_TRAILER = struct.pack(">h", -1)
+
+
+def _table(target) -> Table:
+    return getattr(target, "__table__", target)
+
+
+def _is_null(value: Any) -> bool:
+    # pandas frames keep NaN in float columns even after ``where(notnull, None)``
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _csv_converter(column_type) -> Optional[Callable[[Any], Any]]:
+    """Normalise values whose Python form would not parse as COPY text (e.g. 1.0 for an integer)."""
+    if isinstance(column_type, JSONB):
+        return json.dumps
+    if isinstance(column_type, Boolean):
+        return bool
+    if isinstance(column_type, Integer):
+        return int
+    return None
+
+
+def _binary_encoder(column_type) -> Optional[Callable[[Any], bytes]]:
+    """Encoder for PostgreSQL's binary COPY field format, or None if the type is not supported."""
+    if isinstance(column_type, JSONB):
+        return lambda value: b"\x01" + json.dumps(value).encode("utf-8")
+    if isinstance(column_type, Boolean):
+        return lambda value: b"\x01" if value else b"\x00"
+    if isinstance(column_type, BigInteger):
+        return lambda value: struct.pack(">q", int(value))
+    if isinstance(column_type, SmallInteger):
+        return lambda value: struct.pack(">h", int(value))
+    if isinstance(column_type, Integer):
+        return lambda value: struct.pack(">i", int(value))
+    if isinstance(column_type, Float):
+        return lambda value: struct.pack(">d", float(value))
+    if isinstance(column_type, Date):
+        return lambda value: struct.pack(">i", value.toordinal() - _PG_EPOCH)
+    if isinstance(column_type, (String, Text)):
+        return lambda value: str(value).encode("utf-8")
+    return None
+
+
+def _iter_binary(rows: Iterable[Mapping[str, Any]], columns: Sequence[str], encoders: Sequence[Callable]) -> Iterator[bytes]:
+    yield _BINARY_HEADER
+    field_count = struct.pack(">h", len(columns))
+    for row in rows:
+        parts = [field_count]
+        for column, encode in zip(columns, encoders):
+            value = row.get(column)
+            if _is_null(value):
+                parts.append(b"\xff\xff\xff\xff")
+            else:
+                payload = encode(value)
+                parts.append(struct.pack(">i", len(payload)))
+                parts.append(payload)
+        yield b"".join(parts)
+    yield _BINARY_TRAILER
+
+
+class _CountingIterator:
+    """Pass rows through unchanged, counting them, so the total is known without a list."""
+
+    def __init__(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        self._rows = iter(rows)
+        self.count = 0
+
+    def __iter__(self) -> "_CountingIterator":
+        return self
+
+    def __next__(self) -> Mapping[str, Any]:
+        row = next(self._rows)
+        self.count += 1
+        return row
+
+
+def _csv_field(value: Any) -> str:
+    # strings are always quoted so an empty string stays distinct from the unquoted NULL
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _iter_csv(rows: Iterable[Mapping[str, Any]], columns: Sequence[str], converters: Sequence[Optional[Callable]]) -> Iterator[bytes]:
+    lines: List[str] = []
+    for row in rows:
+        fields = []
+        for column, convert in zip(columns, converters):
+            value = row.get(column)
+            if _is_null(value):
+                value = None
+            elif convert is not None:
+                value = convert(value)
+            fields.append(_csv_field(value))
+        lines.append(",".join(fields))
+        if len(lines) == 1000:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, consumed by ``copy_expert``."""
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _copy(session: Session, table_sql: str, columns: Sequence[str], column_types: Sequence, rows, copy_format: str) -> None:
+    connection = session.connection()
+    preparer = connection.dialect.identifier_preparer
+    column_sql = ", ".join(preparer.quote(column) for column in columns)
+    encoders = [_binary_encoder(column_type) for column_type in column_types]
+    if copy_format == "binary" and all(encoders):
+        chunks = _iter_binary(rows, columns, encoders)
+        options = "FORMAT binary"
+    else:
+        chunks = _iter_csv(rows, columns, [_csv_converter(column_type) for column_type in column_types])
+        options = "FORMAT csv"
+    dbapi_connection = connection.connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table_sql} ({column_sql}) FROM STDIN WITH ({options})", _ChunkStream(chunks))
+
+
+def _copy_rows(
+    session: Session,
+    table: Table,
+    rows: Iterable[Mapping[str, Any]],
+    columns: Sequence[str],
+    *,
+    conflict_keys: Optional[Sequence[str]],
+    update_columns: Sequence[str],
+    only_changed: bool,
+    copy_format: str,
+) -> None:
+    connection = session.connection()
+    preparer = connection.dialect.identifier_preparer
+    target = preparer.format_table(table)
+    column_types = [table.c[column].type for column in columns]
+    if conflict_keys is None:
+        _copy(session, target, columns, column_types, rows, copy_format)
+        return
+
+    stage = preparer.quote(f"_stage_{table.name}_{uuid.uuid4().hex[:8]}")
+    quoted = [preparer.quote(column) for column in columns]
+    connection.exec_driver_sql(
+        f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {', '.join(quoted)} FROM {target} WITH NO DATA"
+    )
+    _copy(session, stage, columns, column_types, rows, copy_format)
+
+    keys = ", ".join(preparer.quote(column) for column in conflict_keys)
+    merge = f"INSERT INTO {target} ({', '.join(quoted)}) SELECT {', '.join(quoted)} FROM {stage} ON CONFLICT ({keys})"
+    if update_columns:
+        assignments = ", ".join(f"{preparer.quote(c)} = EXCLUDED.{preparer.quote(c)}" for c in update_columns)
+        merge += f" DO UPDATE SET {assignments}"
+        if only_changed:
+            current = ", ".join(f"{target}.{preparer.quote(c)}" for c in update_columns)
+            incoming = ", ".join(f"EXCLUDED.{preparer.quote(c)}" for c in update_columns)
+            merge += f" WHERE ROW({current}) IS DISTINCT FROM ROW({incoming})"
+    else:
+        merge += " DO NOTHING"
+    connection.exec_driver_sql(merge)
+    connection.exec_driver_sql(f"DROP TABLE {stage}")
+
+
+def _executemany_rows(
+    session: Session,
+    table: Table,
+    rows: Iterable[Mapping[str, Any]],
+    *,
+    conflict_keys: Optional[Sequence[str]],
+    update_columns: Sequence[str],
+    only_changed: bool,
+    dialect_name: str,
+) -> None:
+    if conflict_keys is None:
+        statement = insert(table)
+    else:
+        dialect_insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect_name)
+        if dialect_insert is None:
+            raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
+        statement = dialect_insert(table)
+        if update_columns:
+            changed = None
+            if only_changed:
+                changed = or_(*(table.c[c].is_distinct_from(statement.excluded[c]) for c in update_columns))
+            statement = statement.on_conflict_do_update(
+                index_elements=list(conflict_keys),
+                set_={c: statement.excluded[c] for c in update_columns},
+                where=changed,
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(conflict_keys))
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, BATCH_SIZE)):
+        session.execute(statement, batch)
+
+
+def bulk_insert(
+    session: Session,
+    target,
+    rows: Iterable[Mapping[str, Any]],
+    *,
+    conflict_keys: Optional[Sequence[str]] = None,
+    update_columns: Optional[Sequence[str]] = None,
+    only_changed: bool = True,
+    copy_format: str = "csv",
+) -> int:
+    """Write ``rows`` into ``target`` (a model class or Table) inside the session's transaction.
+
+    On PostgreSQL rows are streamed with ``COPY ... FROM STDIN`` (``copy_format`` is
+    ``"csv"`` or ``"binary"``; binary falls back to CSV for column types it cannot
+    encode). With ``conflict_keys`` the rows are staged in a temporary table and merged
+    with ``INSERT ... ON CONFLICT``, updating ``update_columns`` (default: every non-key
+    column, ``[]`` means do nothing) and, with ``only_changed``, only rows whose values
+    differ. Other dialects use batched executemany with the same conflict semantics.
+    ``rows`` is consumed lazily (at most ``BATCH_SIZE`` rows are held at a time on the
+    executemany path), so a generator keeps memory flat. Every row must have the keys
+    of the first one. ``None`` and float NaN are written as NULL. Returns the number of
+    rows submitted; with ``conflict_keys`` fewer may actually be written.
+    """
+    table = _table(target)
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    columns = list(first.keys())
+    rows = _CountingIterator(itertools.chain([first], rows))
+    if update_columns is None:
+        update_columns = [column for column in columns if column not in (conflict_keys or ())]
+
+    session.flush()
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        _copy_rows(
+            session,
+            table,
+            rows,
+            columns,
+            conflict_keys=conflict_keys,
+            update_columns=update_columns,
+            only_changed=only_changed,
+            copy_format=copy_format,
+        )
+    else:
+        _executemany_rows(
+            session,
+            table,
+            rows,
+            conflict_keys=conflict_keys,
+            update_columns=update_columns,
+            only_changed=only_changed,
+            dialect_name=dialect_name,
+        )
+    return rows.count
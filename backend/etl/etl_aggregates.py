@@ -1,135 +1,587 @@
 from __future__ import annotations
 
 import itertools
+import uuid
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
+import numpy as np
+import pandas as pd
 import typer
-from sqlalchemy import delete, select
+from scipy import sparse
+from sqlalchemy import MetaData, Table, delete, func, insert, select
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import SessionLocal, engine as db_engine
 from app.models import (
     CoSnaps,
+    PairStatsInState,
     Play,
     PlayParticipation,
     PlaySystemState,
     PlayerRoleCountInState,
+    PlayerRosterFacts,
     PlayerSnapsInState,
+    SystemStateTotals,
 )
+from app.services.data_version import bump_data_version
+from app.services.state_cube import invalidate_state_cubes
+from .bulk_writer import bulk_insert
 from .util_id_maps import position_to_group
 
 app = typer.Typer(help="Compute snap and co-snap aggregates for each system state")
 
+# (system_state_id, team, side, play_id, gsis_id, role)
+Snap = Tuple[str, str, str, str, str, Optional[str]]
 
-@app.command()
-def main() -> None:
-    with SessionLocal() as session:
-        rows = session.execute(
-            select(
-                PlayParticipation.play_id,
-                PlayParticipation.side,
-                PlayParticipation.gsis_id,
-                PlayParticipation.position,
-                Play.offense_team,
-                Play.defense_team,
-                Play.special_teams,
-                PlaySystemState.offense_system_state_id,
-                PlaySystemState.defense_system_state_id,
-            )
-            .join(Play, Play.play_id == PlayParticipation.play_id)
-            .join(PlaySystemState, PlaySystemState.play_id == Play.play_id)
-            .where(PlayParticipation.gsis_id.is_not(None))
-        ).all()
-
-        player_snaps: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
-        player_roles: Dict[Tuple[str, str, str, str, str], int] = defaultdict(int)
-        play_lineups: Dict[Tuple[str, str, str, str], List[str]] = defaultdict(list)
-
-        for row in rows:
-            if row.special_teams:
-                continue
-            side = row.side
-            if side == "offense":
-                system_state_id = row.offense_system_state_id
-                team = row.offense_team
-            else:
-                system_state_id = row.defense_system_state_id
-                team = row.defense_team
-            if not system_state_id or not team:
-                continue
-            key = (system_state_id, team, side, row.gsis_id)
-            player_snaps[key] += 1
-            role = position_to_group(row.position, side)
-            if role:
-                player_roles[(system_state_id, team, side, row.gsis_id, role)] += 1
-            play_key = (system_state_id, team, side, row.play_id)
-            play_lineups[play_key].append(row.gsis_id)
-
-        # compute co-snaps
-        co_counts: Dict[Tuple[str, str, str, str, str], int] = defaultdict(int)
-        for (system_state_id, team, side, play_id), players in play_lineups.items():
-            unique_players = sorted(set(players))
-            for a, b in itertools.combinations(unique_players, 2):
-                key = (system_state_id, team, side, a, b)
-                co_counts[key] += 1
-
-        session.execute(delete(PlayerSnapsInState))
-        session.execute(delete(PlayerRoleCountInState))
-        session.execute(delete(CoSnaps))
-
-        if player_snaps:
-            session.execute(
-                PlayerSnapsInState.__table__.insert(),
-                [
-                    {
-                        "system_state_id": k[0],
-                        "team": k[1],
-                        "side": k[2],
-                        "gsis_id": k[3],
-                        "snaps": v,
-                    }
-                    for k, v in player_snaps.items()
-                ],
-            )
 
-        if player_roles:
-            session.execute(
-                PlayerRoleCountInState.__table__.insert(),
-                [
-                    {
-                        "system_state_id": k[0],
-                        "team": k[1],
-                        "side": k[2],
-                        "gsis_id": k[3],
-                        "role": k[4],
-                        "snaps": v,
-                    }
-                    for k, v in player_roles.items()
-                ],
+@dataclass
+class Aggregates:
+    player_snaps: Dict[Tuple[str, str, str, str], int] = field(default_factory=dict)
+    player_roles: Dict[Tuple[str, str, str, str, str], int] = field(default_factory=dict)
+    co_counts: Dict[Tuple[str, str, str, str, str], int] = field(default_factory=dict)
+
+
+def _participation_rows(session: Session):
+    return session.execute(
+        select(
+            PlayParticipation.play_id,
+            PlayParticipation.side,
+            PlayParticipation.gsis_id,
+            PlayParticipation.position,
+            Play.offense_team,
+            Play.defense_team,
+            Play.special_teams,
+            PlaySystemState.offense_system_state_id,
+            PlaySystemState.defense_system_state_id,
+        )
+        .join(Play, Play.play_id == PlayParticipation.play_id)
+        .join(PlaySystemState, PlaySystemState.play_id == Play.play_id)
+        .where(PlayParticipation.gsis_id.is_not(None))
+    ).all()
+
+
+def _stream_state_snaps(
+    session: Session,
+    *,
+    side: str,
+    yield_per: int,
+    state_ids: Optional[Sequence[str]] = None,
+) -> Iterator[Tuple[Tuple[str, str], List[Snap]]]:
+    """Yield ((system_state_id, team), snaps) one state at a time for ``side``.
+
+    Rows come from a server-side cursor ordered by state, so only the current state's
+    snaps are held in memory. ``state_ids`` restricts the scan to one partition.
+    """
+    if side == "offense":
+        state_column, team_column = PlaySystemState.offense_system_state_id, Play.offense_team
+    else:
+        state_column, team_column = PlaySystemState.defense_system_state_id, Play.defense_team
+    query = (
+        select(
+            state_column.label("system_state_id"),
+            team_column.label("team"),
+            PlayParticipation.play_id,
+            PlayParticipation.gsis_id,
+            PlayParticipation.position,
+        )
+        .join(Play, Play.play_id == PlayParticipation.play_id)
+        .join(PlaySystemState, PlaySystemState.play_id == Play.play_id)
+        .where(PlayParticipation.gsis_id.is_not(None))
+        .where(PlayParticipation.side == side)
+        .where(Play.special_teams.is_not(True))
+        .where(state_column.is_not(None))
+        .where(team_column.is_not(None))
+        .order_by(state_column, team_column)
+    )
+    if state_ids is not None:
+        query = query.where(state_column.in_(state_ids))
+    rows = session.execute(query.execution_options(yield_per=yield_per))
+    for key, group in itertools.groupby(rows, key=lambda row: (row.system_state_id, row.team)):
+        if not key[0] or not key[1]:
+            continue
+        yield key, [
+            (key[0], key[1], side, row.play_id, row.gsis_id, position_to_group(row.position, side)) for row in group
+        ]
+
+
+def _snaps_from_rows(rows: Iterable) -> List[Snap]:
+    snaps: List[Snap] = []
+    for row in rows:
+        if row.special_teams:
+            continue
+        side = row.side
+        if side == "offense":
+            system_state_id = row.offense_system_state_id
+            team = row.offense_team
+        else:
+            system_state_id = row.defense_system_state_id
+            team = row.defense_team
+        if not system_state_id or not team:
+            continue
+        snaps.append((system_state_id, team, side, row.play_id, row.gsis_id, position_to_group(row.position, side)))
+    return snaps
+
+
+def aggregate_python(snaps: Iterable[Snap]) -> Aggregates:
+    player_snaps: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
+    player_roles: Dict[Tuple[str, str, str, str, str], int] = defaultdict(int)
+    play_lineups: Dict[Tuple[str, str, str, str], List[str]] = defaultdict(list)
+
+    for system_state_id, team, side, play_id, gsis_id, role in snaps:
+        player_snaps[(system_state_id, team, side, gsis_id)] += 1
+        if role:
+            player_roles[(system_state_id, team, side, gsis_id, role)] += 1
+        play_lineups[(system_state_id, team, side, play_id)].append(gsis_id)
+
+    # compute co-snaps
+    co_counts: Dict[Tuple[str, str, str, str, str], int] = defaultdict(int)
+    for (system_state_id, team, side, play_id), players in play_lineups.items():
+        unique_players = sorted(set(players))
+        for a, b in itertools.combinations(unique_players, 2):
+            key = (system_state_id, team, side, a, b)
+            co_counts[key] += 1
+
+    return Aggregates(dict(player_snaps), dict(player_roles), dict(co_counts))
+
+
+def aggregate_sparse(snaps: Iterable[Snap]) -> Aggregates:
+    """Same output as :func:`aggregate_python`, computed from integer-coded incidence matrices.
+
+    For every (system_state_id, team, side) the plays and players are mapped to dense
+    codes and a sparse play x player incidence matrix ``X`` is built. Snaps are its
+    column sums and co-snaps the strict upper triangle of ``X.T @ X``; role counts come
+    from a bincount over (player, role) codes.
+    """
+    frame = pd.DataFrame(
+        list(snaps), columns=["system_state_id", "team", "side", "play_id", "gsis_id", "role"]
+    )
+    aggregates = Aggregates()
+    if frame.empty:
+        return aggregates
+    for key, group in frame.groupby(["system_state_id", "team", "side"], sort=False):
+        _aggregate_state_sparse(key, group, aggregates)
+    return aggregates
+
+
+def _aggregate_state_sparse(key: Tuple[str, str, str], group: pd.DataFrame, aggregates: Aggregates) -> None:
+    # sorted player codes make (i < j) coincide with the (a_gsis < b_gsis) ordering of co_snaps
+    play_codes, _ = pd.factorize(group["play_id"])
+    player_codes, player_ids = pd.factorize(group["gsis_id"], sort=True)
+    n_plays, n_players = play_codes.max() + 1, len(player_ids)
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(group), dtype=np.int64), (play_codes, player_codes)),
+        shape=(n_plays, n_players),
+    )
+    snap_counts = np.asarray(incidence.sum(axis=0)).ravel()
+    incidence.data[:] = 1  # a player counts once per play for co-snaps
+    co = sparse.triu(incidence.T @ incidence, k=1).tocoo()
+
+    for gsis_id, count in zip(player_ids, snap_counts.tolist()):
+        aggregates.player_snaps[key + (gsis_id,)] = count
+    for a, b, count in zip(player_ids[co.row], player_ids[co.col], co.data.tolist()):
+        aggregates.co_counts[key + (a, b)] = count
+
+    has_role = group["role"].notna().to_numpy()
+    if has_role.any():
+        role_codes, roles = pd.factorize(group["role"][has_role])
+        combined = player_codes[has_role] * len(roles) + role_codes
+        counts = np.bincount(combined, minlength=n_players * len(roles))
+        for code in np.flatnonzero(counts):
+            player, role = divmod(int(code), len(roles))
+            aggregates.player_roles[key + (player_ids[player], roles[role])] = int(counts[code])
+
+
+ENGINES: Dict[str, Callable[[Iterable[Snap]], Aggregates]] = {
+    "python": aggregate_python,
+    "sparse": aggregate_sparse,
+}
+
+
+class AggregateTables(NamedTuple):
+    """The per-state tables one rebuild writes: the live ones, or the staging copies of a parallel run."""
+
+    snaps: Table
+    roles: Table
+    co_snaps: Table
+    pair_stats: Table
+    totals: Table
+
+    @classmethod
+    def staging(cls, run_id: str, *, unlogged: bool = False) -> "AggregateTables":
+        # columns and primary keys only: index names are schema-wide on PostgreSQL
+        metadata = MetaData()
+        return cls(
+            *(
+                Table(
+                    f"{table.name}_{run_id}",
+                    metadata,
+                    *(column._copy() for column in table.columns),
+                    prefixes=["UNLOGGED"] if unlogged else [],
+                )
+                for table in AGGREGATE_TABLES
             )
+        )
+
+
+AGGREGATE_TABLES = AggregateTables(
+    PlayerSnapsInState.__table__,
+    PlayerRoleCountInState.__table__,
+    CoSnaps.__table__,
+    PairStatsInState.__table__,
+    SystemStateTotals.__table__,
+)
+
+
+def _clear_aggregates(session: Session) -> None:
+    for table in AGGREGATE_TABLES:
+        session.execute(delete(table))
+
+
+PLAYER_KEY = ("system_state_id", "team", "side", "gsis_id")
+_NO_ROLES = {"ius": 0.0, "dominant_role": None, "roles": {}}
+
+
+def role_facts(counts: pd.DataFrame, keys: Sequence[str]) -> pd.DataFrame:
+    """IUS and dominant role of every ``keys`` group of ``role``/``snaps`` rows, in one vectorized pass.
 
-        if co_counts:
-            session.execute(
-                CoSnaps.__table__.insert(),
-                [
-                    {
-                        "system_state_id": k[0],
-                        "team": k[1],
-                        "side": k[2],
-                        "a_gsis": k[3],
-                        "b_gsis": k[4],
-                        "co_snaps": v,
-                    }
-                    for k, v in co_counts.items()
-                ],
+    IUS is the role entropy ``1 - H(p) / log(k)`` over the k roles played: 1.0 for a single
+    role, 0.0 for snaps split evenly. The dominant role has the most snaps, ties broken
+    alphabetically. The result is indexed by ``keys``; groups without role snaps are absent.
+    Rows are sorted first so the entropy sums, and the stored IUS, do not depend on input order.
+    """
+    keys = list(keys)
+    counts = counts.loc[counts["snaps"] > 0, [*keys, "role", "snaps"]].sort_values([*keys, "role"])
+    if counts.empty:
+        return pd.DataFrame({"ius": pd.Series(dtype=float), "dominant_role": pd.Series(dtype=object)})
+    share = counts["snaps"] / counts.groupby(keys, sort=False)["snaps"].transform("sum")
+    stats = (
+        counts.assign(entropy=-share * np.log(share))
+        .groupby(keys)
+        .agg(entropy=("entropy", "sum"), n_roles=("role", "size"))
+    )
+    ius = (1.0 - stats["entropy"] / np.log(np.maximum(stats["n_roles"], 2))).clip(0.0, 1.0)
+    dominant = (
+        counts.sort_values(["snaps", "role"], ascending=[False, True]).drop_duplicates(keys).set_index(keys)["role"]
+    )
+    return pd.DataFrame({"ius": ius.where(stats["n_roles"] > 1, 1.0), "dominant_role": dominant})
+
+
+def _role_columns(counts: pd.DataFrame, keys: Sequence[str]) -> Dict[tuple, dict]:
+    """:func:`role_facts` plus the sorted role breakdown, keyed by the ``keys`` tuple of each group."""
+    facts = role_facts(counts, keys)
+    columns = {
+        key: {"ius": float(ius), "dominant_role": role, "roles": {}}
+        for key, ius, role in zip(facts.index, facts["ius"], facts["dominant_role"])
+    }
+    counts = counts.sort_values("role", kind="stable")
+    for *key, role, snaps in zip(*(counts[column] for column in (*keys, "role", "snaps"))):
+        if snaps > 0:
+            columns[tuple(key)]["roles"][role] = int(snaps)
+    return columns
+
+
+def _insert_aggregates(session: Session, aggregates: Aggregates, tables: AggregateTables = AGGREGATE_TABLES) -> None:
+    counts = pd.DataFrame(
+        [(*k, v) for k, v in aggregates.player_roles.items()], columns=[*PLAYER_KEY, "role", "snaps"]
+    )
+    roles = _role_columns(counts, PLAYER_KEY)
+    bulk_insert(
+        session,
+        tables.snaps,
+        (
+            {
+                "system_state_id": k[0],
+                "team": k[1],
+                "side": k[2],
+                "gsis_id": k[3],
+                "snaps": v,
+                **roles.get(k, _NO_ROLES),
+            }
+            for k, v in aggregates.player_snaps.items()
+        ),
+    )
+    bulk_insert(
+        session,
+        tables.roles,
+        (
+            {"system_state_id": k[0], "team": k[1], "side": k[2], "gsis_id": k[3], "role": k[4], "snaps": v}
+            for k, v in aggregates.player_roles.items()
+        ),
+    )
+    bulk_insert(
+        session,
+        tables.co_snaps,
+        (
+            {"system_state_id": k[0], "team": k[1], "side": k[2], "a_gsis": k[3], "b_gsis": k[4], "co_snaps": v}
+            for k, v in aggregates.co_counts.items()
+        ),
+    )
+    bulk_insert(session, tables.pair_stats, _pair_stats(aggregates))
+
+
+def _pair_stats(aggregates: Aggregates) -> Iterator[dict]:
+    """Co-snap rows with both players' snap counts and their Jaccard index ``co / (n_i + n_j - co)``."""
+    snaps = aggregates.player_snaps
+    for (state_id, team, side, a_gsis, b_gsis), co_snaps in aggregates.co_counts.items():
+        n_i = snaps.get((state_id, team, side, a_gsis), 0)
+        n_j = snaps.get((state_id, team, side, b_gsis), 0)
+        denom = n_i + n_j - co_snaps
+        yield {
+            "system_state_id": state_id,
+            "team": team,
+            "side": side,
+            "a_gsis": a_gsis,
+            "b_gsis": b_gsis,
+            "co_snaps": co_snaps,
+            "n_i": n_i,
+            "n_j": n_j,
+            "jaccard": co_snaps / denom if denom > 0 else 0.0,
+        }
+
+
+def _insert_state_totals(
+    session: Session,
+    *,
+    side: str,
+    state_ids: Optional[Sequence[str]] = None,
+    tables: AggregateTables = AGGREGATE_TABLES,
+) -> None:
+    """Materialise team snaps, distinct players and role mix for the states of ``side``.
+
+    Team snaps count every non-special-teams play stamped with the state, including
+    plays without participation; the other two are rolled up from the aggregate rows
+    already written for those states.
+    """
+    if side == "offense":
+        state_column, team_column = PlaySystemState.offense_system_state_id, Play.offense_team
+    else:
+        state_column, team_column = PlaySystemState.defense_system_state_id, Play.defense_team
+    snaps_query = (
+        select(state_column, team_column, func.count())
+        .select_from(Play)
+        .join(PlaySystemState, PlaySystemState.play_id == Play.play_id)
+        .where(Play.special_teams.is_(False))
+        .where(state_column.is_not(None))
+        .where(team_column.is_not(None))
+        .group_by(state_column, team_column)
+    )
+    player_rows, role_rows = tables.snaps.c, tables.roles.c
+    players_query = (
+        select(player_rows.system_state_id, player_rows.team, func.count())
+        .where(player_rows.side == side)
+        .group_by(player_rows.system_state_id, player_rows.team)
+    )
+    roles_query = (
+        select(role_rows.system_state_id, role_rows.team, role_rows.role, func.sum(role_rows.snaps))
+        .where(role_rows.side == side)
+        .group_by(role_rows.system_state_id, role_rows.team, role_rows.role)
+    )
+    if state_ids is not None:
+        snaps_query = snaps_query.where(state_column.in_(state_ids))
+        players_query = players_query.where(player_rows.system_state_id.in_(state_ids))
+        roles_query = roles_query.where(role_rows.system_state_id.in_(state_ids))
+
+    totals: Dict[Tuple[str, str], dict] = {}
+
+    def row_for(state_id: str, team: str) -> dict:
+        return totals.setdefault(
+            (state_id, team),
+            {
+                "system_state_id": state_id,
+                "team": team,
+                "side": side,
+                "team_snaps": 0,
+                "distinct_players": 0,
+                "role_mix": {},
+            },
+        )
+
+    for state_id, team, count in session.execute(snaps_query):
+        row_for(state_id, team)["team_snaps"] = int(count)
+    for state_id, team, count in session.execute(players_query):
+        row_for(state_id, team)["distinct_players"] = int(count)
+    for state_id, team, role, count in session.execute(roles_query):
+        row_for(state_id, team)["role_mix"][role] = int(count)
+    bulk_insert(session, tables.totals, totals.values())
+
+
+def _insert_roster_facts(session: Session) -> None:
+    """Rebuild ``player_roster_facts`` from the per-state rows of every team.
+
+    Facts span all of a team's states, so they are rebuilt after the states are, never per partition.
+    """
+    session.execute(delete(PlayerRosterFacts))
+    key = (PlayerSnapsInState.team, PlayerSnapsInState.side, PlayerSnapsInState.gsis_id)
+    facts = {
+        (team, side, gsis_id): {
+            "team": team,
+            "side": side,
+            "gsis_id": gsis_id,
+            "n_system_states_seen": int(states),
+            "total_snaps": int(snaps or 0),
+        }
+        for team, side, gsis_id, states, snaps in session.execute(
+            select(*key, func.count(), func.sum(PlayerSnapsInState.snaps)).group_by(*key)
+        )
+    }
+    role_key = (PlayerRoleCountInState.team, PlayerRoleCountInState.side, PlayerRoleCountInState.gsis_id)
+    counts = pd.DataFrame(
+        session.execute(
+            select(*role_key, PlayerRoleCountInState.role, func.sum(PlayerRoleCountInState.snaps)).group_by(
+                *role_key, PlayerRoleCountInState.role
             )
+        ).all(),
+        columns=["team", "side", "gsis_id", "role", "snaps"],
+    )
+    roles = _role_columns(counts, ("team", "side", "gsis_id"))
+    bulk_insert(session, PlayerRosterFacts, ({**row, **roles.get(k, _NO_ROLES)} for k, row in facts.items()))
+
+
+def rebuild_aggregates(
+    session: Session,
+    *,
+    engine: str = "python",
+    stream: bool = False,
+    yield_per: int = 50_000,
+) -> None:
+    """Replace all aggregate rows; the caller owns the transaction."""
+    aggregate = ENGINES[engine]
+    _clear_aggregates(session)
+    if not stream:
+        _insert_aggregates(session, aggregate(_snaps_from_rows(_participation_rows(session))))
+    else:
+        for side in ("offense", "defense"):
+            for _, snaps in _stream_state_snaps(session, side=side, yield_per=yield_per):
+                _insert_aggregates(session, aggregate(snaps))
+    for side in ("offense", "defense"):
+        _insert_state_totals(session, side=side)
+    _insert_roster_facts(session)
+
+
+def _state_partitions(session: Session, *, workers: int) -> List[Tuple[str, List[str]]]:
+    """Split every (side, system_state_id) into roughly ``4 * workers`` batches for the pool."""
+    partitions: List[Tuple[str, List[str]]] = []
+    for side, column in (
+        ("offense", PlaySystemState.offense_system_state_id),
+        ("defense", PlaySystemState.defense_system_state_id),
+    ):
+        state_ids = sorted(
+            row[0] for row in session.execute(select(column).where(column.is_not(None)).distinct()).all() if row[0]
+        )
+        size = max(1, -(-len(state_ids) // (2 * workers)))
+        partitions.extend((side, state_ids[i : i + size]) for i in range(0, len(state_ids), size))
+    return partitions
 
+
+def rebuild_partition(
+    session: Session,
+    *,
+    side: str,
+    state_ids: Sequence[str],
+    engine: str = "python",
+    yield_per: int = 50_000,
+    tables: AggregateTables = AGGREGATE_TABLES,
+) -> None:
+    """Replace the aggregate rows of one batch of system states in ``tables``; the caller owns the transaction.
+
+    Roster facts span every state of a team and are left to the caller (``_insert_roster_facts``).
+    """
+    aggregate = ENGINES[engine]
+    for table in tables:
+        session.execute(delete(table).where(table.c.side == side).where(table.c.system_state_id.in_(state_ids)))
+    for _, snaps in _stream_state_snaps(session, side=side, yield_per=yield_per, state_ids=state_ids):
+        _insert_aggregates(session, aggregate(snaps), tables)
+    _insert_state_totals(session, side=side, state_ids=state_ids, tables=tables)
+
+
+def _publish_staging(session: Session, staging: AggregateTables) -> None:
+    """Replace every live aggregate row with the staged ones; the caller owns the transaction."""
+    for live, staged in zip(AGGREGATE_TABLES, staging):
+        session.execute(delete(live))
+        session.execute(insert(live).from_select([column.name for column in staged.columns], select(staged)))
+
+
+def _init_worker() -> None:
+    # connections inherited from the parent must not be shared with the child
+    db_engine.dispose(close=False)
+
+
+def _run_partition(side: str, state_ids: List[str], engine: str, yield_per: int, run_id: str) -> int:
+    with SessionLocal() as session:
+        rebuild_partition(
+            session,
+            side=side,
+            state_ids=state_ids,
+            engine=engine,
+            yield_per=yield_per,
+            tables=AggregateTables.staging(run_id),
+        )
         session.commit()
+    return len(state_ids)
+
+
+def rebuild_aggregates_parallel(*, engine: str = "python", workers: int = 2, yield_per: int = 50_000) -> None:
+    """Rebuild aggregates with one process per batch of system states.
+
+    Workers write their states into staging copies of the aggregate tables created for
+    this run (``UNLOGGED`` on PostgreSQL) and commit there, so readers never see them.
+    Once every worker has finished, the parent replaces the live rows with the staged
+    ones, rebuilds the roster facts and bumps the data version in a single transaction:
+    states that no longer exist disappear with the old rows, and a failed worker leaves
+    the live tables untouched. The staging tables are dropped either way.
+    """
+    with SessionLocal() as session:
+        partitions = _state_partitions(session, workers=workers)
+
+    run_id = f"stage_{uuid.uuid4().hex[:8]}"
+    staging = AggregateTables.staging(run_id, unlogged=db_engine.dialect.name == "postgresql")
+    metadata = staging.snaps.metadata
+    metadata.create_all(db_engine)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_run_partition, side, state_ids, engine, yield_per, run_id) for side, state_ids in partitions
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException as exc:
+                pool.shutdown(cancel_futures=True)
+                raise RuntimeError("An aggregate worker failed; the live aggregates were left unchanged") from exc
+
+        with SessionLocal() as session:
+            _publish_staging(session, staging)
+            _insert_roster_facts(session)
+            bump_data_version(session, "aggregates")
+            session.commit()
+    finally:
+        metadata.drop_all(db_engine)
+
+
+@app.command()
+def main(
+    engine: str = typer.Option("python", help="Aggregation engine: 'python' (dict counting) or 'sparse'"),
+    stream: bool = typer.Option(False, help="Stream participation one system state at a time (bounded memory)"),
+    yield_per: int = typer.Option(50_000, help="Rows fetched per round trip when streaming"),
+    workers: int = typer.Option(1, help="Rebuild system states in this many worker processes"),
+) -> None:
+    if engine not in ENGINES:
+        raise typer.BadParameter(f"Unknown engine {engine!r}; choose from {', '.join(ENGINES)}")
+    if workers > 1:
+        rebuild_aggregates_parallel(engine=engine, workers=workers, yield_per=yield_per)
+    else:
+        with SessionLocal() as session:
+            rebuild_aggregates(session, engine=engine, stream=stream, yield_per=yield_per)
+            bump_data_version(session, "aggregates")
+            session.commit()
+    invalidate_state_cubes()
 
     typer.secho("Aggregates recomputed", fg=typer.colors.GREEN)
 
 
 if __name__ == "__main__":
     app()
-
@@ -0,0 +1,421 @@
+"""Generate an nflverse-shaped synthetic league so the ETL can be run and measured offline.
+
+    cd backend && python -m etl.etl_generate_league --out-dir .cache/synthetic --teams 32 --seasons 2023 --seasons 2024
+    cd backend && python -m etl.etl_load_nflverse --source-dir .cache/synthetic --seasons 2023 --seasons 2024
+    cd backend && python -m etl.etl_load_coaches --csv-path .cache/synthetic/coach_roles.csv
+
+The output uses the ``--source-dir`` layout of the loader (``pbp/<season>.parquet``,
+``participation/<season>.parquet``, ``players.parquet``) plus a ``coach_roles.csv`` seed.
+"""
+from __future__ import annotations
+
+import csv
+import itertools
+import string
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import typer
+
+app = typer.Typer(help="Generate a synthetic nflverse-shaped league for offline ETL runs")
+
+# players kept on each team's depth chart, by nflverse participation position
+DEPTH = {
+    "offense": {"QB": 3, "RB": 4, "WR": 6, "TE": 3, "T": 3, "G": 3, "C": 2},
+    "defense": {"DE": 4, "DT": 4, "LB": 6, "CB": 6, "FS": 2, "SS": 2},
+}
+# personnel packages: players per position and how often the package is on the field
+PACKAGES = {
+    "offense": [
+        ({"QB": 1, "RB": 1, "TE": 1, "WR": 3, "T": 2, "G": 2, "C": 1}, 0.60),
+        ({"QB": 1, "RB": 1, "TE": 2, "WR": 2, "T": 2, "G": 2, "C": 1}, 0.22),
+        ({"QB": 1, "RB": 2, "TE": 1, "WR": 2, "T": 2, "G": 2, "C": 1}, 0.07),
+        ({"QB": 1, "RB": 1, "TE": 0, "WR": 4, "T": 2, "G": 2, "C": 1}, 0.07),
+        ({"QB": 1, "RB": 1, "TE": 3, "WR": 1, "T": 2, "G": 2, "C": 1}, 0.04),
+    ],
+    "defense": [
+        ({"DE": 2, "DT": 2, "LB": 2, "CB": 3, "FS": 1, "SS": 1}, 0.55),
+        ({"DE": 2, "DT": 2, "LB": 3, "CB": 2, "FS": 1, "SS": 1}, 0.30),
+        ({"DE": 2, "DT": 1, "LB": 2, "CB": 4, "FS": 1, "SS": 1}, 0.15),
+    ],
+}
+# chance a starter's slot goes to the next player on the depth chart on any one snap
+ROTATION = {
+    "QB": 0.01, "RB": 0.35, "WR": 0.15, "TE": 0.25, "T": 0.03, "G": 0.03, "C": 0.02,
+    "DE": 0.30, "DT": 0.35, "LB": 0.12, "CB": 0.10, "FS": 0.05, "SS": 0.05,
+}
+JERSEYS = {
+    "QB": (1, 19), "RB": (20, 49), "WR": (10, 19), "TE": (80, 89), "T": (60, 79), "G": (60, 79), "C": (50, 79),
+    "DE": (90, 99), "DT": (90, 99), "LB": (40, 59), "CB": (20, 39), "FS": (20, 49), "SS": (20, 49),
+}
+FIRST_NAMES = ["Alex", "Ben", "Chris", "Dan", "Eli", "Frank", "Gus", "Hank", "Ike", "Jon", "Kyle", "Leo", "Matt", "Nate"]
+LAST_NAMES = ["Adams", "Brooks", "Carter", "Dixon", "Evans", "Foster", "Grant", "Hayes", "Irwin", "Jones", "Keller", "Lewis"]
+
+PBP_SCHEMA = pa.schema(
+    [
+        ("game_id", pa.string()),
+        ("season", pa.int64()),
+        ("week", pa.int64()),
+        ("game_date", pa.string()),
+        ("home_team", pa.string()),
+        ("away_team", pa.string()),
+        ("play_id", pa.float64()),
+        ("drive", pa.float64()),
+        ("qtr", pa.int64()),
+        ("game_seconds_remaining", pa.float64()),
+        ("posteam", pa.string()),
+        ("defteam", pa.string()),
+        ("play_type", pa.string()),
+        ("special_teams_play", pa.bool_()),
+    ]
+)
+PARTICIPATION_SCHEMA = pa.schema(
+    [
+        ("game_id", pa.string()),
+        ("play_id", pa.float64()),
+        ("offense_players", pa.string()),
+        ("defense_players", pa.string()),
+    ]
+)
+COACH_COLUMNS = ["coach_id", "coach_name", "team", "role", "start_date", "end_date", "start_game_id", "end_game_id"]
+SPECIAL_TEAMS = ["punt", "kickoff", "field_goal", "extra_point"]
+
+
+@dataclass
+class LeagueOptions:
+    teams: int = 32
+    seasons: Sequence[int] = (2024,)
+    games: int = 17
+    plays_per_game: int = 128
+    turnover: float = 0.2
+    injury_rate: float = 0.03
+    coach_turnover: float = 0.25
+    midseason_change_rate: float = 0.1
+    playcaller_rate: float = 0.3
+    seed: int = 7
+
+
+@dataclass
+class _Players:
+    gsis_ids: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    positions: List[str] = field(default_factory=list)
+    entries: List[str] = field(default_factory=list)
+
+    def new(self, rng: np.random.Generator, position: str) -> int:
+        n = len(self.gsis_ids)
+        gsis_id = f"00-{n + 1:07d}"
+        low, high = JERSEYS[position]
+        self.gsis_ids.append(gsis_id)
+        self.names.append(f"{FIRST_NAMES[n % len(FIRST_NAMES)]} {LAST_NAMES[(n // len(FIRST_NAMES)) % len(LAST_NAMES)]}")
+        self.positions.append(position)
+        self.entries.append(
+            f"{{'gsis_id': '{gsis_id}', 'position': '{position}', 'jersey_number': {int(rng.integers(low, high + 1))}}}"
+        )
+        return n
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({"player_id": self.gsis_ids, "display_name": self.names, "position": self.positions})
+
+
+@dataclass
+class _Team:
+    # side -> position -> player indices in depth chart order
+    depth: Dict[str, Dict[str, List[int]]]
+    # player index -> last week they miss through injury
+    injured: Dict[int, int] = field(default_factory=dict)
+
+
+def team_codes(count: int) -> List[str]:
+    letters = itertools.product(string.ascii_uppercase, repeat=3)
+    return ["".join(next(letters)) for _ in range(count)]
+
+
+def first_sunday(season: int) -> date:
+    opener = date(season, 9, 7)
+    return opener + timedelta(days=(6 - opener.weekday()) % 7)
+
+
+def _new_team(rng: np.random.Generator, players: _Players) -> _Team:
+    return _Team(
+        depth={
+            side: {position: [players.new(rng, position) for _ in range(count)] for position, count in positions.items()}
+            for side, positions in DEPTH.items()
+        }
+    )
+
+
+def _offseason(rng: np.random.Generator, team: _Team, players: _Players, turnover: float) -> None:
+    """Players leave and are replaced by newcomers at the bottom of the chart; a few backups win the job."""
+    team.injured.clear()
+    for positions in team.depth.values():
+        for position, chart in positions.items():
+            kept = [player for player in chart if rng.random() >= turnover]
+            kept += [players.new(rng, position) for _ in range(len(chart) - len(kept))]
+            for slot in range(len(kept) - 1):
+                if rng.random() < 0.15:
+                    kept[slot], kept[slot + 1] = kept[slot + 1], kept[slot]
+            positions[position] = kept
+
+
+def _healthy_depth(team: _Team, side: str, week: int) -> Dict[str, List[int]]:
+    # injured players drop to the bottom of the chart, where packages only reach when nobody else is left
+    return {
+        position: [p for p in chart if team.injured.get(p, 0) < week] + [p for p in chart if team.injured.get(p, 0) >= week]
+        for position, chart in team.depth[side].items()
+    }
+
+
+def _injuries(rng: np.random.Generator, team: _Team, week: int, rate: float) -> None:
+    for positions in team.depth.values():
+        for chart in positions.values():
+            for player in chart:
+                if team.injured.get(player, 0) < week and rng.random() < rate:
+                    team.injured[player] = week + int(rng.geometric(0.5)) - 1
+
+
+def lineups(rng: np.random.Generator, depth: Dict[str, List[int]], side: str, snaps: int) -> np.ndarray:
+    """Player indices on the field for ``snaps`` plays, as an array of shape (snaps, 11).
+
+    Each play draws a personnel package, puts the top of the depth chart in its slots and
+    hands each slot to the next player in line with the position's rotation rate.
+    """
+    packages = PACKAGES[side]
+    weights = np.array([weight for _, weight in packages])
+    chosen = rng.choice(len(packages), size=snaps, p=weights / weights.sum())
+    result = np.empty((snaps, 11), dtype=np.int64)
+    for k, (personnel, _) in enumerate(packages):
+        rows = np.flatnonzero(chosen == k)
+        if not rows.size:
+            continue
+        starters, backups, rates = [], [], []
+        for position, count in personnel.items():
+            chart = depth[position]
+            bench = chart[count:]
+            for slot in range(count):
+                starters.append(chart[slot])
+                backups.append(bench[slot % len(bench)] if bench else chart[slot])
+                rates.append(ROTATION[position])
+        starters_row = np.array(starters)
+        picks = np.where(rng.random((rows.size, 11)) < np.array(rates), np.array(backups), starters_row)
+        # two slots rotated to the same backup: the starters stay on for that play
+        ordered = np.sort(picks, axis=1)
+        picks[(ordered[:, 1:] == ordered[:, :-1]).any(axis=1)] = starters_row
+        result[rows] = picks
+    return result
+
+
+def _schedule(rng: np.random.Generator, teams: Sequence[str], week: int) -> List[Tuple[str, str]]:
+    """(away, home) pairs for one week; with an odd team count one team has a bye."""
+    order = [teams[i] for i in rng.permutation(len(teams))]
+    return [(order[i], order[i + 1]) for i in range(0, len(order) - 1, 2)]
+
+
+def _game(
+    rng: np.random.Generator,
+    options: LeagueOptions,
+    season: int,
+    week: int,
+    game_date: date,
+    away: str,
+    home: str,
+    league: Dict[str, _Team],
+    players: _Players,
+) -> Tuple[dict, dict]:
+    game_id = f"{season}_{week:02d}_{away}_{home}"
+    remaining = {team: int(rng.integers(options.plays_per_game * 4 // 10, options.plays_per_game * 6 // 10 + 1)) for team in (away, home)}
+    posteam: List[str] = []
+    drive: List[int] = []
+    special: List[bool] = []
+    possession, drive_number = away, 0
+    while any(remaining.values()):
+        if remaining[possession]:
+            drive_number += 1
+            length = min(remaining[possession], int(rng.integers(3, 13)))
+            remaining[possession] -= length
+            posteam += [possession] * (length + 1)
+            drive += [drive_number] * (length + 1)
+            # every drive ends in a kick of some sort
+            special += [False] * length + [True]
+        possession = home if possession == away else away
+
+    total = len(posteam)
+    seconds = np.floor(3600 * (1 - np.arange(total) / total))
+    special_mask = np.array(special)
+    play_type = np.where(rng.random(total) < 0.58, "pass", "run").astype(object)
+    play_type[special_mask] = rng.choice(SPECIAL_TEAMS, size=int(special_mask.sum()))
+    play_ids = np.cumsum(rng.integers(15, 45, size=total)).astype(float)
+
+    offense_players: List[Optional[str]] = [None] * total
+    defense_players: List[Optional[str]] = [None] * total
+    for team, opponent in ((away, home), (home, away)):
+        rows = [n for n, t in enumerate(posteam) if t == team]
+        for side, owner, payloads in (("offense", team, offense_players), ("defense", opponent, defense_players)):
+            on_field = lineups(rng, _healthy_depth(league[owner], side, week), side, len(rows))
+            for n, lineup in zip(rows, on_field.tolist()):
+                payloads[n] = "[" + ", ".join(players.entries[p] for p in lineup) + "]"
+
+    pbp = {
+        "game_id": [game_id] * total,
+        "season": [season] * total,
+        "week": [week] * total,
+        "game_date": [game_date.isoformat()] * total,
+        "home_team": [home] * total,
+        "away_team": [away] * total,
+        "play_id": play_ids.tolist(),
+        "drive": [float(d) for d in drive],
+        "qtr": np.minimum(4, 1 + (3600 - seconds) // 900).astype(np.int64).tolist(),
+        "game_seconds_remaining": seconds.tolist(),
+        "posteam": posteam,
+        "defteam": [home if team == away else away for team in posteam],
+        "play_type": play_type.tolist(),
+        "special_teams_play": special,
+    }
+    participation = {
+        "game_id": [game_id] * total,
+        "play_id": play_ids.tolist(),
+        "offense_players": offense_players,
+        "defense_players": defense_players,
+    }
+    return pbp, participation
+
+
+def _concat(columns: List[dict]) -> Dict[str, list]:
+    return {key: list(itertools.chain.from_iterable(c[key] for c in columns)) for key in columns[0]}
+
+
+class _CoachStaff:
+    """Coach windows per team as ``coach_roles`` rows; a role's open window is closed when it changes hands."""
+
+    def __init__(self, rng: np.random.Generator) -> None:
+        self.rng = rng
+        self.rows: List[dict] = []
+        self._open: Dict[Tuple[str, str], dict] = {}
+        self._count = 0
+
+    def hire(self, team: str, role: str, start: date, *, start_game_id: Optional[str] = None) -> None:
+        previous = self._open.get((team, role))
+        if previous is not None:
+            previous["end_date"] = (start - timedelta(days=1)).isoformat()
+        self._count += 1
+        row = {
+            "coach_id": f"{team.lower()}-{role.lower()}-{self._count}",
+            "coach_name": f"{FIRST_NAMES[self.rng.integers(len(FIRST_NAMES))]} {LAST_NAMES[self.rng.integers(len(LAST_NAMES))]}",
+            "team": team,
+            "role": role,
+            "start_date": start.isoformat(),
+            "end_date": "",
+            "start_game_id": start_game_id or "",
+            "end_game_id": "",
+        }
+        self.rows.append(row)
+        self._open[(team, role)] = row
+
+    def retire(self, team: str, role: str, end: date) -> None:
+        previous = self._open.pop((team, role), None)
+        if previous is not None:
+            previous["end_date"] = end.isoformat()
+
+    def holds(self, team: str, role: str) -> bool:
+        return (team, role) in self._open
+
+
+def _season_staff(
+    staff: _CoachStaff, rng: np.random.Generator, options: LeagueOptions, team: str, season: int
+) -> Dict[int, List[str]]:
+    """Hire for ``season`` and plan its mid-season coordinator changes as week -> roles."""
+    offseason = date(season, 3, 1)
+    for role in ("OC", "DC"):
+        if not staff.holds(team, role) or rng.random() < options.coach_turnover:
+            staff.hire(team, role, offseason)
+    # the head coach calls the offense this season, overriding the OC
+    staff.retire(team, "OffPlayCaller", offseason - timedelta(days=1))
+    if rng.random() < options.playcaller_rate:
+        staff.hire(team, "OffPlayCaller", offseason)
+
+    changes: Dict[int, List[str]] = {}
+    if options.games >= 6:
+        for role in ("OC", "DC"):
+            if rng.random() < options.midseason_change_rate:
+                changes.setdefault(int(rng.integers(4, options.games - 1)), []).append(role)
+    return changes
+
+
+def generate_league(out_dir: Path, options: LeagueOptions) -> Dict[str, int]:
+    """Write the league under ``out_dir`` season by season; returns row counts per output."""
+    rng = np.random.default_rng(options.seed)
+    out_dir = Path(out_dir)
+    for dataset in ("pbp", "participation"):
+        (out_dir / dataset).mkdir(parents=True, exist_ok=True)
+
+    players = _Players()
+    teams = team_codes(options.teams)
+    league = {team: _new_team(rng, players) for team in teams}
+    staff = _CoachStaff(rng)
+    counts = {"games": 0, "plays": 0}
+
+    for n, season in enumerate(sorted(options.seasons)):
+        if n:
+            for team in teams:
+                _offseason(rng, league[team], players, options.turnover)
+        changes = {team: _season_staff(staff, rng, options, team, season) for team in teams}
+        opener = first_sunday(season)
+
+        # a week is written as one row group, so memory is bounded by a week of games
+        with pq.ParquetWriter(out_dir / "pbp" / f"{season}.parquet", PBP_SCHEMA) as pbp_writer, pq.ParquetWriter(
+            out_dir / "participation" / f"{season}.parquet", PARTICIPATION_SCHEMA
+        ) as part_writer:
+            for week in range(1, options.games + 1):
+                game_date = opener + timedelta(days=7 * (week - 1))
+                for team in teams:
+                    _injuries(rng, league[team], week, options.injury_rate)
+                    for role in changes[team].get(week, []):
+                        staff.hire(team, role, game_date)
+
+                games = [
+                    _game(rng, options, season, week, game_date, away, home, league, players)
+                    for away, home in _schedule(rng, teams, week)
+                ]
+                if not games:
+                    continue
+                pbp = _concat([game[0] for game in games])
+                pbp_writer.write_table(pa.Table.from_pydict(pbp, schema=PBP_SCHEMA))
+                part_writer.write_table(pa.Table.from_pydict(_concat([game[1] for game in games]), schema=PARTICIPATION_SCHEMA))
+                counts["games"] += len(games)
+                counts["plays"] += len(pbp["game_id"])
+
+    pq.write_table(pa.Table.from_pandas(players.frame(), preserve_index=False), out_dir / "players.parquet")
+    with (out_dir / "coach_roles.csv").open("w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=COACH_COLUMNS)
+        writer.writeheader()
+        writer.writerows(staff.rows)
+    counts.update(players=len(players.gsis_ids), coach_roles=len(staff.rows))
+    return counts
+
+
+@app.command()
+def main(
+    out_dir: Path = typer.Option(Path(".cache/synthetic"), help="Directory for the Parquet files and coach_roles.csv"),
+    teams: int = typer.Option(32, help="Teams in the league; 160 and 640 are 5x and 20x league scale"),
+    seasons: List[int] = typer.Option([2024], help="Seasons to generate"),
+    games: int = typer.Option(17, help="Games per team per season"),
+    plays_per_game: int = typer.Option(128, help="Average scrimmage plays per game, both teams together"),
+    seed: int = typer.Option(7, help="Random seed; the same options and seed give the same files"),
+) -> None:
+    options = LeagueOptions(teams=teams, seasons=seasons, games=games, plays_per_game=plays_per_game, seed=seed)
+    counts = generate_league(out_dir, options)
+    typer.secho(
+        f"Wrote {counts['games']} games, {counts['plays']} plays, {counts['players']} players and "
+        f"{counts['coach_roles']} coach roles to {out_dir}",
+        fg=typer.colors.GREEN,
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -12,6 +12,8 @@ from sqlalchemy.orm import Session
 from app.config import get_settings
 from app.database import SessionLocal
 from app.models import CoachRole
+from app.services.coach_windows import invalidate_coach_windows
+from app.services.data_version import bump_data_version
 
 app = typer.Typer(help="Load coordinator and play-caller roles from CSV seeds.")
 
@@ -22,6 +24,30 @@ def _parse_date(value: str | None) -> Optional[datetime.date]:
     return datetime.strptime(value.strip(), "%Y-%m-%d").date()
 
 
+def load_coach_roles(session: Session, path: Path) -> int:
+    """Replace ``coach_roles`` with the rows of the CSV at ``path``; the caller commits."""
+    with path.open() as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+
+    session.execute(delete(CoachRole))
+    for row in rows:
+        session.execute(
+            insert(CoachRole).values(
+                coach_id=row["coach_id"],
+                coach_name=row.get("coach_name"),
+                team=row.get("team"),
+                role=row.get("role"),
+                start_date=_parse_date(row.get("start_date")),
+                end_date=_parse_date(row.get("end_date")),
+                start_game_id=row.get("start_game_id") or None,
+                end_game_id=row.get("end_game_id") or None,
+            )
+        )
+    bump_data_version(session, "coaches")
+    return len(rows)
+
+
 @app.command()
 def load(csv_path: Path = typer.Option(Path("seeds/coach_roles.csv"), help="Path to coach roles CSV")) -> None:
     settings = get_settings()
@@ -29,27 +55,11 @@ def load(csv_path: Path = typer.Option(Path("seeds/coach_roles.csv"), help="Path
     if not path.exists():
         raise typer.BadParameter(f"CSV not found: {path}")
 
-    with path.open() as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-
     with SessionLocal() as session:  # type: Session
-        session.execute(delete(CoachRole))
-        for row in rows:
-            session.execute(
-                insert(CoachRole).values(
-                    coach_id=row["coach_id"],
-                    coach_name=row.get("coach_name"),
-                    team=row.get("team"),
-                    role=row.get("role"),
-                    start_date=_parse_date(row.get("start_date")),
-                    end_date=_parse_date(row.get("end_date")),
-                    start_game_id=row.get("start_game_id") or None,
-                    end_game_id=row.get("end_game_id") or None,
-                )
-            )
+        count = load_coach_roles(session, path)
         session.commit()
-    typer.secho(f"Loaded {len(rows)} coach role rows into {settings.database_url}", fg=typer.colors.GREEN)
+    invalidate_coach_windows()
+    typer.secho(f"Loaded {count} coach role rows into {settings.database_url}", fg=typer.colors.GREEN)
 
 
 if __name__ == "__main__":
@@ -1,38 +1,51 @@
 from __future__ import annotations
 
-import ast
-import math
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Iterable, List, Optional
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
 
 import pandas as pd
 import typer
-from nfl_data_py import import_participation_data, import_pbp_data, import_players
-from sqlalchemy import delete, insert
+from sqlalchemy import Column, MetaData, Table, delete, insert, select
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import SessionLocal, engine as db_engine
 from app.models import Game, Play, PlayParticipation, Player
+from app.services.data_version import bump_data_version
+from .bulk_writer import bulk_insert
+from .nflverse_cache import DirectSource, FileSource, ParquetCache
+from .util_participation import PARTICIPATION_COLUMNS, participation_frame, play_id_series
 
 app = typer.Typer(help="Load nflverse games, plays, participation, and players data")
 
 
-def _ensure_list(value) -> List[dict]:
-    if value is None:
-        return []
-    if isinstance(value, float) and math.isnan(value):
-        return []
-    if isinstance(value, list):
-        return value
-    if isinstance(value, str) and value.strip() == "":
-        return []
-    try:
-        parsed = ast.literal_eval(value)
-        if isinstance(parsed, list):
-            return parsed
-    except Exception:
-        pass
-    return []
+class SeasonTables(NamedTuple):
+    """The tables one season load writes: the live ones, or the staging copies of a parallel load."""
+
+    games: Table
+    plays: Table
+    participation: Table
+
+    @classmethod
+    def staging(cls, run_id: str, *, unlogged: bool = False) -> "SeasonTables":
+        # columns and primary keys only: foreign keys would point at the live tables
+        metadata = MetaData()
+        return cls(
+            *(
+                Table(
+                    f"{table.name}_{run_id}",
+                    metadata,
+                    *(Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns),
+                    prefixes=["UNLOGGED"] if unlogged else [],
+                )
+                for table in SEASON_TABLES
+            )
+        )
+
+
+SEASON_TABLES = SeasonTables(Game.__table__, Play.__table__, PlayParticipation.__table__)
 
 
 def _parse_date(value: str | None) -> Optional[datetime.date]:
@@ -44,32 +57,41 @@ def _parse_date(value: str | None) -> Optional[datetime.date]:
         return datetime.strptime(value, "%Y-%m-%d").date()
 
 
-def _load_games(session: Session, pbp: pd.DataFrame, force: bool = False) -> None:
+def _delete_seasons(session: Session, seasons: Iterable[int]) -> None:
+    """Remove games, plays and participation of ``seasons``, selecting rows by season rather than id lists."""
+    season_games = select(Game.game_id).where(Game.season.in_(list(seasons)))
+    season_plays = select(Play.play_id).where(Play.game_id.in_(season_games))
+    session.execute(delete(PlayParticipation).where(PlayParticipation.play_id.in_(season_plays)))
+    session.execute(delete(Play).where(Play.game_id.in_(season_games)))
+    session.execute(delete(Game).where(Game.game_id.in_(season_games)))
+
+
+def _load_games(session: Session, pbp: pd.DataFrame, table: Table) -> None:
     games = pbp[["game_id", "season", "week", "game_date", "home_team", "away_team"]].drop_duplicates("game_id")
     games["game_date"] = games["game_date"].apply(_parse_date)
-    games = games.where(pd.notnull(games), None)
-    if force:
-        session.execute(delete(Game).where(Game.game_id.in_(games["game_id"].tolist())))
-    rows = games.to_dict(orient="records")
-    for row in rows:
-        session.merge(Game(**row))
+    games = games.astype(object).where(pd.notnull(games), None)
+    bulk_insert(session, table, games.to_dict(orient="records"), conflict_keys=["game_id"])
 
 
-def _load_players(session: Session, players_df: pd.DataFrame) -> None:
-    players_df = players_df.rename(columns={"player_id": "gsis_id"})
-    rows = players_df[["gsis_id", "display_name", "position"]].drop_duplicates("gsis_id").to_dict("records")
-    for row in rows:
-        session.merge(Player(**row))
-
+def _load_players(session: Session, players_df: pd.DataFrame, only: Optional[Iterable[str]] = None) -> None:
+    """Upsert player metadata, touching only rows whose name or position changed.
 
-def _play_id(row: pd.Series) -> str:
-    return f"{row['game_id']}-{int(row['play_id'])}"
+    ``only`` restricts the load to the given gsis ids (e.g. the players seen in participation).
+    """
+    players_df = players_df.rename(columns={"player_id": "gsis_id"})
+    players_df = players_df[["gsis_id", "display_name", "position"]].drop_duplicates("gsis_id")
+    players_df = players_df[players_df["gsis_id"].notnull()]
+    if only is not None:
+        players_df = players_df[players_df["gsis_id"].isin(set(only))]
+    players_df = players_df.astype(object).where(pd.notnull(players_df), None)
+    rows = [dict(row, team_history=[]) for row in players_df.to_dict("records")]
+    bulk_insert(session, Player, rows, conflict_keys=["gsis_id"], update_columns=["display_name", "position"])
 
 
-def _load_plays(session: Session, pbp: pd.DataFrame, force: bool = False) -> List[str]:
+def _load_plays(session: Session, pbp: pd.DataFrame, table: Table) -> List[str]:
     pbp = pbp.copy()
     pbp = pbp[pbp["play_id"].notnull()]
-    pbp["play_unique_id"] = pbp.apply(_play_id, axis=1)
+    pbp["play_unique_id"] = play_id_series(pbp)
     plays_df = pbp[
         [
             "play_unique_id",
@@ -96,60 +118,179 @@ def _load_plays(session: Session, pbp: pd.DataFrame, force: bool = False) -> Lis
     plays_df["clock_seconds"] = plays_df["clock_seconds"].fillna(0).astype(int)
     plays_df["special_teams"] = plays_df["special_teams"].fillna(False)
     plays_df = plays_df.where(pd.notnull(plays_df), None)
-    if force:
-        session.execute(delete(Play).where(Play.play_id.in_(plays_df["play_id"].tolist())))
-    rows = plays_df.to_dict("records")
-    if rows:
-        session.execute(insert(Play), rows)
+    bulk_insert(session, table, plays_df.to_dict("records"))
     return plays_df["play_id"].tolist()
 
 
-def _load_participation(session: Session, part: pd.DataFrame, play_ids: Iterable[str], force: bool = False) -> None:
+def _load_participation(
+    session: Session, part: pd.DataFrame, play_ids: Iterable[str], table: Table
+) -> pd.DataFrame:
     if part.empty:
-        return
-    part = part.copy()
-    part = part[part["play_id"].notnull()]
-    part["play_unique_id"] = part.apply(lambda r: f"{r['game_id']}-{int(r['play_id'])}", axis=1)
-    part = part[part["play_unique_id"].isin(set(play_ids))]
-
-    if force and not part.empty:
-        session.execute(
-            delete(PlayParticipation).where(PlayParticipation.play_id.in_(part["play_unique_id"].tolist()))
-        )
+        return pd.DataFrame(columns=PARTICIPATION_COLUMNS)
+    frame = participation_frame(part, play_ids)
+    bulk_insert(session, table, frame.to_dict("records"))
+    return frame
+
+
+# nfl_data_py is imported on first download, so offline runs (--source-dir) do not need it
+def _fetch_pbp(season: int) -> pd.DataFrame:
+    from nfl_data_py import import_pbp_data
+
+    return import_pbp_data([season])
+
+
+def _fetch_participation(season: int) -> pd.DataFrame:
+    from nfl_data_py import import_participation_data
+
+    return import_participation_data([season])
 
-    payload = []
-    for _, row in part.iterrows():
-        play_id = row["play_unique_id"]
-        for side in ("offense", "defense"):
-            players = _ensure_list(row.get(f"{side}_players"))
-            for player in players:
-                payload.append(
-                    {
-                        "play_id": play_id,
-                        "side": side,
-                        "gsis_id": player.get("gsis_id"),
-                        "position": player.get("position"),
-                        "jersey_number": player.get("jersey_number"),
-                    }
-                )
-    if payload:
-        session.execute(insert(PlayParticipation), payload)
+
+def _fetch_players(_: None) -> pd.DataFrame:
+    from nfl_data_py import import_players
+
+    return import_players()
+
+
+def load_season(
+    session: Session,
+    source,
+    season: int,
+    *,
+    force: bool = False,
+    refresh: bool = False,
+    tables: SeasonTables = SEASON_TABLES,
+) -> List[str]:
+    """Load one season's games, plays and participation into ``tables``; returns the gsis ids that took part."""
+    pbp = source.get("pbp", season, _fetch_pbp, refresh=refresh)
+    participation = source.get("participation", season, _fetch_participation, refresh=refresh)
+    if force:
+        _delete_seasons(session, [season])
+    if pbp.empty:
+        return []
+    _load_games(session, pbp, tables.games)
+    play_ids = _load_plays(session, pbp, tables.plays)
+    frame = _load_participation(session, participation, play_ids, tables.participation)
+    return frame["gsis_id"].dropna().unique().tolist()
+
+
+def _init_worker() -> None:
+    # connections inherited from the parent must not be shared with the child
+    db_engine.dispose(close=False)
+
+
+def _run_season(source, season: int, refresh: bool, run_id: str) -> List[str]:
+    with SessionLocal() as session:
+        participants = load_season(session, source, season, refresh=refresh, tables=SeasonTables.staging(run_id))
+        session.commit()
+    return participants
+
+
+def _publish_staging(session: Session, staging: SeasonTables, seasons: List[int], *, force: bool) -> None:
+    """Copy the staged seasons into the live tables; the caller owns the transaction."""
+    if force:
+        _delete_seasons(session, seasons)
+    # games are upserted as in a sequential load; plays and participation are plain inserts
+    games = [dict(row) for row in session.execute(select(staging.games)).mappings()]
+    bulk_insert(session, SEASON_TABLES.games, games, conflict_keys=["game_id"])
+    for live, staged in zip(SEASON_TABLES[1:], staging[1:]):
+        session.execute(insert(live).from_select([column.name for column in staged.columns], select(staged)))
+
+
+def load_seasons_parallel(
+    session: Session, source, seasons: List[int], *, workers: int, force: bool = False, refresh: bool = False
+) -> List[str]:
+    """Load each season in its own process, at most ``workers`` at a time, and publish them together.
+
+    Workers write their season into staging copies of the games, plays and participation
+    tables created for this run (``UNLOGGED`` on PostgreSQL) and commit there. Once every
+    season has loaded, the staged rows are copied into the live tables in ``session``'s
+    transaction, so the caller commits them together with the players and the data
+    version bump. If any season fails, the error names every failed season and the live
+    tables are left untouched. The staging tables are dropped either way.
+    """
+    run_id = f"stage_{uuid.uuid4().hex[:8]}"
+    staging = SeasonTables.staging(run_id, unlogged=db_engine.dialect.name == "postgresql")
+    metadata = staging.games.metadata
+    metadata.create_all(db_engine)
+    participants: set[str] = set()
+    failed: Dict[int, BaseException] = {}
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(seasons)), initializer=_init_worker) as pool:
+            futures = {pool.submit(_run_season, source, season, refresh, run_id): season for season in seasons}
+            for future in as_completed(futures):
+                try:
+                    participants.update(future.result())
+                except Exception as exc:
+                    failed[futures[future]] = exc
+        if failed:
+            details = "; ".join(f"{season}: {failed[season]}" for season in sorted(failed))
+            raise RuntimeError(
+                f"Seasons {sorted(failed)} failed to load; the live tables were left unchanged ({details})"
+            ) from failed[min(failed)]
+    except BaseException:
+        metadata.drop_all(db_engine)
+        raise
+
+    _publish_staging(session, staging, seasons, force=force)
+    # the publish keeps the staging tables locked until the caller commits, so they are
+    # dropped inside the same transaction
+    metadata.drop_all(session.connection())
+    return sorted(participants)
+
+
+def load_source(
+    session: Session,
+    source,
+    seasons: List[int],
+    *,
+    force: bool = False,
+    participants_only: bool = False,
+    refresh: bool = False,
+    workers: int = 1,
+) -> None:
+    """Load ``seasons`` and then the players from ``source``; the caller commits."""
+    if workers > 1 and len(seasons) > 1:
+        participants = load_seasons_parallel(session, source, seasons, workers=workers, force=force, refresh=refresh)
+    else:
+        participants = set()
+        for season in seasons:
+            participants.update(load_season(session, source, season, force=force, refresh=refresh))
+    # players are not seasonal, so they are loaded once by the parent
+    players_df = source.get("players", None, _fetch_players, refresh=refresh)
+    _load_players(session, players_df, only=participants if participants_only else None)
+    bump_data_version(session, "nflverse")
 
 
 @app.command()
 def main(
     seasons: List[int] = typer.Option(..., help="List of NFL seasons to load"),
     force: bool = typer.Option(False, help="Delete existing rows for selected seasons"),
+    participants_only: bool = typer.Option(False, help="Only load players who appear in the loaded participation"),
+    cache_dir: Path = typer.Option(Path(".cache/nflverse"), help="Parquet cache of downloaded nflverse frames"),
+    no_cache: bool = typer.Option(False, help="Always download; do not read or write the cache"),
+    refresh: bool = typer.Option(False, help="Re-download the selected seasons into the cache"),
+    source_dir: Optional[Path] = typer.Option(
+        None, help="Offline mode: read pre-staged Parquet/CSV files from this directory instead of nflverse"
+    ),
+    workers: int = typer.Option(1, help="Load seasons in parallel, one process per season, at most this many at once"),
 ) -> None:
-    pbp = import_pbp_data(seasons)
-    participation = import_participation_data(seasons)
-    players_df = import_players()
+    if source_dir is not None:
+        source = FileSource(source_dir)
+    elif no_cache:
+        source = DirectSource()
+    else:
+        source = ParquetCache(cache_dir)
 
     with SessionLocal() as session:
-        _load_games(session, pbp, force=force)
-        play_ids = _load_plays(session, pbp, force=force)
-        _load_participation(session, participation, play_ids, force=force)
-        _load_players(session, players_df)
+        load_source(
+            session,
+            source,
+            seasons,
+            force=force,
+            participants_only=participants_only,
+            refresh=refresh,
+            workers=workers,
+        )
         session.commit()
 
     typer.secho(f"Loaded data for seasons {seasons}", fg=typer.colors.GREEN)
@@ -157,4 +298,3 @@ def main(
 
 if __name__ == "__main__":
     app()
-
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# datasets without a season dimension are stored under this key
+ALL_SEASONS = "all"
+
+Fetch = Callable[[Optional[int]], pd.DataFrame]
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _to_arrow(frame: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # nflverse frames have a few object columns mixing numbers and strings
+        frame = frame.copy()
+        for column in frame.columns[frame.dtypes == object]:
+            frame[column] = frame[column].map(str, na_action="ignore")
+        return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def _read_parquet(path: Path) -> pd.DataFrame:
+    return pq.read_table(path, memory_map=True).to_pandas()
+
+
+class ParquetCache:
+    """Raw nflverse frames stored as ``<dataset>/<season>.parquet`` with a hash manifest.
+
+    Each file has its own ``.json`` manifest (SHA-256, size, mtime), so loaders running
+    in parallel never rewrite each other's entries. An entry is served while its file
+    still matches the recorded hash; a missing or modified file is fetched again.
+    Reads memory-map the Parquet file.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    def _key(self, dataset: str, season) -> str:
+        return f"{dataset}/{ALL_SEASONS if season is None else season}"
+
+    def _valid(self, key: str) -> Optional[Path]:
+        manifest_path = self.root / f"{key}.json"
+        path = self.root / f"{key}.parquet"
+        if not manifest_path.exists() or not path.exists():
+            return None
+        entry = json.loads(manifest_path.read_text())
+        stat = path.stat()
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return path
+        # touched since it was written: only trust it if the content is unchanged
+        if _sha256(path) != entry["sha256"]:
+            return None
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self._write_manifest(key, entry)
+        return path
+
+    def _write_manifest(self, key: str, entry: dict) -> None:
+        manifest_path = self.root / f"{key}.json"
+        tmp = manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(entry, indent=2, sort_keys=True))
+        os.replace(tmp, manifest_path)
+
+    def put(self, dataset: str, season, frame: pd.DataFrame) -> Path:
+        key = self._key(dataset, season)
+        path = self.root / f"{key}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.tmp")
+        pq.write_table(_to_arrow(frame), tmp)
+        os.replace(tmp, path)
+        stat = path.stat()
+        self._write_manifest(
+            key,
+            {
+                "sha256": _sha256(path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "rows": len(frame),
+                "fetched_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        return path
+
+    def get(self, dataset: str, season, fetch: Fetch, *, refresh: bool = False) -> pd.DataFrame:
+        key = self._key(dataset, season)
+        path = None if refresh else self._valid(key)
+        if path is None:
+            path = self.put(dataset, season, fetch(season))
+        return _read_parquet(path)
+
+
+class FileSource:
+    """Offline source reading pre-staged files from ``root``.
+
+    For each dataset and season it looks for ``<dataset>/<season>.parquet``,
+    ``<dataset>_<season>.parquet`` and the same names with ``.csv``; season-less
+    datasets use ``<dataset>.parquet`` / ``<dataset>.csv``.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    def _candidates(self, dataset: str, season) -> List[Path]:
+        stems = [dataset] if season is None else [f"{dataset}/{season}", f"{dataset}_{season}"]
+        return [self.root / f"{stem}{suffix}" for stem in stems for suffix in (".parquet", ".csv")]
+
+    def get(self, dataset: str, season, fetch: Fetch = None, *, refresh: bool = False) -> pd.DataFrame:
+        for path in self._candidates(dataset, season):
+            if path.exists():
+                if path.suffix == ".csv":
+                    return pd.read_csv(path, low_memory=False)
+                return _read_parquet(path)
+        names = ", ".join(str(path.relative_to(self.root)) for path in self._candidates(dataset, season))
+        raise FileNotFoundError(f"No staged {dataset} file in {self.root} (looked for {names})")
+
+
+class DirectSource:
+    """No caching: every call fetches from nflverse."""
+
+    def get(self, dataset: str, season, fetch: Fetch, *, refresh: bool = False) -> pd.DataFrame:
+        return fetch(season)
+
+
+def load_seasons(source, dataset: str, seasons: Iterable[int], fetch: Fetch, *, refresh: bool = False) -> pd.DataFrame:
+    frames = [source.get(dataset, season, fetch, refresh=refresh) for season in seasons]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
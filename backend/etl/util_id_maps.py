@@ -19,6 +19,7 @@ POSITION_GROUPS_OFFENSE = {
     "RG": "OL",
     "C": "OL",
     "G": "OL",
+    "T": "OL",
     "OT": "OL",
 }
 
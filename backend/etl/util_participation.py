@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import itertools
+import math
+import re
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PARTICIPATION_COLUMNS = ["play_id", "side", "gsis_id", "position", "jersey_number"]
+
+PlayerEntry = Tuple[Optional[str], Optional[str], Optional[int]]
+
+_ENTRY = re.compile(r"\{([^{}]*)\}")
+_FIELD = re.compile(
+    r"""['"](gsis_id|position|jersey_number)['"]\s*:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|([-+.\w]+))"""
+)
+# nflverse writes every entry with the same key order; one pass of this pattern covers
+# the whole payload and the generic field scan below is only needed for anything else
+_CANONICAL = re.compile(
+    r"""\{\s*'gsis_id':\s*'([^'\\]*)',\s*'position':\s*'([^'\\]*)',\s*'jersey_number':\s*(\d+)(?:\.0)?\s*\}"""
+)
+_EMPTY = frozenset({"None", "nan", "NaN", "null"})
+
+
+def _jersey(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value in _EMPTY or value == "":
+            return None
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if isinstance(value, float):
+        return None if math.isnan(value) else int(value)
+    return int(value)
+
+
+def parse_players(value) -> List[PlayerEntry]:
+    """Parse one ``offense_players``/``defense_players`` payload into (gsis_id, position, jersey_number).
+
+    Payloads are either already-decoded lists of dicts or their Python/JSON string form
+    (``"[{'gsis_id': '00-0033873', 'position': 'QB', 'jersey_number': 15}, ...]"``).
+    Strings are scanned with a regular expression instead of being evaluated; anything
+    that is not a list of player dicts yields no players.
+    """
+    if isinstance(value, list):
+        return [
+            (entry.get("gsis_id"), entry.get("position"), _jersey(entry.get("jersey_number")))
+            for entry in value
+            if isinstance(entry, dict)
+        ]
+    if not isinstance(value, str) or not value.lstrip().startswith("["):
+        return []
+    canonical = _CANONICAL.findall(value)
+    if len(canonical) == value.count("{"):
+        return [(gsis_id, position, int(jersey)) for gsis_id, position, jersey in canonical]
+    players: List[PlayerEntry] = []
+    for entry in _ENTRY.finditer(value):
+        fields = {"gsis_id": None, "position": None, "jersey_number": None}
+        for match in _FIELD.finditer(entry.group(1)):
+            key, single, double, bare = match.groups()
+            if single is not None or double is not None:
+                fields[key] = single if single is not None else double
+            elif bare not in _EMPTY:
+                fields[key] = bare
+        players.append((fields["gsis_id"], fields["position"], _jersey(fields["jersey_number"])))
+    return players
+
+
+def play_id_series(frame: pd.DataFrame) -> pd.Series:
+    """``"<game_id>-<play_id>"`` for every row (rows must have a non-null play_id)."""
+    return frame["game_id"].astype(str) + "-" + frame["play_id"].astype("int64").astype(str)
+
+
+def participation_frame(part: pd.DataFrame, keep_play_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Flatten nflverse participation rows into one row per (play_id, side, player)."""
+    part = part[part["play_id"].notnull()]
+    ids = play_id_series(part)
+    if keep_play_ids is not None:
+        keep = ids.isin(set(keep_play_ids))
+        part, ids = part[keep], ids[keep]
+
+    frames = []
+    for side in ("offense", "defense"):
+        column = f"{side}_players"
+        if column not in part:
+            continue
+        parsed = [parse_players(value) for value in part[column].tolist()]
+        lengths = np.fromiter((len(players) for players in parsed), dtype=np.int64, count=len(parsed))
+        side_frame = pd.DataFrame(
+            list(itertools.chain.from_iterable(parsed)),
+            columns=PARTICIPATION_COLUMNS[2:],
+            dtype=object,
+        )
+        side_frame.insert(0, "side", side)
+        side_frame.insert(0, "play_id", np.repeat(ids.to_numpy(dtype=object), lengths))
+        frames.append(side_frame)
+    if not frames:
+        return pd.DataFrame(columns=PARTICIPATION_COLUMNS, dtype=object)
+    return pd.concat(frames, ignore_index=True)
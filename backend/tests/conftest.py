@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from typing import Generator
+from typing import AsyncIterator, Generator
 
 import pytest
 
@@ -10,13 +10,24 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, sessionmaker
 
 os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
 
-from app.database import engine, get_session  # noqa: E402
+from app.database import (  # noqa: E402
+    AsyncSessionLocal,
+    engine,
+    get_async_read_session,
+    get_async_session,
+    get_read_session,
+    get_session,
+)
 from app.main import app  # noqa: E402
 from app.models import Base  # noqa: E402
+from app.services.coach_windows import invalidate_coach_windows  # noqa: E402
+from app.services.data_version import data_versions  # noqa: E402
+from app.services.state_cube import invalidate_state_cubes  # noqa: E402
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -26,19 +37,32 @@ def create_database() -> Generator[None, None, None]:
     Base.metadata.drop_all(engine)
 
 
+@pytest.fixture(autouse=True)
+def reset_caches() -> Generator[None, None, None]:
+    invalidate_state_cubes()
+    invalidate_coach_windows()
+    data_versions.reset()
+    yield
+    invalidate_state_cubes()
+    invalidate_coach_windows()
+    data_versions.reset()
+
+
 @pytest.fixture()
 def db_session() -> Generator[Session, None, None]:
-    connection = engine.connect()
-    transaction = connection.begin()
-    TestingSessionLocal = sessionmaker(bind=connection, autoflush=False, autocommit=False, future=True)
+    # rows are committed for real so the API's async engine, which uses its own
+    # connections, can read them; every table is emptied afterwards
+    TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
     session = TestingSessionLocal()
     try:
         yield session
         session.commit()
     finally:
+        session.rollback()
         session.close()
-        transaction.rollback()
-        connection.close()
+        with engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
 
 
 @pytest.fixture()
@@ -46,8 +70,15 @@ def client(db_session: Session) -> Generator[TestClient, None, None]:
     def override_get_session() -> Generator[Session, None, None]:
         yield db_session
 
+    async def override_get_async_session() -> AsyncIterator[AsyncSession]:
+        db_session.commit()
+        async with AsyncSessionLocal() as session:
+            yield session
+
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_read_session] = override_get_session
+    app.dependency_overrides[get_async_session] = override_get_async_session
+    app.dependency_overrides[get_async_read_session] = override_get_async_session
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
-
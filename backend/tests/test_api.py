@@ -1,19 +1,33 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import date
 
 import pytest
 
+from app.database import AsyncSessionLocal
 from app.models import (
     CoSnaps,
     Game,
+    PairStatsInState,
     Play,
     PlaySystemState,
     Player,
     PlayerRoleCountInState,
+    PlayerRosterFacts,
     PlayerSnapsInState,
     RolePairWeight,
     SystemState,
+    SystemStateTotals,
+)
+from app.services.roster import get_roster, get_roster_async
+from app.services.system_state_service import (
+    list_system_states,
+    list_system_states_async,
+    list_teams,
+    list_teams_async,
+    system_state_summary,
+    system_state_summary_async,
 )
 
 ROLE_WEIGHTS = [
@@ -102,6 +116,21 @@ def seed_data(db_session):
                 side="offense",
                 gsis_id=gsis_id,
                 snaps=40,
+                ius=1.0,
+                dominant_role=role,
+                roles={role: 40},
+            )
+        )
+        db_session.add(
+            PlayerRosterFacts(
+                team="KC",
+                side="offense",
+                gsis_id=gsis_id,
+                n_system_states_seen=1,
+                total_snaps=40,
+                ius=1.0,
+                dominant_role=role,
+                roles={role: 40},
             )
         )
         db_session.add(
@@ -115,6 +144,17 @@ def seed_data(db_session):
             )
         )
 
+    db_session.add(
+        SystemStateTotals(
+            system_state_id="state-off",
+            team="KC",
+            side="offense",
+            team_snaps=50,
+            distinct_players=len(roles),
+            role_mix={"QB": 40, "RB": 40, "WR": 120, "TE": 40, "OL": 200},
+        )
+    )
+
     players = sorted(lineup)
     for i, a in enumerate(players):
         for b in players[i + 1 :]:
@@ -157,3 +197,207 @@ def test_score_endpoint_validates_unique(client, seed_data):
     response = client.post("/api/score/lineup", json=payload)
     assert response.status_code == 422
 
+
+def test_score_lineups_batch_matches_single(client, seed_data):
+    reordered = list(reversed(seed_data))
+    payload = {
+        "team": "KC",
+        "side": "offense",
+        "system_state_id": "state-off",
+        "lineups": [seed_data, reordered, seed_data[:10] + ["P99"]],
+        "include_pair_edges": True,
+    }
+    response = client.post("/api/score/lineups", json=payload)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+
+    single = client.post(
+        "/api/score/lineup",
+        json={"team": "KC", "side": "offense", "system_state_id": "state-off", "lineup": seed_data},
+    ).json()
+    for key in ("LSU", "LIU", "LIC", "cohesion"):
+        assert results[0][key] == pytest.approx(single[key])
+        assert results[1][key] == pytest.approx(single[key])
+    assert len(results[0]["pair_edges"]) == len(single["pair_edges"])
+    assert results[2]["warnings"] == ["Player P99 has zero snaps in this system state"]
+    assert results[2]["cohesion"] < results[0]["cohesion"]
+
+
+def test_score_lineups_batch_validates_each_lineup(client, seed_data):
+    payload = {
+        "team": "KC",
+        "side": "offense",
+        "system_state_id": "state-off",
+        "lineups": [seed_data, seed_data[:10]],
+    }
+    response = client.post("/api/score/lineups", json=payload)
+    assert response.status_code == 422
+
+
+def test_optimize_lineup_endpoint(client, seed_data):
+    payload = {
+        "team": "KC",
+        "side": "offense",
+        "system_state_id": "state-off",
+        "template": "11",
+        "top_k": 1,
+    }
+    response = client.post("/api/optimize/lineup", json=payload)
+    assert response.status_code == 200
+    best = response.json()["lineups"][0]
+    assert sorted(best["lineup"]) == sorted(seed_data)
+
+    payload["template"] = {"QB": 2, "OL": 9}
+    response = client.post("/api/optimize/lineup", json=payload)
+    assert response.status_code == 400
+
+
+def test_score_swaps_matches_rescoring(client, db_session, seed_data):
+    db_session.add(Player(gsis_id="P12", display_name="P12", position="WR"))
+    db_session.add(
+        PlayerSnapsInState(system_state_id="state-off", team="KC", side="offense", gsis_id="P12", snaps=20)
+    )
+    db_session.add(
+        PlayerRoleCountInState(
+            system_state_id="state-off", team="KC", side="offense", gsis_id="P12", role="WR", snaps=20
+        )
+    )
+    db_session.add(
+        CoSnaps(system_state_id="state-off", team="KC", side="offense", a_gsis="P1", b_gsis="P12", co_snaps=15)
+    )
+    db_session.flush()
+
+    base = {"team": "KC", "side": "offense", "system_state_id": "state-off", "lineup": seed_data}
+    response = client.post(
+        "/api/score/swaps",
+        json={
+            **base,
+            "swaps": [{"out_player": "P3", "in_player": "P12"}, {"out_player": "P4", "in_player": "P12"}],
+            "candidates_for": ["P4", "P4"],
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    # the explicit P4 swap and both candidate lists name the same pair, which is scored once
+    assert [(s["out_player"], s["in_player"]) for s in data["swaps"]] in (
+        [("P3", "P12"), ("P4", "P12")],
+        [("P4", "P12"), ("P3", "P12")],
+    )
+
+    swapped = ["P12" if pid == "P3" else pid for pid in seed_data]
+    rescored = client.post("/api/score/lineup", json={**base, "lineup": swapped}).json()
+    delta = next(s for s in data["swaps"] if s["out_player"] == "P3")
+    for key in ("LSU", "LIU", "LIC", "cohesion"):
+        assert delta[key] == pytest.approx(rescored[key])
+        assert delta[f"delta_{key}"] == pytest.approx(rescored[key] - data["base"][key])
+
+    response = client.post("/api/score/swaps", json={**base, "swaps": [{"out_player": "P12", "in_player": "P3"}]})
+    assert response.status_code == 400
+
+
+def test_roster_reads_materialised_facts(client, db_session, seed_data):
+    db_session.add(Player(gsis_id="P12", display_name="P12", position="WR"))
+    db_session.add(
+        PlayerSnapsInState(
+            system_state_id="state-off2",
+            team="KC",
+            side="offense",
+            gsis_id="P12",
+            snaps=30,
+            ius=0.5,
+            dominant_role="WR",
+            roles={"WR": 20, "TE": 10},
+        )
+    )
+    db_session.add(
+        PlayerRosterFacts(
+            team="KC",
+            side="offense",
+            gsis_id="P12",
+            n_system_states_seen=1,
+            total_snaps=30,
+            ius=0.5,
+            dominant_role="WR",
+            roles={"WR": 20, "TE": 10},
+        )
+    )
+    db_session.flush()
+
+    state = client.get("/api/roster", params={"team": "KC", "side": "offense", "system_state_id": "state-off"}).json()
+    assert [p["gsis_id"] for p in state] == sorted(seed_data)
+    assert state[0]["roles_breakdown"] == {"QB": 40}
+    assert state[0]["position_group"] == "QB"
+    assert state[0]["n_system_states_seen"] == 1
+
+    team = client.get("/api/roster", params={"team": "KC", "side": "offense"}).json()
+    assert len(team) == len(seed_data) + 1
+    p12 = next(p for p in team if p["gsis_id"] == "P12")
+    assert (p12["snaps_in_state"], p12["ius"], p12["roles_breakdown"]) == (30, 0.5, {"WR": 20, "TE": 10})
+
+
+def test_system_state_summary_ranks_top_pairs(client, db_session, seed_data):
+    for a, b, co_snaps, n_i, n_j in [("P1", "P2", 40, 40, 40), ("P1", "P3", 45, 60, 60), ("P2", "P3", 30, 40, 30)]:
+        db_session.add(
+            PairStatsInState(
+                system_state_id="state-off",
+                team="KC",
+                side="offense",
+                a_gsis=a,
+                b_gsis=b,
+                co_snaps=co_snaps,
+                n_i=n_i,
+                n_j=n_j,
+                jaccard=co_snaps / (n_i + n_j - co_snaps),
+            )
+        )
+    db_session.flush()
+
+    params = {"team": "KC", "side": "offense", "system_state_id": "state-off", "top_k": 2}
+    data = client.get("/api/system_state/summary", params=params).json()
+    assert data["team_snaps"] == 50
+    assert [(p["a"], p["b"]) for p in data["top_pairs"]] == [("P1", "P3"), ("P1", "P2")]
+
+    data = client.get("/api/system_state/summary", params={**params, "rank_by": "jaccard"}).json()
+    assert [(p["a"], p["b"], p["jaccard"]) for p in data["top_pairs"]] == [("P1", "P2", 1.0), ("P2", "P3", 0.75)]
+
+    response = client.get("/api/system_state/summary", params={**params, "rank_by": "weight"})
+    assert response.status_code == 422
+
+
+def test_async_services_match_sync(db_session, seed_data):
+    db_session.commit()
+    state = dict(team="KC", side="offense")
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            return (
+                await list_teams_async(session, season=2024),
+                await list_system_states_async(session, **state),
+                await system_state_summary_async(session, system_state_id="state-off", **state),
+                await get_roster_async(session, system_state_id="state-off", **state),
+            )
+
+    assert asyncio.run(run()) == (
+        list_teams(db_session, season=2024),
+        list_system_states(db_session, **state),
+        system_state_summary(db_session, system_state_id="state-off", **state),
+        get_roster(db_session, system_state_id="state-off", **state),
+    )
+
+
+# statements per request, including the ETag middleware's data version check
+QUERY_BUDGETS = [
+    ("/api/meta/seasons", {}, 2),
+    ("/api/teams", {"season": 2024}, 3),
+    ("/api/system_state", {"team": "KC", "side": "offense"}, 2),
+    ("/api/system_state/summary", {"team": "KC", "side": "offense", "system_state_id": "state-off"}, 4),
+    ("/api/roster", {"team": "KC", "side": "offense", "system_state_id": "state-off"}, 2),
+]
+
+
+@pytest.mark.parametrize("path, params, budget", QUERY_BUDGETS)
+def test_endpoint_query_budgets(client, seed_data, path, params, budget):
+    response = client.get(path, params=params, headers={"X-Debug-Queries": "1"})
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) <= budget
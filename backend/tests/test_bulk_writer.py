@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import struct
+from datetime import date
+
+from sqlalchemy import select
+
+from app.models import Game, Play, PlaySystemState
+from backend.etl.bulk_writer import _binary_encoder, _csv_converter, _iter_binary, _iter_csv, bulk_insert
+
+
+def test_bulk_insert_upserts_on_conflict_keys(db_session):
+    rows = [{"play_id": f"P{n}", "offense_system_state_id": "off-a", "defense_system_state_id": "def-a"} for n in range(3)]
+    assert bulk_insert(db_session, PlaySystemState, rows) == 3
+
+    bulk_insert(
+        db_session,
+        PlaySystemState,
+        [
+            {"play_id": "P1", "offense_system_state_id": "off-b", "defense_system_state_id": "def-a"},
+            {"play_id": "P3", "offense_system_state_id": "off-b", "defense_system_state_id": "def-b"},
+        ],
+        conflict_keys=["play_id"],
+    )
+
+    stored = dict(
+        db_session.execute(select(PlaySystemState.play_id, PlaySystemState.offense_system_state_id)).all()
+    )
+    assert stored == {"P0": "off-a", "P1": "off-b", "P2": "off-a", "P3": "off-b"}
+
+
+def test_bulk_insert_without_update_columns_keeps_existing_rows(db_session):
+    bulk_insert(db_session, Game, [{"game_id": "G9", "season": 2024, "home_team": "KC", "away_team": "LV"}])
+    bulk_insert(
+        db_session,
+        Game,
+        [{"game_id": "G9", "season": 2025, "home_team": "KC", "away_team": "LV"}],
+        conflict_keys=["game_id"],
+        update_columns=[],
+    )
+    assert db_session.execute(select(Game.season).where(Game.game_id == "G9")).scalar_one() == 2024
+
+
+def test_bulk_insert_consumes_generators_in_batches(db_session, monkeypatch):
+    monkeypatch.setattr("backend.etl.bulk_writer.BATCH_SIZE", 2)
+    consumed = []
+
+    def rows():
+        for n in range(5):
+            consumed.append(n)
+            yield {"play_id": f"G{n}", "offense_system_state_id": "off-a"}
+
+    assert bulk_insert(db_session, PlaySystemState, rows()) == 5
+    assert consumed == list(range(5))
+    assert db_session.execute(select(PlaySystemState.play_id)).scalars().all() == [f"G{n}" for n in range(5)]
+    assert bulk_insert(db_session, PlaySystemState, iter(())) == 0
+
+
+def test_copy_payload_framing():
+    columns = ["game_id", "season", "game_date"]
+    types = [Game.__table__.c[column].type for column in columns]
+    rows = [{"game_id": "G1", "season": 2024.0, "game_date": date(2000, 1, 2)}, {"game_id": "", "season": None}]
+
+    text = b"".join(_iter_csv(rows, columns, [_csv_converter(t) for t in types])).decode()
+    assert text == '"G1",2024,2000-01-02\n"",,\n'
+
+    payload = b"".join(_iter_binary(rows, columns, [_binary_encoder(t) for t in types]))
+    assert payload.startswith(b"PGCOPY\n\xff\r\n\x00")
+    assert payload.endswith(struct.pack(">h", -1))
+    first = struct.pack(">h", 3) + struct.pack(">i", 2) + b"G1" + struct.pack(">ii", 4, 2024) + struct.pack(">ii", 4, 1)
+    assert first in payload
+
+
+def test_copy_payload_writes_nan_as_null():
+    columns = ["play_id", "drive_id", "quarter"]
+    types = [Play.__table__.c[column].type for column in columns]
+    rows = [{"play_id": "P1", "drive_id": float("nan"), "quarter": float("nan")}]
+
+    text = b"".join(_iter_csv(rows, columns, [_csv_converter(t) for t in types])).decode()
+    assert text == '"P1",,\n'
+
+    payload = b"".join(_iter_binary(rows, columns, [_binary_encoder(t) for t in types]))
+    null = struct.pack(">i", -1)
+    assert struct.pack(">h", 3) + struct.pack(">i", 2) + b"P1" + null + null in payload
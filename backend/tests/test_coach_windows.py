@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from datetime import date
+
+from app.models import CoachRole
+from app.services.coach_windows import CoachWindow, CoachWindowIndex
+
+
+def _window(coach_id, team, role, start, end=None):
+    return CoachWindow(
+        coach_id=coach_id,
+        coach_name=coach_id,
+        team=team,
+        role=role,
+        start_date=start,
+        end_date=end,
+        start_game_id=None,
+        end_game_id=None,
+    )
+
+
+def test_index_picks_latest_started_active_window():
+    index = CoachWindowIndex(
+        [
+            _window("long", "KC", "OC", date(2020, 1, 1)),
+            _window("interim", "KC", "OC", date(2023, 10, 1), date(2023, 12, 31)),
+            _window("old", "KC", "OC", date(2015, 1, 1), date(2019, 12, 31)),
+            _window("pc", "KC", "OffPlayCaller", date(2024, 1, 1)),
+        ]
+    )
+
+    assert index.active("KC", "OC", date(2023, 11, 5)).coach_id == "interim"
+    assert index.active("KC", "OC", date(2024, 2, 1)).coach_id == "long"
+    assert index.active("KC", "OC", date(2017, 6, 1)).coach_id == "old"
+    assert index.active("KC", "OC", date(2014, 6, 1)) is None
+    assert index.active("LV", "OC", date(2024, 2, 1)) is None
+
+    dates = [date(2017, 6, 1), date(2023, 11, 5), date(2024, 9, 8)]
+    assert [w.coach_id for w in index.playcallers("KC", "offense", dates)] == ["old", "interim", "pc"]
+    assert [w and w.coach_id for w in index.active_on_dates("KC", "OffPlayCaller", dates)] == [None, None, "pc"]
+    batch = index.active_for_date(date(2024, 9, 8), roles=["OC", "OffPlayCaller", "DC"])
+    assert {key: w and w.coach_id for key, w in batch.items()} == {
+        ("KC", "OC"): "long",
+        ("KC", "OffPlayCaller"): "pc",
+        ("KC", "DC"): None,
+    }
+
+
+def test_role_windows_stop_walking_back_once_nothing_can_be_open(monkeypatch):
+    seasons = [_window(f"oc{year}", "KC", "OC", date(year, 2, 1), date(year + 1, 1, 31)) for year in range(1990, 2024)]
+    windows = CoachWindowIndex(seasons)._windows[("KC", "OC")]
+    visited = []
+    active_on = CoachWindow.active_on
+
+    def spy(window, when):
+        visited.append(window.coach_id)
+        return active_on(window, when)
+
+    monkeypatch.setattr(CoachWindow, "active_on", spy)
+    # a date after every window has closed inspects none of them, a covered date only its own
+    assert windows.active(date(2024, 6, 1)) is None
+    assert windows.active(date(2010, 6, 1)).coach_id == "oc2010"
+    assert visited == ["oc2010"]
+
+
+def test_active_coaches_by_team_endpoint(client, db_session):
+    db_session.add_all(
+        [
+            CoachRole(coach_id="kc-oc", coach_name="KC OC", team="KC", role="OC", start_date=date(2023, 1, 1)),
+            CoachRole(coach_id="lv-dc", coach_name="LV DC", team="LV", role="DC", start_date=date(2023, 1, 1)),
+        ]
+    )
+    db_session.flush()
+
+    response = client.get("/api/coaches/active/all", params={"date": "2024-09-08"})
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["KC"]["offense_playcaller"]["coach_id"] == "kc-oc"
+    assert payload["KC"]["defense_playcaller"] is None
+    assert payload["LV"]["dc"]["coach_id"] == "lv-dc"
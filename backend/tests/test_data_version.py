@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from app.models import Game
+from app.services import data_version
+from app.services.data_version import bump_data_version, current_data_version, data_versions
+
+
+def test_bump_advances_the_generation(db_session):
+    start = current_data_version(db_session)
+    bump_data_version(db_session, "aggregates")
+    bump_data_version(db_session, "aggregates")
+    bump_data_version(db_session, "coaches")
+    assert current_data_version(db_session) == start + 3
+
+
+def test_conditional_get_answers_304_until_data_changes(client, db_session, monkeypatch):
+    monkeypatch.setattr(data_versions, "check_seconds", 0.0)
+    db_session.add(Game(game_id="G1", season=2024, week=1, home_team="KC", away_team="LV"))
+    db_session.flush()
+
+    first = client.get("/api/teams", params={"season": 2024})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public, max-age=")
+
+    calls = []
+
+    async def list_teams_async(*args, **kwargs):
+        calls.append(1)
+        return []
+
+    monkeypatch.setattr("app.routers.meta.list_teams_async", list_teams_async)
+    cached = client.get("/api/teams", params={"season": 2024}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert calls == []
+
+    other = client.get("/api/teams", params={"season": 2023}, headers={"If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["etag"] != etag
+
+    bump_data_version(db_session, "nflverse")
+    stale = client.get("/api/teams", params={"season": 2024}, headers={"If-None-Match": etag})
+    assert stale.status_code == 200
+    assert stale.headers["etag"] != etag
+
+
+def test_version_change_drops_process_caches(db_session, monkeypatch):
+    monkeypatch.setattr(data_versions, "check_seconds", 0.0)
+    dropped = []
+    monkeypatch.setattr(data_version, "invalidate_state_cubes", lambda: dropped.append("cubes"))
+    monkeypatch.setattr(data_version, "invalidate_coach_windows", lambda: dropped.append("coaches"))
+
+    data_versions.get(db_session)
+    data_versions.get(db_session)
+    assert dropped == []
+
+    bump_data_version(db_session, "aggregates")
+    data_versions.get(db_session)
+    assert dropped == ["cubes", "coaches"]
+
+
+def test_fresh_version_skips_the_session(client, db_session, monkeypatch):
+    monkeypatch.setattr(data_versions, "check_seconds", 60.0)
+    reads = []
+    get = data_versions.get
+    monkeypatch.setattr(data_versions, "get", lambda session: reads.append(1) or get(session))
+
+    client.get("/api/teams", params={"season": 2024})
+    client.post("/api/score/lineup", json={})
+    client.get("/api/teams", params={"season": 2023})
+    assert reads == [1]
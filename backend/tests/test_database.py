@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import event, select
+
+from app import database
+from app.database import AsyncReadSessionLocal, SessionLocal, get_read_session
+from app.models import Game
+
+
+def test_pool_options_come_from_settings(monkeypatch):
+    monkeypatch.setattr(database.settings, "db_pool_size", 12)
+    monkeypatch.setattr(database.settings, "db_pool_pre_ping", False)
+    options = database._pool_options("postgresql+psycopg2://u:p@replica:5432/cohesion")
+    assert options["pool_size"] == 12 and options["pool_pre_ping"] is False
+    assert options["max_overflow"] == database.settings.db_max_overflow
+    assert database._pool_options("sqlite:///./test.db") == {}
+
+
+def test_read_binds_open_read_only_transactions():
+    assert database.read_engine.get_execution_options()["postgresql_readonly"] is True
+    assert database.async_read_engine.get_execution_options()["postgresql_readonly"] is True
+    # without READ_DATABASE_URL reads share the primary's pool
+    assert database.read_engine.pool is database.engine.pool
+
+
+def test_read_session_is_never_committed(db_session):
+    sessions = get_read_session()
+    session = next(sessions)
+    session.add(Game(game_id="G-read", season=2024, home_team="KC", away_team="LV"))
+    session.flush()
+    sessions.close()
+
+    with SessionLocal() as check:
+        assert check.get(Game, "G-read") is None
+
+    async def read():
+        async with AsyncReadSessionLocal() as session:
+            return (await session.execute(select(Game.game_id))).all()
+
+    assert asyncio.run(read()) == []
+
+
+def test_gather_rows_caps_connections_per_engine(db_session, monkeypatch):
+    db_session.add_all(Game(game_id=f"G{n}", season=2024, home_team="KC", away_team="LV") for n in range(3))
+    db_session.commit()
+    monkeypatch.setattr(database.settings, "db_gather_connections", 2)
+    checked_out, peak = [0], [0]
+
+    def on_checkout(*args):
+        checked_out[0] += 1
+        peak[0] = max(peak[0], checked_out[0])
+
+    def on_checkin(*args):
+        checked_out[0] -= 1
+
+    async def read():
+        async with AsyncReadSessionLocal() as session:
+            statements = [select(Game.game_id).where(Game.game_id == f"G{n % 3}") for n in range(6)]
+            return await database.gather_rows(session, *statements)
+
+    pool = database.async_engine.sync_engine.pool
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+    try:
+        rows = asyncio.run(read())
+    finally:
+        event.remove(pool, "checkout", on_checkout)
+        event.remove(pool, "checkin", on_checkin)
+    assert [[row.game_id for row in result] for result in rows] == [[f"G{n % 3}"] for n in range(6)]
+    assert peak[0] == 2
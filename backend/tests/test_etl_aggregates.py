@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import random
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, inspect, select
+
+from app.models import (
+    CoSnaps,
+    Game,
+    PairStatsInState,
+    Play,
+    PlayParticipation,
+    PlaySystemState,
+    PlayerRoleCountInState,
+    PlayerRosterFacts,
+    PlayerSnapsInState,
+    SystemStateTotals,
+)
+from backend.etl.etl_aggregates import (
+    _insert_roster_facts,
+    _state_partitions,
+    aggregate_python,
+    aggregate_sparse,
+    rebuild_aggregates,
+    rebuild_aggregates_parallel,
+    rebuild_partition,
+    role_facts,
+)
+
+
+def _synthetic_snaps(seed: int = 11):
+    rng = random.Random(seed)
+    roles = {"offense": ["QB", "RB", "WR", "TE", "OL", None], "defense": ["DL", "LB", "CB", "S", None]}
+    snaps = []
+    for state in ("s1", "s2", "s3"):
+        for team, side in (("KC", "offense"), ("LV", "defense")):
+            roster = [f"{team}-{side[0]}{n:02d}" for n in range(rng.randint(14, 24))]
+            for play in range(rng.randint(30, 60)):
+                for gsis_id in rng.sample(roster, rng.randint(9, 11)):
+                    snaps.append((state, team, side, f"{state}-{play}", gsis_id, rng.choice(roles[side])))
+    rng.shuffle(snaps)
+    return snaps
+
+
+def test_sparse_engine_matches_python_engine():
+    snaps = _synthetic_snaps()
+    expected = aggregate_python(snaps)
+    actual = aggregate_sparse(snaps)
+
+    assert actual.player_snaps == expected.player_snaps
+    assert actual.player_roles == expected.player_roles
+    assert actual.co_counts == expected.co_counts
+
+
+def test_sparse_engine_handles_empty_input():
+    aggregates = aggregate_sparse([])
+    assert aggregates.player_snaps == {} and aggregates.co_counts == {}
+
+
+@pytest.fixture()
+def participation(db_session):
+    db_session.add(Game(game_id="G9", season=2024, week=3, home_team="KC", away_team="LV"))
+    for state, team, side, play, gsis_id, role in _synthetic_snaps(seed=3):
+        play_id = f"G9-{play}"
+        if db_session.get(Play, play_id) is None:
+            db_session.add(
+                Play(
+                    play_id=play_id,
+                    game_id="G9",
+                    offense_team="KC",
+                    defense_team="LV",
+                    special_teams=play.endswith("-7"),
+                )
+            )
+            db_session.add(
+                PlaySystemState(
+                    play_id=play_id,
+                    offense_system_state_id=f"{state}-off",
+                    defense_system_state_id=f"{state}-def",
+                )
+            )
+        db_session.add(PlayParticipation(play_id=play_id, side=side, gsis_id=gsis_id, position=role))
+        db_session.flush()
+
+
+def _aggregate_tables(session):
+    tables = [
+        sorted(tuple(row) for row in session.execute(select(*table.__table__.columns)).all())
+        for table in (PlayerSnapsInState, PlayerRoleCountInState, CoSnaps, PairStatsInState, PlayerRosterFacts)
+    ]
+    totals = session.execute(select(SystemStateTotals)).scalars().all()
+    tables.append(
+        sorted(
+            (t.system_state_id, t.team, t.side, t.team_snaps, t.distinct_players, sorted(t.role_mix.items()))
+            for t in totals
+        )
+    )
+    return tables
+
+
+@pytest.mark.parametrize("engine", ["python", "sparse"])
+def test_streaming_rebuild_matches_in_memory(db_session, participation, engine):
+    rebuild_aggregates(db_session, engine="python")
+    expected = _aggregate_tables(db_session)
+    assert all(expected)
+
+    rebuild_aggregates(db_session, engine=engine, stream=True, yield_per=17)
+    assert _aggregate_tables(db_session) == expected
+
+
+def test_partitioned_rebuild_matches_full_rebuild(db_session, participation):
+    rebuild_aggregates(db_session)
+    expected = _aggregate_tables(db_session)
+
+    partitions = _state_partitions(db_session, workers=2)
+    assert {side for side, _ in partitions} == {"offense", "defense"}
+    for side, state_ids in partitions:
+        rebuild_partition(db_session, side=side, state_ids=state_ids, engine="sparse")
+    _insert_roster_facts(db_session)
+    assert _aggregate_tables(db_session) == expected
+
+
+def test_parallel_rebuild_publishes_all_states_at_once(db_session, participation):
+    rebuild_aggregates(db_session)
+    expected = _aggregate_tables(db_session)
+    # drop a state's rows so the parallel run has something to restore
+    db_session.execute(PlayerSnapsInState.__table__.delete().where(PlayerSnapsInState.system_state_id == "s1-off"))
+    db_session.commit()
+
+    rebuild_aggregates_parallel(engine="sparse", workers=2)
+    db_session.expire_all()
+    assert _aggregate_tables(db_session) == expected
+    assert not [name for name in inspect(db_session.get_bind()).get_table_names() if "_stage_" in name]
+
+
+def test_failed_parallel_rebuild_leaves_live_aggregates_untouched(db_session, participation):
+    rebuild_aggregates(db_session)
+    db_session.commit()
+    expected = _aggregate_tables(db_session)
+
+    # every worker fails on the unknown engine
+    with pytest.raises(RuntimeError, match="left unchanged"):
+        rebuild_aggregates_parallel(engine="missing", workers=2)
+    db_session.expire_all()
+    assert _aggregate_tables(db_session) == expected
+    assert not [name for name in inspect(db_session.get_bind()).get_table_names() if "_stage_" in name]
+
+
+def test_state_totals_match_live_counts(db_session, participation):
+    rebuild_aggregates(db_session)
+
+    totals = db_session.get(SystemStateTotals, ("s1-off", "KC", "offense"))
+    live_snaps = db_session.execute(
+        select(func.count())
+        .select_from(Play)
+        .join(PlaySystemState, PlaySystemState.play_id == Play.play_id)
+        .where(PlaySystemState.offense_system_state_id == "s1-off")
+        .where(Play.special_teams.is_(False))
+    ).scalar()
+    players = db_session.execute(
+        select(func.count(func.distinct(PlayerSnapsInState.gsis_id))).where(
+            PlayerSnapsInState.system_state_id == "s1-off"
+        )
+    ).scalar()
+    roles = dict(
+        db_session.execute(
+            select(PlayerRoleCountInState.role, func.sum(PlayerRoleCountInState.snaps))
+            .where(PlayerRoleCountInState.system_state_id == "s1-off")
+            .group_by(PlayerRoleCountInState.role)
+        ).all()
+    )
+
+    assert totals.team_snaps == live_snaps > 0
+    assert totals.distinct_players == players
+    assert totals.role_mix == roles
+
+
+def test_pair_stats_carry_snap_counts_and_jaccard(db_session, participation):
+    rebuild_aggregates(db_session, engine="sparse")
+
+    snaps = {
+        (row.system_state_id, row.gsis_id): row.snaps
+        for row in db_session.execute(select(PlayerSnapsInState)).scalars()
+    }
+    co_snaps = {
+        (row.system_state_id, row.a_gsis, row.b_gsis): row.co_snaps
+        for row in db_session.execute(select(CoSnaps)).scalars()
+    }
+    stats = db_session.execute(select(PairStatsInState)).scalars().all()
+    assert len(stats) == len(co_snaps)
+    for row in stats:
+        assert row.co_snaps == co_snaps[(row.system_state_id, row.a_gsis, row.b_gsis)]
+        assert row.n_i == snaps[(row.system_state_id, row.a_gsis)]
+        assert row.n_j == snaps[(row.system_state_id, row.b_gsis)]
+        assert row.jaccard == pytest.approx(row.co_snaps / (row.n_i + row.n_j - row.co_snaps))
+
+
+def test_roster_facts_roll_up_every_state_of_the_team(db_session, participation):
+    rebuild_aggregates(db_session, engine="sparse")
+
+    in_state = db_session.execute(select(PlayerSnapsInState).where(PlayerSnapsInState.team == "KC")).scalars().all()
+    role_counts = db_session.execute(select(PlayerRoleCountInState)).scalars().all()
+    for row in in_state:
+        counts = {
+            r.role: r.snaps
+            for r in role_counts
+            if (r.system_state_id, r.team, r.side, r.gsis_id) == (row.system_state_id, row.team, row.side, row.gsis_id)
+        }
+        assert row.roles == counts
+        if counts:
+            assert counts[row.dominant_role] == max(counts.values())
+        assert 0.0 <= row.ius <= 1.0
+
+    facts = {row.gsis_id: row for row in db_session.execute(select(PlayerRosterFacts)).scalars() if row.team == "KC"}
+    assert set(facts) == {row.gsis_id for row in in_state}
+    for gsis_id, fact in facts.items():
+        rows = [row for row in in_state if row.gsis_id == gsis_id]
+        assert fact.n_system_states_seen == len(rows) > 0
+        assert fact.total_snaps == sum(row.snaps for row in rows)
+        merged = {}
+        for row in rows:
+            for role, snaps in row.roles.items():
+                merged[role] = merged.get(role, 0) + snaps
+        assert fact.roles == merged
+
+
+def test_role_facts():
+    counts = pd.DataFrame(
+        [("a", "WR", 12), ("b", "WR", 5), ("b", "TE", 5), ("c", "WR", 9), ("c", "TE", 1), ("d", "WR", 0)],
+        columns=["gsis_id", "role", "snaps"],
+    )
+    facts = role_facts(counts, ["gsis_id"])
+    assert set(facts.index) == {"a", "b", "c"}
+    assert facts.loc["a", "ius"] == 1.0
+    assert facts.loc["b", "ius"] == pytest.approx(0.0)
+    assert 0.0 < facts.loc["c", "ius"] < 1.0
+    assert facts["dominant_role"].to_dict() == {"a": "WR", "b": "TE", "c": "WR"}
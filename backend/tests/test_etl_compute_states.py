@@ -2,40 +2,56 @@ from __future__ import annotations
 
 from datetime import date
 
-from backend.etl.etl_compute_states import CoachWindow, _resolve_playcaller
-
-
-def test_resolve_playcaller_prefers_explicit_playcaller():
-    lookup = {
-        "KC": {
-            "OC": [
-                CoachWindow(
-                    coach_id="oc",
-                    coach_name="OC",
-                    team="KC",
-                    role="OC",
-                    start_date=date(2024, 1, 1),
-                    end_date=None,
-                    start_game_id=None,
-                    end_game_id=None,
-                )
-            ],
-            "OffPlayCaller": [
-                CoachWindow(
-                    coach_id="pc",
-                    coach_name="PlayCaller",
-                    team="KC",
-                    role="OffPlayCaller",
-                    start_date=date(2024, 9, 1),
-                    end_date=None,
-                    start_game_id=None,
-                    end_game_id=None,
-                )
-            ],
-        }
+import pytest
+
+from app.models import CoachRole, Game, Play
+from backend.etl.etl_compute_states import compute_play_states
+
+
+def test_compute_play_states_resolves_once_per_game(db_session):
+    db_session.add_all(
+        [
+            CoachRole(coach_id="kc-oc", coach_name="OC", team="KC", role="OC", start_date=date(2023, 1, 1)),
+            CoachRole(coach_id="kc-pc", coach_name="PC", team="KC", role="OffPlayCaller", start_date=date(2024, 10, 1)),
+            CoachRole(coach_id="kc-dc", coach_name="DC", team="KC", role="DC", start_date=date(2023, 1, 1)),
+            CoachRole(coach_id="lv-oc", coach_name="LV OC", team="LV", role="OC", start_date=date(2023, 1, 1)),
+            CoachRole(coach_id="lv-dc", coach_name="LV DC", team="LV", role="DC", start_date=date(2023, 1, 1)),
+            Game(game_id="W1", season=2024, week=1, game_date=date(2024, 9, 8), home_team="KC", away_team="LV"),
+            Game(game_id="W6", season=2024, week=6, game_date=date(2024, 10, 13), home_team="LV", away_team="KC"),
+        ]
+    )
+    for game_id in ("W1", "W6"):
+        for n in range(3):
+            db_session.add(Play(play_id=f"{game_id}-{n}", game_id=game_id, offense_team="KC", defense_team="LV"))
+        db_session.add(Play(play_id=f"{game_id}-lv", game_id=game_id, offense_team="LV", defense_team="KC"))
+    db_session.add(Play(play_id="W1-none", game_id="W1", offense_team=None, defense_team=None))
+    db_session.flush()
+
+    states, play_states = compute_play_states(db_session)
+
+    coaches = {state_id: state.coach_id for state_id, state in states.items()}
+    stamped = {
+        row.play_id: (coaches[row.offense_system_state_id], coaches[row.defense_system_state_id])
+        for row in play_states.itertuples()
     }
+    assert stamped["W1-0"] == ("kc-oc", "lv-dc")
+    # the explicit play caller wins over the coordinator whose window is still open
+    assert stamped["W6-2"] == ("kc-pc", "lv-dc")
+    assert {state.role for state in states.values() if state.coach_id == "kc-pc"} == {"OffPlayCaller"}
+    assert stamped["W6-lv"] == ("lv-oc", "kc-dc")
+    assert "W1-none" not in stamped
+    assert sorted(coaches.values()) == ["kc-dc", "kc-oc", "kc-pc", "lv-dc", "lv-oc"]
+
 
-    result = _resolve_playcaller(lookup, team="KC", side="offense", game_date=date(2024, 9, 10))
-    assert result.coach_id == "pc"
-    assert result.role == "OffPlayCaller"
+def test_compute_play_states_requires_a_coach_for_every_game(db_session):
+    db_session.add_all(
+        [
+            CoachRole(coach_id="kc-oc", coach_name="OC", team="KC", role="OC", start_date=date(2024, 1, 1)),
+            Game(game_id="W1", season=2024, week=1, game_date=date(2024, 9, 8), home_team="KC", away_team="LV"),
+            Play(play_id="W1-0", game_id="W1", offense_team="KC", defense_team="LV"),
+        ]
+    )
+    db_session.flush()
 
+    with pytest.raises(RuntimeError, match="No coach role found for LV defense on 2024-09-08"):
+        compute_play_states(db_session)
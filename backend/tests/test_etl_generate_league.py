@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import csv
+from datetime import date
+
+import pandas as pd
+
+from app.services.coach_windows import CoachWindow, CoachWindowIndex
+from backend.etl.etl_generate_league import LeagueOptions, generate_league
+from backend.etl.nflverse_cache import FileSource
+from backend.etl.util_participation import participation_frame, play_id_series
+
+
+def _coach_windows(path) -> CoachWindowIndex:
+    with path.open() as handle:
+        rows = list(csv.DictReader(handle))
+    return CoachWindowIndex(
+        CoachWindow(
+            coach_id=row["coach_id"],
+            coach_name=row["coach_name"],
+            team=row["team"],
+            role=row["role"],
+            start_date=date.fromisoformat(row["start_date"]),
+            end_date=date.fromisoformat(row["end_date"]) if row["end_date"] else None,
+            start_game_id=None,
+            end_game_id=None,
+        )
+        for row in rows
+    )
+
+
+def test_generated_league_is_loadable_and_deterministic(tmp_path):
+    options = LeagueOptions(teams=4, seasons=(2023, 2024), games=8, plays_per_game=40, midseason_change_rate=1.0)
+    counts = generate_league(tmp_path, options)
+    assert counts["games"] == 2 * 8 * 2
+
+    source = FileSource(tmp_path)
+    pbp = pd.concat([source.get("pbp", season) for season in options.seasons], ignore_index=True)
+    part = pd.concat([source.get("participation", season) for season in options.seasons], ignore_index=True)
+    assert len(pbp) == counts["plays"]
+    assert play_id_series(pbp).is_unique
+
+    frame = participation_frame(part, play_id_series(pbp))
+    assert (frame.groupby(["play_id", "side"])["gsis_id"].nunique() == 11).all()
+    assert set(frame["gsis_id"]) <= set(source.get("players", None)["player_id"])
+
+    # every game resolves a play caller on both sides; coordinators changed mid-season
+    index = _coach_windows(tmp_path / "coach_roles.csv")
+    games = pbp.drop_duplicates("game_id")
+    dates = [date.fromisoformat(value) for value in games["game_date"]]
+    for side, teams in (("offense", games["home_team"]), ("defense", games["away_team"])):
+        assert None not in [index.playcaller(team, side, day) for team, day in zip(teams, dates)]
+    defense = {(team, index.playcaller(team, "defense", day).coach_id) for team, day in zip(games["home_team"], dates)}
+    assert len(defense) > 2 * options.teams
+
+    generate_league(tmp_path / "again", options)
+    assert FileSource(tmp_path / "again").get("participation", 2024).equals(source.get("participation", 2024))
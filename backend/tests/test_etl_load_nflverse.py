@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, inspect, select
+
+from app.models import DataVersion, Game, Play, PlayParticipation, Player
+from backend.etl.etl_generate_league import LeagueOptions, generate_league
+from backend.etl.etl_load_nflverse import load_source
+from backend.etl.nflverse_cache import FileSource
+
+
+@pytest.fixture()
+def league(tmp_path):
+    generate_league(tmp_path, LeagueOptions(teams=2, seasons=(2023, 2024), games=2, plays_per_game=12))
+    # a player who never takes a snap, only loaded without --participants-only
+    players = pd.read_parquet(tmp_path / "players.parquet")
+    bench = pd.DataFrame([{column: None for column in players.columns}])
+    bench[["player_id", "display_name", "position"]] = ["00-BENCH", "Bench Player", "QB"]
+    pd.concat([players, bench], ignore_index=True).to_parquet(tmp_path / "players.parquet", index=False)
+    return FileSource(tmp_path)
+
+
+def _season_counts(session, season):
+    games = select(Game.game_id).where(Game.season == season)
+    plays = select(Play.play_id).where(Play.game_id.in_(games))
+    return (
+        session.scalar(select(func.count()).select_from(Game).where(Game.season == season)),
+        session.scalar(select(func.count()).select_from(Play).where(Play.game_id.in_(games))),
+        session.scalar(select(func.count()).select_from(PlayParticipation).where(PlayParticipation.play_id.in_(plays))),
+    )
+
+
+def test_forced_reload_only_replaces_its_own_seasons(db_session, league):
+    load_source(db_session, league, [2023, 2024])
+    before = {season: _season_counts(db_session, season) for season in (2023, 2024)}
+    assert all(count > 0 for counts in before.values() for count in counts)
+
+    # without the season-scoped delete this would hit duplicate keys or drop 2023
+    load_source(db_session, league, [2024], force=True)
+
+    assert {season: _season_counts(db_session, season) for season in (2023, 2024)} == before
+
+
+def test_player_upsert_keeps_team_history_of_existing_players(db_session, league):
+    known = league.get("players", None)["player_id"].iloc[0]
+    db_session.add(Player(gsis_id=known, display_name="Old Name", position="K", team_history=["KC", "LV"]))
+    db_session.flush()
+
+    load_source(db_session, league, [2023])
+
+    player = db_session.get(Player, known)
+    db_session.refresh(player)
+    expected = league.get("players", None).set_index("player_id").loc[known]
+    assert (player.display_name, player.position) == (expected["display_name"], expected["position"])
+    assert player.team_history == ["KC", "LV"]
+    assert db_session.get(Player, "00-BENCH").team_history == []
+
+
+def test_participants_only_skips_players_without_snaps(db_session, league):
+    load_source(db_session, league, [2023], participants_only=True)
+
+    loaded = set(db_session.scalars(select(Player.gsis_id)))
+    participants = set(db_session.scalars(select(PlayParticipation.gsis_id).distinct()))
+    assert loaded == participants
+    assert "00-BENCH" not in loaded
+
+    load_source(db_session, league, [2023], force=True)
+    assert "00-BENCH" in set(db_session.scalars(select(Player.gsis_id)))
+
+
+def test_parallel_load_publishes_every_season_at_once(db_session, league):
+    load_source(db_session, league, [2023, 2024])
+    expected = {season: _season_counts(db_session, season) for season in (2023, 2024)}
+    db_session.commit()
+
+    load_source(db_session, league, [2023, 2024], force=True, workers=2)
+    db_session.commit()
+    assert {season: _season_counts(db_session, season) for season in (2023, 2024)} == expected
+    assert db_session.get(DataVersion, "nflverse").version == 2
+    assert not [name for name in inspect(db_session.get_bind()).get_table_names() if "_stage_" in name]
+
+
+def test_failed_parallel_season_leaves_live_tables_untouched(db_session, league):
+    # 2025 has no staged files, so its worker fails while 2023 and 2024 load
+    with pytest.raises(RuntimeError, match=r"Seasons \[2025\] failed to load"):
+        load_source(db_session, league, [2023, 2024, 2025], workers=3)
+    db_session.rollback()
+
+    assert db_session.scalar(select(func.count()).select_from(Game)) == 0
+    assert db_session.get(DataVersion, "nflverse") is None
+    assert not [name for name in inspect(db_session.get_bind()).get_table_names() if "_stage_" in name]
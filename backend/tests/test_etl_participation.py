@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from backend.etl.util_participation import parse_players, participation_frame, play_id_series
+
+
+def test_parse_players_handles_canonical_and_irregular_payloads():
+    assert parse_players("[{'gsis_id': '00-1', 'position': 'QB', 'jersey_number': 15}]") == [("00-1", "QB", 15)]
+    assert parse_players(
+        "[{'position': 'WR', 'gsis_id': '00-2', 'jersey_number': None}, {'gsis_id': \"O'Neil\", 'jersey_number': 3.0}]"
+    ) == [("00-2", "WR", None), ("O'Neil", None, 3)]
+    assert parse_players([{"gsis_id": "00-3", "position": "TE", "jersey_number": 87.0}]) == [("00-3", "TE", 87)]
+    for empty in (None, float("nan"), "", "nan", "[]", "not a list"):
+        assert parse_players(empty) == []
+
+
+def test_participation_frame_flattens_both_sides():
+    part = pd.DataFrame(
+        {
+            "game_id": ["G1", "G1", "G2", "G2"],
+            "play_id": [1.0, 2.0, None, 5.0],
+            "offense_players": [
+                "[{'gsis_id': 'A', 'position': 'QB', 'jersey_number': 1}, {'gsis_id': 'B', 'position': 'WR', 'jersey_number': 2}]",
+                "[]",
+                "[{'gsis_id': 'Z', 'position': 'QB', 'jersey_number': 9}]",
+                "[{'gsis_id': 'C', 'position': 'RB', 'jersey_number': 3}]",
+            ],
+            "defense_players": [
+                "[{'gsis_id': 'D', 'position': 'CB', 'jersey_number': 4}]",
+                None,
+                None,
+                "[{'gsis_id': 'E', 'position': 'S', 'jersey_number': 5}]",
+            ],
+        }
+    )
+
+    assert play_id_series(part.dropna(subset=["play_id"])).tolist() == ["G1-1", "G1-2", "G2-5"]
+
+    frame = participation_frame(part, keep_play_ids=["G1-1", "G1-2"])
+    assert frame.to_dict("records") == [
+        {"play_id": "G1-1", "side": "offense", "gsis_id": "A", "position": "QB", "jersey_number": 1},
+        {"play_id": "G1-1", "side": "offense", "gsis_id": "B", "position": "WR", "jersey_number": 2},
+        {"play_id": "G1-1", "side": "defense", "gsis_id": "D", "position": "CB", "jersey_number": 4},
+    ]
+    assert len(participation_frame(part)) == 5
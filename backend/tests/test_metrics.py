@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import date
 
 import pytest
+from sqlalchemy import event
 
+from app.database import AsyncSessionLocal, async_engine
 from app.models import (
     CoSnaps,
     Game,
@@ -14,8 +17,11 @@ from app.models import (
     PlayerSnapsInState,
     RolePairWeight,
     SystemState,
+    SystemStateTotals,
 )
-from app.services.metrics import compute_lineup_score
+from app.services.metrics import compute_lineup_score, compute_lineup_score_async
+from app.services.state_cube import StateCubeCache, invalidate_state_cubes, state_cubes
+from app.telemetry import trace_queries
 
 ROLE_WEIGHTS = [
     ("offense", "OL", "OL", 1.0),
@@ -42,37 +48,35 @@ def seed_role_weights(db_session):
     db_session.flush()
 
 
-def test_compute_metrics_happy_path(db_session):
-    lineup = [
-        "P1",
-        "P2",
-        "P3",
-        "P4",
-        "P5",
-        "P6",
-        "P7",
-        "P8",
-        "P9",
-        "P10",
-        "P11",
-    ]
-    roles = {
-        "P1": "QB",
-        "P2": "RB",
-        "P3": "WR",
-        "P4": "WR",
-        "P5": "WR",
-        "P6": "TE",
-        "P7": "OL",
-        "P8": "OL",
-        "P9": "OL",
-        "P10": "OL",
-        "P11": "OL",
-    }
-
-    offense_state_id = "state-off"
-    defense_state_id = "state-def"
-
+LINEUP = [
+    "P1",
+    "P2",
+    "P3",
+    "P4",
+    "P5",
+    "P6",
+    "P7",
+    "P8",
+    "P9",
+    "P10",
+    "P11",
+]
+ROLES = {
+    "P1": "QB",
+    "P2": "RB",
+    "P3": "WR",
+    "P4": "WR",
+    "P5": "WR",
+    "P6": "TE",
+    "P7": "OL",
+    "P8": "OL",
+    "P9": "OL",
+    "P10": "OL",
+    "P11": "OL",
+}
+
+
+def _seed_offense_state(db_session, *, offense_state_id: str = "state-off", defense_state_id: str = "state-def") -> None:
     db_session.add(Game(game_id="G1", season=2024, week=1, game_date=date(2024, 9, 8), home_team="KC", away_team="LV"))
     db_session.add(SystemState(system_state_id=offense_state_id, team="KC", side="offense", coach_id="c1"))
     db_session.add(SystemState(system_state_id=defense_state_id, team="LV", side="defense", coach_id="c2"))
@@ -100,7 +104,7 @@ def test_compute_metrics_happy_path(db_session):
             )
         )
 
-    for gsis_id, role in roles.items():
+    for gsis_id, role in ROLES.items():
         db_session.add(Player(gsis_id=gsis_id, display_name=gsis_id, position=role))
         db_session.add(
             PlayerSnapsInState(
@@ -109,6 +113,9 @@ def test_compute_metrics_happy_path(db_session):
                 side="offense",
                 gsis_id=gsis_id,
                 snaps=90,
+                ius=1.0,
+                dominant_role=role,
+                roles={role: 90},
             )
         )
         db_session.add(
@@ -122,7 +129,21 @@ def test_compute_metrics_happy_path(db_session):
             )
         )
 
-    players = sorted(lineup)
+    role_mix = {}
+    for role in ROLES.values():
+        role_mix[role] = role_mix.get(role, 0) + 90
+    db_session.add(
+        SystemStateTotals(
+            system_state_id=offense_state_id,
+            team="KC",
+            side="offense",
+            team_snaps=100,
+            distinct_players=len(ROLES),
+            role_mix=role_mix,
+        )
+    )
+
+    players = sorted(LINEUP)
     for i, a in enumerate(players):
         for b in players[i + 1 :]:
             db_session.add(
@@ -138,12 +159,16 @@ def test_compute_metrics_happy_path(db_session):
 
     db_session.commit()
 
+
+def test_compute_metrics_happy_path(db_session):
+    _seed_offense_state(db_session)
+
     score = compute_lineup_score(
         db_session,
         team="KC",
         side="offense",
-        system_state_id=offense_state_id,
-        lineup=lineup,
+        system_state_id="state-off",
+        lineup=LINEUP,
     )
 
     assert score.LSU == pytest.approx(0.9, rel=1e-3)
@@ -152,3 +177,71 @@ def test_compute_metrics_happy_path(db_session):
     expected = 0.35 * 0.9 + 0.20 * 1.0 + 0.45 * 0.8
     assert score.cohesion == pytest.approx(expected, rel=1e-3)
 
+
+def test_state_cube_rescoring_issues_no_sql(db_session):
+    _seed_offense_state(db_session)
+    kwargs = dict(team="KC", side="offense", system_state_id="state-off")
+
+    first = compute_lineup_score(db_session, lineup=LINEUP, **kwargs)
+    with trace_queries() as trace:
+        second = compute_lineup_score(db_session, lineup=list(reversed(LINEUP)), **kwargs)
+
+    assert trace.count == 0
+    assert second.cohesion == pytest.approx(first.cohesion)
+
+
+def test_state_cube_reloads_after_invalidation(db_session):
+    _seed_offense_state(db_session)
+    kwargs = dict(team="KC", side="offense", system_state_id="state-off")
+    compute_lineup_score(db_session, lineup=LINEUP, **kwargs)
+
+    db_session.query(PlayerSnapsInState).update({PlayerSnapsInState.snaps: 50})
+    db_session.commit()
+    assert compute_lineup_score(db_session, lineup=LINEUP, **kwargs).LSU == pytest.approx(0.9)
+
+    invalidate_state_cubes()
+    assert compute_lineup_score(db_session, lineup=LINEUP, **kwargs).LSU == pytest.approx(0.5)
+
+
+def test_state_cube_cache_evicts_least_recently_used(db_session):
+    _seed_offense_state(db_session)
+    cube_bytes = state_cubes.get(db_session, system_state_id="state-off", team="KC", side="offense").nbytes
+    cache = StateCubeCache(max_bytes=cube_bytes, ttl_seconds=60)
+
+    cache.get(db_session, system_state_id="state-off", team="KC", side="offense")
+    cache.get(db_session, system_state_id="state-empty", team="KC", side="offense")
+
+    assert len(cache) == 1
+    assert cache.nbytes <= cube_bytes
+    with trace_queries() as trace:
+        cache.get(db_session, system_state_id="state-empty", team="KC", side="offense")
+    assert trace.count == 0
+    with trace_queries() as trace:
+        cache.get(db_session, system_state_id="state-off", team="KC", side="offense")
+    assert trace.count
+
+
+def test_async_scoring_matches_sync_and_overlaps_cube_queries(db_session):
+    _seed_offense_state(db_session)
+    kwargs = dict(team="KC", side="offense", system_state_id="state-off")
+    expected = compute_lineup_score(db_session, lineup=LINEUP, **kwargs)
+    invalidate_state_cubes()
+
+    connections = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        connections.append(id(conn))
+
+    async def score():
+        async with AsyncSessionLocal() as session:
+            return await compute_lineup_score_async(session, lineup=LINEUP, **kwargs)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        actual = asyncio.run(score())
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert actual == expected
+    # every cube query ran on its own connection rather than queueing on the session's
+    assert len(connections) == len(set(connections)) > 1
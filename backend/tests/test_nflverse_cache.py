@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from backend.etl.nflverse_cache import FileSource, ParquetCache, load_seasons
+
+
+def _fetcher(calls):
+    def fetch(season):
+        calls.append(season)
+        return pd.DataFrame({"game_id": [f"{season}_01_KC_LV"], "play_id": [1.0], "desc": ["kick"]})
+
+    return fetch
+
+
+def test_parquet_cache_serves_repeat_runs_and_refetches_modified_files(tmp_path):
+    calls = []
+    fetch = _fetcher(calls)
+
+    first = load_seasons(ParquetCache(tmp_path), "pbp", [2023, 2024], fetch)
+    again = load_seasons(ParquetCache(tmp_path), "pbp", [2023, 2024], fetch)
+    assert calls == [2023, 2024]
+    pd.testing.assert_frame_equal(first, again)
+
+    (tmp_path / "pbp" / "2023.parquet").write_bytes(b"corrupted")
+    load_seasons(ParquetCache(tmp_path), "pbp", [2023, 2024], fetch)
+    assert calls == [2023, 2024, 2023]
+
+    ParquetCache(tmp_path).get("pbp", 2024, fetch, refresh=True)
+    assert calls[-1] == 2024
+
+
+def test_file_source_reads_staged_files_without_fetching(tmp_path):
+    pd.DataFrame({"player_id": ["00-1"], "display_name": ["A"], "position": ["QB"]}).to_csv(
+        tmp_path / "players.csv", index=False
+    )
+    (tmp_path / "pbp").mkdir()
+    pd.DataFrame({"game_id": ["G1"], "play_id": [1.0]}).to_parquet(tmp_path / "pbp" / "2023.parquet")
+
+    source = FileSource(tmp_path)
+    assert source.get("players", None).to_dict("records") == [
+        {"player_id": "00-1", "display_name": "A", "position": "QB"}
+    ]
+    assert load_seasons(source, "pbp", [2023], fetch=None)["game_id"].tolist() == ["G1"]
+    with pytest.raises(FileNotFoundError):
+        source.get("participation", 2023)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import itertools
+import random
+
+import pytest
+
+from app.models import (
+    CoSnaps,
+    Game,
+    Play,
+    PlaySystemState,
+    Player,
+    PlayerRoleCountInState,
+    PlayerSnapsInState,
+    RolePairWeight,
+    SystemState,
+    SystemStateTotals,
+)
+from app.services.metrics import score_lineups
+from app.services.optimizer import optimize_lineup
+
+ROLE_WEIGHTS = [
+    ("offense", "OL", "OL", 1.0),
+    ("offense", "QB", "OL", 0.8),
+    ("offense", "QB", "WR", 0.85),
+    ("offense", "QB", "TE", 0.8),
+    ("offense", "QB", "RB", 0.7),
+    ("offense", "WR", "WR", 0.4),
+    ("offense", "WR", "TE", 0.5),
+    ("offense", "RB", "OL", 0.7),
+    ("offense", "RB", "TE", 0.55),
+    ("offense", "RB", "WR", 0.4),
+    ("offense", "TE", "OL", 0.7),
+]
+DEPTH_CHART = {"QB": 2, "RB": 2, "TE": 2, "WR": 5, "OL": 7}
+
+
+@pytest.fixture()
+def depth_chart(db_session):
+    rng = random.Random(7)
+    db_session.query(RolePairWeight).delete()
+    for side, role_a, role_b, weight in ROLE_WEIGHTS:
+        db_session.add(RolePairWeight(side=side, role_a=role_a, role_b=role_b, weight=weight))
+
+    db_session.add(Game(game_id="G3", season=2024, week=2, home_team="KC", away_team="DEN"))
+    db_session.add(SystemState(system_state_id="state-opt", team="KC", side="offense", coach_id="c1"))
+    for idx in range(200):
+        db_session.add(Play(play_id=f"G3-{idx}", game_id="G3", offense_team="KC", defense_team="DEN", special_teams=False))
+        db_session.add(PlaySystemState(play_id=f"G3-{idx}", offense_system_state_id="state-opt"))
+    db_session.add(SystemStateTotals(system_state_id="state-opt", team="KC", side="offense", team_snaps=200))
+
+    by_role = {}
+    for role, count in DEPTH_CHART.items():
+        for n in range(count):
+            gsis_id = f"{role}{n}"
+            snaps = rng.randint(20, 200)
+            by_role.setdefault(role, []).append(gsis_id)
+            db_session.add(Player(gsis_id=gsis_id, display_name=gsis_id, position=role))
+            keys = dict(system_state_id="state-opt", team="KC", side="offense", gsis_id=gsis_id)
+            db_session.add(PlayerSnapsInState(snaps=snaps, ius=1.0, dominant_role=role, roles={role: snaps}, **keys))
+            db_session.add(PlayerRoleCountInState(role=role, snaps=snaps, **keys))
+
+    players = sorted(pid for members in by_role.values() for pid in members)
+    for a, b in itertools.combinations(players, 2):
+        db_session.add(
+            CoSnaps(
+                system_state_id="state-opt",
+                team="KC",
+                side="offense",
+                a_gsis=a,
+                b_gsis=b,
+                co_snaps=rng.randint(0, 20),
+            )
+        )
+    db_session.flush()
+    return by_role
+
+
+def _brute_force(db_session, by_role, template):
+    groups = [itertools.combinations(by_role[role], count) for role, count in template.items()]
+    lineups = [[pid for group in combo for pid in group] for combo in itertools.product(*groups)]
+    scored = score_lineups(db_session, team="KC", side="offense", system_state_id="state-opt", lineups=lineups)
+    return sorted((result.cohesion for result in scored.results), reverse=True)
+
+
+def test_optimizer_matches_brute_force(db_session, depth_chart):
+    template = {"QB": 1, "RB": 1, "TE": 1, "WR": 3, "OL": 5}
+    expected = _brute_force(db_session, depth_chart, template)[:3]
+
+    result = optimize_lineup(
+        db_session,
+        team="KC",
+        side="offense",
+        system_state_id="state-opt",
+        template="11",
+        top_k=3,
+    )
+
+    assert [lineup.cohesion for lineup in result.lineups] == pytest.approx(expected)
+    best = result.lineups[0]
+    assert len(best.lineup) == 11
+    assert {role: len(players) for role, players in best.slots.items()} == template
+
+
+def test_optimizer_respects_locked_and_excluded(db_session, depth_chart):
+    result = optimize_lineup(
+        db_session,
+        team="KC",
+        side="offense",
+        system_state_id="state-opt",
+        template="11",
+        locked=["QB1", "WR4"],
+        excluded=["OL0", "WR0"],
+        top_k=2,
+    )
+
+    for lineup in result.lineups:
+        assert {"QB1", "WR4"} <= set(lineup.lineup)
+        assert not {"OL0", "WR0"} & set(lineup.lineup)
+
+
+def test_optimizer_locks_players_from_outside_the_state_by_position_group(db_session, depth_chart):
+    db_session.add(Player(gsis_id="T9", display_name="T9", position="T"))
+    db_session.flush()
+
+    result = optimize_lineup(
+        db_session,
+        team="KC",
+        side="offense",
+        system_state_id="state-opt",
+        template="11",
+        locked=["T9"],
+        top_k=1,
+    )
+
+    assert "T9" in result.lineups[0].slots["OL"]
+
+
+def test_optimizer_rejects_unfillable_template(db_session, depth_chart):
+    with pytest.raises(ValueError):
+        optimize_lineup(
+            db_session,
+            team="KC",
+            side="offense",
+            system_state_id="state-opt",
+            template={"QB": 1, "RB": 1, "TE": 1, "WR": 1, "OL": 7},
+            excluded=["OL3"],
+        )
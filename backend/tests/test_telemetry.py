@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine, text
+
+from app import telemetry
+from app.models import Game
+from app.services.system_state_service import list_teams
+from app.telemetry import (
+    CONNECT_LATENCY,
+    POOL_WAIT,
+    SQL_QUERIES,
+    Histogram,
+    instrument_engine,
+    statement_labels,
+    trace_queries,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "/x")
+
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{route="/x"} 4' in lines
+    assert 'demo_seconds_sum{route="/x"} 4.05' in lines
+
+
+def test_statement_labels():
+    assert statement_labels('SELECT games.season FROM games WHERE games.season = ?') == ("SELECT", "games")
+    assert statement_labels("INSERT INTO co_snaps (a_gsis) VALUES (?)") == ("INSERT", "co_snaps")
+    assert statement_labels('COPY "_stage_plays_1" (play_id) FROM STDIN') == ("COPY", "_stage_plays_1")
+    assert statement_labels("UPDATE data_version SET version=?") == ("UPDATE", "data_version")
+
+
+def test_metrics_endpoint_reports_routes_and_sql(client, db_session):
+    db_session.add(Game(game_id="G1", season=2024, week=1, home_team="KC", away_team="LV"))
+    before = SQL_QUERIES.value("primary_async", "SELECT", "games")
+
+    assert client.get("/api/teams", params={"season": 2024}).status_code == 200
+    assert client.get("/api/system_state", params={"team": "KC", "side": "kickoff"}).status_code == 422
+
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/api/teams",status="200"}' in body
+    assert 'http_requests_total{method="GET",route="/api/system_state",status="422"}' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/teams"}' in body
+    assert 'http_requests_in_flight{method="GET",route="/metrics"} 1' in body
+    assert "db_pool_checkout_wait_seconds_count" in body
+    # home and away teams are two statements against games
+    assert SQL_QUERIES.value("primary_async", "SELECT", "games") == before + 2
+
+
+def test_pool_metrics_split_checkout_wait_from_new_connections(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry, "_engines", dict(telemetry._engines))
+    quiet = create_engine(f"sqlite:///{tmp_path / 'quiet.db'}")
+    instrument_engine(quiet, "quiet", metrics=False)
+    assert "quiet" not in telemetry._engines
+    with trace_queries() as trace, quiet.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert trace.count == 1
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'pooled.db'}")
+    instrument_engine(engine, "pooled")
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    # the first checkout opened the only connection; the others reused it from the pool
+    assert CONNECT_LATENCY.count("pooled") == 1
+    assert POOL_WAIT.count("pooled") == 3
+
+    # a recreated pool keeps its timings and is the one reported in use
+    engine.dispose()
+    with engine.connect() as connection:
+        assert telemetry._pool_usage()[("pooled",)] == 1
+    assert CONNECT_LATENCY.count("pooled") == 2
+    assert POOL_WAIT.count("pooled") == 4
+    engine.dispose()
+    quiet.dispose()
+
+
+def test_trace_queries_counts_statements(db_session):
+    with trace_queries(keep_statements=True) as trace:
+        list_teams(db_session, season=2024)
+    list_teams(db_session, season=2024)
+
+    assert trace.count == len(trace.statements) == 2
+    assert all("FROM games" in statement for statement in trace.statements)
+    assert trace.seconds > 0
+
+
+def test_query_trace_headers_are_opt_in(client, db_session):
+    db_session.add(Game(game_id="G1", season=2024, week=1, home_team="KC", away_team="LV"))
+
+    plain = client.get("/api/teams", params={"season": 2024})
+    assert "X-Query-Count" not in plain.headers
+
+    traced = client.get("/api/teams", params={"season": 2024}, headers={"X-Debug-Queries": "1"})
+    count = int(traced.headers["X-Query-Count"])
+    assert count >= 2
+    assert traced.headers["Server-Timing"].startswith("db;dur=")
+    assert traced.headers["Server-Timing"].endswith(f'desc="{count} queries"')
@@ -84,12 +84,32 @@ CREATE TABLE IF NOT EXISTS player_snaps_in_state (
   side TEXT,
   gsis_id TEXT,
   snaps INT,
+  ius DOUBLE PRECISION NOT NULL DEFAULT 0,
+  dominant_role TEXT,
+  roles JSONB NOT NULL DEFAULT '{}'::jsonb,
   PRIMARY KEY (system_state_id, team, side, gsis_id)
 );
 
+-- databases created before the per-state role facts keep the old table; re-running this file upgrades them
+ALTER TABLE player_snaps_in_state ADD COLUMN IF NOT EXISTS ius DOUBLE PRECISION NOT NULL DEFAULT 0;
+ALTER TABLE player_snaps_in_state ADD COLUMN IF NOT EXISTS dominant_role TEXT;
+ALTER TABLE player_snaps_in_state ADD COLUMN IF NOT EXISTS roles JSONB NOT NULL DEFAULT '{}'::jsonb;
+
 CREATE INDEX IF NOT EXISTS idx_player_snaps_state ON player_snaps_in_state(system_state_id, team, side, gsis_id);
 CREATE INDEX IF NOT EXISTS idx_player_snaps_state_only ON player_snaps_in_state(system_state_id, team, side);
 
+CREATE TABLE IF NOT EXISTS player_roster_facts (
+  team TEXT,
+  side TEXT,
+  gsis_id TEXT,
+  n_system_states_seen INT NOT NULL DEFAULT 0,
+  total_snaps INT NOT NULL DEFAULT 0,
+  ius DOUBLE PRECISION NOT NULL DEFAULT 0,
+  dominant_role TEXT,
+  roles JSONB NOT NULL DEFAULT '{}'::jsonb,
+  PRIMARY KEY (team, side, gsis_id)
+);
+
 CREATE TABLE IF NOT EXISTS co_snaps (
   system_state_id TEXT,
   team TEXT,
@@ -102,6 +122,22 @@ CREATE TABLE IF NOT EXISTS co_snaps (
 
 CREATE INDEX IF NOT EXISTS idx_co_snaps_state ON co_snaps(system_state_id, team, side);
 
+CREATE TABLE IF NOT EXISTS pair_stats_in_state (
+  system_state_id TEXT,
+  team TEXT,
+  side TEXT,
+  a_gsis TEXT,
+  b_gsis TEXT,
+  co_snaps INT NOT NULL,
+  n_i INT NOT NULL,
+  n_j INT NOT NULL,
+  jaccard DOUBLE PRECISION NOT NULL,
+  PRIMARY KEY (system_state_id, team, side, a_gsis, b_gsis)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pair_stats_jaccard ON pair_stats_in_state(system_state_id, team, side, jaccard DESC);
+CREATE INDEX IF NOT EXISTS idx_pair_stats_co_snaps ON pair_stats_in_state(system_state_id, team, side, co_snaps DESC);
+
 CREATE TABLE IF NOT EXISTS player_role_counts_in_state (
   system_state_id TEXT,
   team TEXT,
@@ -114,6 +150,18 @@ CREATE TABLE IF NOT EXISTS player_role_counts_in_state (
 
 CREATE INDEX IF NOT EXISTS idx_role_counts_state ON player_role_counts_in_state(system_state_id, team, side, gsis_id);
 
+CREATE TABLE IF NOT EXISTS system_state_totals (
+  system_state_id TEXT,
+  team TEXT,
+  side TEXT,
+  team_snaps INT NOT NULL DEFAULT 0,
+  distinct_players INT NOT NULL DEFAULT 0,
+  role_mix JSONB NOT NULL DEFAULT '{}'::jsonb,
+  PRIMARY KEY (system_state_id, team, side)
+);
+
+CREATE INDEX IF NOT EXISTS idx_system_state_totals_team ON system_state_totals(team, side);
+
 CREATE TABLE IF NOT EXISTS role_pair_weights (
   side TEXT,
   role_a TEXT,
@@ -166,3 +214,9 @@ FROM (
 ) AS vals(side, role_a, role_b, weight)
 ON CONFLICT DO NOTHING;
 
+-- Bumped by each ETL stage in the same transaction as its writes; the API derives ETags from it
+CREATE TABLE IF NOT EXISTS data_version (
+  stage TEXT PRIMARY KEY,
+  version INT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ
+);
@@ -1,4 +1,14 @@
-import { CoachesActiveResponse, LineupScoreResponse, RosterPlayer, Side, SystemStateLabel, SystemStateSummary } from "./types";
+import {
+  CoachesActiveResponse,
+  LineupBatchScoreResponse,
+  LineupOptimizeResponse,
+  LineupScoreResponse,
+  LineupSwapResponse,
+  RosterPlayer,
+  Side,
+  SystemStateLabel,
+  SystemStateSummary
+} from "./types";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE_URL ?? "http://localhost:8000/api";
 
@@ -8,7 +18,8 @@ async function request<T>(path: string, options?: RequestInit): Promise<T> {
       "Content-Type": "application/json"
     },
     ...options,
-    cache: options?.method === "GET" ? "no-store" : undefined
+    // GETs revalidate with the API's data-version ETag instead of bypassing the HTTP cache
+    cache: (options?.method ?? "GET") === "GET" ? "no-cache" : undefined
   });
   if (!res.ok) {
     const text = await res.text();
@@ -28,14 +39,51 @@ export const api = {
   },
   scoreLineup: (payload: { team: string; side: Side; system_state_id: string; lineup: string[] }) =>
     request<LineupScoreResponse>("/score/lineup", { method: "POST", body: JSON.stringify(payload) }),
+  scoreLineups: (payload: {
+    team: string;
+    side: Side;
+    system_state_id: string;
+    lineups: string[][];
+    include_pair_edges?: boolean;
+  }) => request<LineupBatchScoreResponse>("/score/lineups", { method: "POST", body: JSON.stringify(payload) }),
+  scoreSwaps: (payload: {
+    team: string;
+    side: Side;
+    system_state_id: string;
+    lineup: string[];
+    swaps?: { out_player: string; in_player: string }[];
+    candidates_for?: string[];
+  }) => request<LineupSwapResponse>("/score/swaps", { method: "POST", body: JSON.stringify(payload) }),
+  optimizeLineup: (payload: {
+    team: string;
+    side: Side;
+    system_state_id: string;
+    template: string | Record<string, number>;
+    locked?: string[];
+    excluded?: string[];
+    top_k?: number;
+    time_budget_ms?: number;
+  }) => request<LineupOptimizeResponse>("/optimize/lineup", { method: "POST", body: JSON.stringify(payload) }),
   activeCoaches: (team: string, date?: string) => {
     const params = new URLSearchParams({ team });
     if (date) params.append("date", date);
     return request<CoachesActiveResponse>(`/coaches/active?${params.toString()}`);
   },
-  systemStateSummary: (team: string, side: Side, systemStateId: string) =>
-    request<SystemStateSummary>(
-      `/system_state/summary?team=${team}&side=${side}&system_state_id=${encodeURIComponent(systemStateId)}`
-    )
+  activeCoachesByTeam: (date?: string) => {
+    const params = new URLSearchParams();
+    if (date) params.append("date", date);
+    return request<Record<string, CoachesActiveResponse>>(`/coaches/active/all?${params.toString()}`);
+  },
+  systemStateSummary: (
+    team: string,
+    side: Side,
+    systemStateId: string,
+    options: { topK?: number; rankBy?: "co_snaps" | "jaccard" } = {}
+  ) => {
+    const params = new URLSearchParams({ team, side, system_state_id: systemStateId });
+    if (options.topK) params.append("top_k", String(options.topK));
+    if (options.rankBy) params.append("rank_by", options.rankBy);
+    return request<SystemStateSummary>(`/system_state/summary?${params.toString()}`);
+  }
 };
 
@@ -51,6 +51,59 @@ export interface LineupScoreResponse {
   playcaller_label?: string;
 }
 
+export interface LineupBatchScore {
+  lineup: string[];
+  LSU: number;
+  LIU: number;
+  LIC: number;
+  cohesion: number;
+  warnings: string[];
+  pair_edges?: PairEdge[] | null;
+}
+
+export interface LineupBatchScoreResponse {
+  results: LineupBatchScore[];
+  playcaller_label?: string;
+}
+
+export interface LineupScores {
+  LSU: number;
+  LIU: number;
+  LIC: number;
+  cohesion: number;
+}
+
+export interface SwapDelta extends LineupScores {
+  out_player: string;
+  in_player: string;
+  delta_LSU: number;
+  delta_LIU: number;
+  delta_LIC: number;
+  delta_cohesion: number;
+}
+
+export interface LineupSwapResponse {
+  base: LineupScores;
+  swaps: SwapDelta[];
+}
+
+export interface OptimizedLineup {
+  lineup: string[];
+  slots: Record<string, string[]>;
+  LSU: number;
+  LIU: number;
+  LIC: number;
+  cohesion: number;
+}
+
+export interface LineupOptimizeResponse {
+  lineups: OptimizedLineup[];
+  template: Record<string, number>;
+  explored: number;
+  timed_out: boolean;
+  playcaller_label?: string;
+}
+
 export interface CoachesActiveResponse {
   offense_playcaller?: CoachInfo;
   defense_playcaller?: CoachInfo;